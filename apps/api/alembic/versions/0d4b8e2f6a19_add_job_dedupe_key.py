@@ -0,0 +1,35 @@
+"""Add dedupe_key to jobs: at most one queued or running job per key
+
+Revision ID: 0d4b8e2f6a19
+Revises: 9c1e5b7a3d64
+Create Date: 2026-10-18 10:12:40.513274
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0d4b8e2f6a19'
+down_revision: Union[str, Sequence[str], None] = '9c1e5b7a3d64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('jobs', sa.Column('dedupe_key', sa.String(), nullable=True))
+    op.create_index(
+        'ix_jobs_pending_dedupe_key', 'jobs', ['dedupe_key'], unique=True,
+        sqlite_where=sa.text("status IN ('queued', 'running')"),
+        postgresql_where=sa.text("status IN ('queued', 'running')")
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_jobs_pending_dedupe_key', table_name='jobs')
+    with op.batch_alter_table('jobs') as batch_op:
+        batch_op.drop_column('dedupe_key')
@@ -0,0 +1,31 @@
+"""Add ETag/Last-Modified validators to source_pages
+
+Revision ID: 5b1e7d9a2c40
+Revises: 23c6c96c3b41
+Create Date: 2026-10-17 10:12:40.118203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b1e7d9a2c40'
+down_revision: Union[str, Sequence[str], None] = '23c6c96c3b41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('source_pages', sa.Column('etag', sa.String(), nullable=True))
+    op.add_column('source_pages', sa.Column('last_modified', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('source_pages') as batch_op:
+        batch_op.drop_column('last_modified')
+        batch_op.drop_column('etag')
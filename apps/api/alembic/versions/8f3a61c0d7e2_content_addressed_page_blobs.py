@@ -0,0 +1,122 @@
+"""Move source_pages bodies into content-addressed compressed blobs
+
+Revision ID: 8f3a61c0d7e2
+Revises: 5b1e7d9a2c40
+Create Date: 2026-10-17 11:40:05.532917
+
+"""
+from typing import Sequence, Union
+import hashlib
+import zlib
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8f3a61c0d7e2'
+down_revision: Union[str, Sequence[str], None] = '5b1e7d9a2c40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 200
+
+content_blobs = sa.table(
+    'content_blobs',
+    sa.column('hash', sa.String),
+    sa.column('codec', sa.String),
+    sa.column('size', sa.Integer),
+    sa.column('data', sa.LargeBinary),
+    sa.column('created_at', sa.DateTime),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('content_blobs',
+    sa.Column('hash', sa.String(length=64), nullable=False),
+    sa.Column('codec', sa.String(), nullable=True),
+    sa.Column('size', sa.Integer(), nullable=True),
+    sa.Column('data', sa.LargeBinary(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('hash')
+    )
+    op.add_column('source_pages', sa.Column('raw_html_hash', sa.String(length=64), nullable=True))
+    op.add_column('source_pages', sa.Column('raw_text_hash', sa.String(length=64), nullable=True))
+    op.create_index(op.f('ix_source_pages_raw_text_hash'), 'source_pages', ['raw_text_hash'], unique=False)
+
+    # Convert existing rows. zlib is always available, so use it here;
+    # the app reads either codec.
+    conn = op.get_bind()
+    seen = set(row[0] for row in conn.execute(sa.text("SELECT hash FROM content_blobs")))
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.text("SELECT id, raw_html, raw_text FROM source_pages WHERE id > :last_id ORDER BY id LIMIT :limit"),
+            {"last_id": last_id, "limit": BATCH_SIZE}
+        ).fetchall()
+        if not rows:
+            break
+
+        blobs = []
+        for page_id, raw_html, raw_text in rows:
+            hashes = {}
+            for key, text in (("raw_html_hash", raw_html), ("raw_text_hash", raw_text)):
+                if text is None:
+                    hashes[key] = None
+                    continue
+                raw = text.encode("utf-8")
+                digest = hashlib.sha256(raw).hexdigest()
+                if digest not in seen:
+                    seen.add(digest)
+                    blobs.append({"hash": digest, "codec": "zlib", "size": len(raw), "data": zlib.compress(raw, 6), "created_at": None})
+                hashes[key] = digest
+            conn.execute(
+                sa.text("UPDATE source_pages SET raw_html_hash = :raw_html_hash, raw_text_hash = :raw_text_hash WHERE id = :id"),
+                {"id": page_id, **hashes}
+            )
+        if blobs:
+            op.bulk_insert(content_blobs, blobs)
+        last_id = rows[-1][0]
+
+    with op.batch_alter_table('source_pages') as batch_op:
+        batch_op.drop_column('raw_html')
+        batch_op.drop_column('raw_text')
+        batch_op.create_foreign_key('fk_source_pages_raw_html_hash', 'content_blobs', ['raw_html_hash'], ['hash'])
+        batch_op.create_foreign_key('fk_source_pages_raw_text_hash', 'content_blobs', ['raw_text_hash'], ['hash'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    try:
+        import zstandard
+    except ImportError:
+        zstandard = None
+
+    with op.batch_alter_table('source_pages') as batch_op:
+        batch_op.drop_constraint('fk_source_pages_raw_text_hash', type_='foreignkey')
+        batch_op.drop_constraint('fk_source_pages_raw_html_hash', type_='foreignkey')
+        batch_op.add_column(sa.Column('raw_html', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('raw_text', sa.Text(), nullable=True))
+
+    conn = op.get_bind()
+    texts = {}
+    for digest, codec, data in conn.execute(sa.text("SELECT hash, codec, data FROM content_blobs")):
+        if codec == "zstd":
+            raw = zstandard.ZstdDecompressor().decompress(data)
+        else:
+            raw = zlib.decompress(data)
+        texts[digest] = raw.decode("utf-8")
+
+    rows = conn.execute(sa.text("SELECT id, raw_html_hash, raw_text_hash FROM source_pages")).fetchall()
+    for page_id, html_hash, text_hash in rows:
+        conn.execute(
+            sa.text("UPDATE source_pages SET raw_html = :raw_html, raw_text = :raw_text WHERE id = :id"),
+            {"id": page_id, "raw_html": texts.get(html_hash), "raw_text": texts.get(text_hash)}
+        )
+
+    op.drop_index(op.f('ix_source_pages_raw_text_hash'), table_name='source_pages')
+    with op.batch_alter_table('source_pages') as batch_op:
+        batch_op.drop_column('raw_text_hash')
+        batch_op.drop_column('raw_html_hash')
+    op.drop_table('content_blobs')
@@ -0,0 +1,53 @@
+"""Add professor_search full-text index (FTS5 on SQLite, tsvector on Postgres)
+
+Revision ID: 9c1e5b7a3d64
+Revises: f6a0c2d9b351
+Create Date: 2026-10-17 23:05:12.204817
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c1e5b7a3d64'
+down_revision: Union[str, Sequence[str], None] = 'f6a0c2d9b351'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Documents are filled in by the API on startup (search/index.py ensure_index)
+    if op.get_bind().dialect.name == "postgresql":
+        op.create_table('professor_search',
+        sa.Column('professor_id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('name', sa.Text(), nullable=True),
+        sa.Column('affiliation', sa.Text(), nullable=True),
+        sa.Column('interests', sa.Text(), nullable=True),
+        sa.Column('document', postgresql.TSVECTOR(), nullable=False),
+        sa.ForeignKeyConstraint(['professor_id'], ['professors.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('professor_id')
+        )
+        op.create_index('ix_professor_search_document', 'professor_search', ['document'], unique=False, postgresql_using='gin')
+        op.create_index('ix_professor_search_user_id', 'professor_search', ['user_id'], unique=False)
+    else:
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS professor_search USING fts5("
+            "name, affiliation, interests, body, user_id UNINDEXED, "
+            "tokenize='porter unicode61 remove_diacritics 2')"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == "postgresql":
+        op.drop_index('ix_professor_search_user_id', table_name='professor_search')
+        op.drop_index('ix_professor_search_document', table_name='professor_search')
+        op.drop_table('professor_search')
+    else:
+        op.execute("DROP TABLE IF EXISTS professor_search")
@@ -0,0 +1,34 @@
+"""Add text fingerprints and change records for incremental card refresh
+
+Revision ID: a3f9d2b6c871
+Revises: e1a7b3c95d20
+Create Date: 2026-10-17 17:40:52.310774
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3f9d2b6c871'
+down_revision: Union[str, Sequence[str], None] = 'e1a7b3c95d20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('source_pages', sa.Column('text_fingerprint', sa.String(length=64), nullable=True))
+    op.add_column('professor_cards', sa.Column('source_fingerprint', sa.String(length=64), nullable=True))
+    op.add_column('professor_cards', sa.Column('changes', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('professor_cards') as batch_op:
+        batch_op.drop_column('changes')
+        batch_op.drop_column('source_fingerprint')
+    with op.batch_alter_table('source_pages') as batch_op:
+        batch_op.drop_column('text_fingerprint')
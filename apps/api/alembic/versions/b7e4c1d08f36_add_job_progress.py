@@ -0,0 +1,29 @@
+"""Add progress to jobs for batch card generation
+
+Revision ID: b7e4c1d08f36
+Revises: a3f9d2b6c871
+Create Date: 2026-10-17 19:05:27.582413
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e4c1d08f36'
+down_revision: Union[str, Sequence[str], None] = 'a3f9d2b6c871'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('jobs', sa.Column('progress', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('jobs') as batch_op:
+        batch_op.drop_column('progress')
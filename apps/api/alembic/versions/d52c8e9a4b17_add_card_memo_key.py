@@ -0,0 +1,33 @@
+"""Add source text hash and extractor version to professor_cards for card memoization
+
+Revision ID: d52c8e9a4b17
+Revises: b7e4c1d08f36
+Create Date: 2026-10-17 20:14:09.871562
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd52c8e9a4b17'
+down_revision: Union[str, Sequence[str], None] = 'b7e4c1d08f36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('professor_cards', sa.Column('source_text_hash', sa.String(length=64), nullable=True))
+    op.add_column('professor_cards', sa.Column('extractor_version', sa.String(), nullable=True))
+    op.create_index('ix_professor_cards_text_key', 'professor_cards', ['source_text_hash', 'extractor_version'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_professor_cards_text_key', table_name='professor_cards')
+    with op.batch_alter_table('professor_cards') as batch_op:
+        batch_op.drop_column('extractor_version')
+        batch_op.drop_column('source_text_hash')
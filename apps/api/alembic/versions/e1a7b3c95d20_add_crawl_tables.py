@@ -0,0 +1,65 @@
+"""Add crawl_runs and crawl_frontier for the faculty directory crawler
+
+Revision ID: e1a7b3c95d20
+Revises: c4d92e6f1a85
+Create Date: 2026-10-17 15:22:13.640981
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1a7b3c95d20'
+down_revision: Union[str, Sequence[str], None] = 'c4d92e6f1a85'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('crawl_runs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('seed_url', sa.String(), nullable=True),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('max_depth', sa.Integer(), nullable=True),
+    sa.Column('max_pages', sa.Integer(), nullable=True),
+    sa.Column('pages_fetched', sa.Integer(), nullable=True),
+    sa.Column('professors_created', sa.Integer(), nullable=True),
+    sa.Column('default_affiliation', sa.String(), nullable=True),
+    sa.Column('job_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['job_id'], ['jobs.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_crawl_runs_id'), 'crawl_runs', ['id'], unique=False)
+    op.create_index(op.f('ix_crawl_runs_user_id'), 'crawl_runs', ['user_id'], unique=False)
+    op.create_table('crawl_frontier',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('crawl_id', sa.Integer(), nullable=True),
+    sa.Column('url', sa.String(), nullable=True),
+    sa.Column('depth', sa.Integer(), nullable=True),
+    sa.Column('kind', sa.String(), nullable=True),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('error', sa.String(), nullable=True),
+    sa.ForeignKeyConstraint(['crawl_id'], ['crawl_runs.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('crawl_id', 'url')
+    )
+    op.create_index(op.f('ix_crawl_frontier_crawl_id'), 'crawl_frontier', ['crawl_id'], unique=False)
+    op.create_index(op.f('ix_crawl_frontier_id'), 'crawl_frontier', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_crawl_frontier_id'), table_name='crawl_frontier')
+    op.drop_index(op.f('ix_crawl_frontier_crawl_id'), table_name='crawl_frontier')
+    op.drop_table('crawl_frontier')
+    op.drop_index(op.f('ix_crawl_runs_user_id'), table_name='crawl_runs')
+    op.drop_index(op.f('ix_crawl_runs_id'), table_name='crawl_runs')
+    op.drop_table('crawl_runs')
@@ -0,0 +1,32 @@
+"""Add term_frequencies for the TF-IDF research-interest fallback
+
+Revision ID: f6a0c2d9b351
+Revises: d52c8e9a4b17
+Create Date: 2026-10-17 21:32:40.518203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6a0c2d9b351'
+down_revision: Union[str, Sequence[str], None] = 'd52c8e9a4b17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('term_frequencies',
+    sa.Column('term_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('df', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('term_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('term_frequencies')
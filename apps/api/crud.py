@@ -1,5 +1,6 @@
 from sqlalchemy.orm import Session
 import models, schemas, auth
+from search import index as search_index
 
 # User CRUD
 def get_user(db: Session, user_id: int):
@@ -23,6 +24,142 @@ def get_professor(db: Session, professor_id: int, user_id: int):
 def get_professors(db: Session, user_id: int, skip: int = 0, limit: int = 100):
     return db.query(models.Professor).filter(models.Professor.user_id == user_id).offset(skip).limit(limit).all()
 
+def get_professor_ids(db: Session, user_id: int):
+    return [row.id for row in db.query(models.Professor.id).filter(models.Professor.user_id == user_id).order_by(models.Professor.id)]
+
+def get_professors_by_ids(db: Session, professor_ids: list, user_id: int):
+    if not professor_ids:
+        return []
+    return db.query(models.Professor).filter(models.Professor.id.in_(set(professor_ids)), models.Professor.user_id == user_id).all()
+
+# SourcePage helpers
+# Pages whose body was fetched and cleaned ("truncated": cleaned from the first CLEANER_MAX_BYTES)
+USABLE_FETCH_STATUSES = ("ok", "truncated")
+
+def get_latest_source_page(db: Session, professor_id: int, source_url: str):
+    return db.query(models.SourcePage).filter(
+        models.SourcePage.professor_id == professor_id,
+        models.SourcePage.source_url == source_url,
+        models.SourcePage.fetch_status.in_(USABLE_FETCH_STATUSES)
+    ).order_by(models.SourcePage.fetched_at.desc()).first()
+
+def get_latest_user_source_page(db: Session, source_url: str, user_id: int):
+    return db.query(models.SourcePage).join(models.Professor).filter(
+        models.SourcePage.source_url == source_url,
+        models.SourcePage.fetch_status.in_(USABLE_FETCH_STATUSES),
+        models.SourcePage.raw_html_hash != None,
+        models.Professor.user_id == user_id
+    ).order_by(models.SourcePage.fetched_at.desc()).first()
+
+def get_latest_source_pages(db: Session, professor_ids: list):
+    """Latest successful page per (professor_id, source_url), in one query."""
+    from sqlalchemy import func, and_
+    if not professor_ids:
+        return {}
+    usable = models.SourcePage.fetch_status.in_(USABLE_FETCH_STATUSES)
+    latest = db.query(
+        models.SourcePage.professor_id,
+        models.SourcePage.source_url,
+        func.max(models.SourcePage.fetched_at).label("fetched_at")
+    ).filter(
+        models.SourcePage.professor_id.in_(set(professor_ids)),
+        usable
+    ).group_by(models.SourcePage.professor_id, models.SourcePage.source_url).subquery()
+    pages = db.query(models.SourcePage).join(latest, and_(
+        models.SourcePage.professor_id == latest.c.professor_id,
+        models.SourcePage.source_url == latest.c.source_url,
+        models.SourcePage.fetched_at == latest.c.fetched_at
+    )).filter(usable).order_by(models.SourcePage.id.asc()).all()
+    return {(p.professor_id, p.source_url): p for p in pages}
+
+def get_latest_text_pages(db: Session, professor_ids: list):
+    """Latest page with text per professor, text blobs included, in one query."""
+    from sqlalchemy import func, and_
+    from sqlalchemy.orm import joinedload, undefer
+    if not professor_ids:
+        return {}
+    latest = db.query(
+        models.SourcePage.professor_id,
+        func.max(models.SourcePage.fetched_at).label("fetched_at")
+    ).filter(
+        models.SourcePage.professor_id.in_(set(professor_ids)),
+        models.SourcePage.raw_text_hash != None
+    ).group_by(models.SourcePage.professor_id).subquery()
+    pages = db.query(models.SourcePage).join(latest, and_(
+        models.SourcePage.professor_id == latest.c.professor_id,
+        models.SourcePage.fetched_at == latest.c.fetched_at
+    )).filter(
+        models.SourcePage.raw_text_hash != None
+    ).options(
+        joinedload(models.SourcePage.raw_text_blob).options(undefer(models.ContentBlob.data))
+    ).all()
+    return {p.professor_id: p for p in pages}
+
+def get_latest_cards(db: Session, professor_ids: list):
+    """Highest-version card per professor, in one query."""
+    from sqlalchemy import func, and_
+    if not professor_ids:
+        return {}
+    latest = db.query(
+        models.ProfessorCard.professor_id,
+        func.max(models.ProfessorCard.version).label("version")
+    ).filter(
+        models.ProfessorCard.professor_id.in_(set(professor_ids))
+    ).group_by(models.ProfessorCard.professor_id).subquery()
+    cards = db.query(models.ProfessorCard).join(latest, and_(
+        models.ProfessorCard.professor_id == latest.c.professor_id,
+        models.ProfessorCard.version == latest.c.version
+    )).order_by(models.ProfessorCard.generated_at.asc()).all()
+    return {c.professor_id: c for c in cards}
+
+def get_cached_card_json(db: Session, text_hashes: list, extractor_version: str):
+    """text hash -> card_json of any card extracted from that text by this extractor version."""
+    if not text_hashes:
+        return {}
+    rows = db.query(models.ProfessorCard.source_text_hash, models.ProfessorCard.card_json).filter(
+        models.ProfessorCard.source_text_hash.in_(set(text_hashes)),
+        models.ProfessorCard.extractor_version == extractor_version
+    ).all()
+    return {text_hash: card_json for text_hash, card_json in rows}
+
+def build_source_page(db: Session, professor_id: int, fetched_data: dict, raw_text: str):
+    """New SourcePage whose bodies go to the content-addressed blob store."""
+    from services import blob_store
+    from ingest.cleaner import text_fingerprint
+    return models.SourcePage(
+        professor_id=professor_id,
+        source_url=fetched_data["source_url"],
+        raw_html_hash=blob_store.put_text(db, fetched_data["raw_html"]),
+        raw_text_hash=blob_store.put_text(db, raw_text),
+        text_fingerprint=text_fingerprint(raw_text) if raw_text else None,
+        fetch_status=fetched_data["fetch_status"],
+        error_msg=fetched_data["error_msg"],
+        etag=fetched_data.get("etag"),
+        last_modified=fetched_data.get("last_modified")
+    )
+
+def touch_source_page(db: Session, db_page: models.SourcePage, fetched_data: dict):
+    """
+    Marks an unchanged page as re-checked without storing a new copy: a 304,
+    or a re-download whose text is identical (see same_source_text), in
+    which case the row points at the new HTML so it matches the validators.
+    """
+    from datetime import datetime
+    from services import blob_store
+    if fetched_data.get("raw_html"):
+        db_page.raw_html_hash = blob_store.put_text(db, fetched_data["raw_html"])
+    db_page.fetched_at = datetime.utcnow()
+    db_page.etag = fetched_data.get("etag") or db_page.etag
+    db_page.last_modified = fetched_data.get("last_modified") or db_page.last_modified
+    db.add(db_page)
+    return db_page
+
+def same_source_text(db_page: models.SourcePage, fetched_data: dict, raw_text: str) -> bool:
+    """Re-downloaded page whose cleaned text is byte-identical to db_page's."""
+    from services import blob_store
+    return bool(db_page and raw_text) and fetched_data["fetch_status"] == db_page.fetch_status \
+        and blob_store.content_hash(raw_text) == db_page.raw_text_hash
+
 def create_professor(db: Session, professor: schemas.ProfessorCreate, user_id: int):
     db_professor = models.Professor(**professor.dict(), user_id=user_id)
     db.add(db_professor)
@@ -32,6 +169,7 @@ def create_professor(db: Session, professor: schemas.ProfessorCreate, user_id: i
     # Create default pipeline status
     db_status = models.PipelineStatus(professor_id=db_professor.id)
     db.add(db_status)
+    search_index.index_professors(db, [db_professor.id])
     db.commit()
     
     return db_professor
@@ -75,6 +213,7 @@ def update_professor(db: Session, professor_id: int, professor_update: schemas.P
         setattr(db_professor, key, value)
     
     db.add(db_professor)
+    search_index.index_professors(db, [db_professor.id])
     db.commit()
     db.refresh(db_professor)
     return db_professor
@@ -83,6 +222,7 @@ def delete_professor(db: Session, professor_id: int, user_id: int):
     # Get professor first to verify ownership
     db_professor = db.query(models.Professor).filter(models.Professor.id == professor_id, models.Professor.user_id == user_id).first()
     if db_professor:
+        search_index.remove_professors(db, [db_professor.id])
         db.delete(db_professor)
         db.commit()
     return db_professor
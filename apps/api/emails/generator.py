@@ -129,6 +129,7 @@ def generate_email(professor: Any, card_data: Dict[str, Any], request: Any = Non
 
 def _generate_with_llm(llm, professor, card_data, template_type, tone, length, custom_instructions):
     import json
+    from ingest.publications import format_publication
     
     # Prepare Context
     parts = professor.name.split()
@@ -136,6 +137,8 @@ def _generate_with_llm(llm, professor, card_data, template_type, tone, length, c
     
     summary = card_data.get("summary", "No summary available.")
     interests = ", ".join(card_data.get("research_interests", []))
+    # Parsed at card extraction (ingest/publications.py); older cards don't have them
+    papers = "; ".join(format_publication(p) for p in card_data.get("publications", [])[:3]) or "Not available"
     
     # Build Prompt
     system_prompt = f"""You are an expert academic assistant helping a student write an email to a professor.
@@ -146,6 +149,7 @@ def _generate_with_llm(llm, professor, card_data, template_type, tone, length, c
     Professor's Research Context:
     - Interests: {interests}
     - Summary: {summary}
+    - Recent papers: {papers}
     
     {f'Custom Instructions: {custom_instructions}' if custom_instructions else ''}
     
@@ -0,0 +1,95 @@
+"""
+Batch Ingest — fetch and clean many professor pages concurrently.
+
+Concurrency is capped globally (worker threads) and per host (semaphores),
+so a cohort of professors from the same department doesn't hammer one server.
+Request pacing and robots.txt are handled by ingest/scheduler.py in fetch_url.
+Cleaning runs in the services/cpu_pool worker processes (cleaner.clean_bounded).
+DB writes are left to the caller so all rows can go in one transaction.
+"""
+import os
+import time
+import threading
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+from ingest import fetcher, cleaner, scheduler
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENCY = int(os.getenv("INGEST_BATCH_CONCURRENCY", "8"))
+PER_HOST_CONCURRENCY = int(os.getenv("INGEST_PER_HOST_CONCURRENCY", "2"))
+MAX_ITEMS = int(os.getenv("INGEST_BATCH_MAX_ITEMS", "500"))
+
+
+class _HostLimiter:
+    """Hands out one semaphore per hostname."""
+
+    def __init__(self, limit: int):
+        self.limit = max(limit, 1)
+        self._lock = threading.Lock()
+        self._sems = defaultdict(lambda: threading.BoundedSemaphore(self.limit))
+
+    def get(self, url: str) -> threading.BoundedSemaphore:
+        host = (urlparse(url).hostname or "").lower()
+        with self._lock:
+            return self._sems[host]
+
+
+def _ingest_one(item: Dict, limiter: _HostLimiter) -> Dict:
+    started = time.perf_counter()
+    professor_id, url = item["professor_id"], item["url"]
+
+    with limiter.get(url):
+        fetched_data = fetcher.fetch_url(url, etag=item.get("etag"), last_modified=item.get("last_modified"))
+    fetch_ms = (time.perf_counter() - started) * 1000
+
+    raw_text = ""
+    avatar_url = None
+    # A 304 has no body, so there is nothing to clean
+    if fetched_data["raw_html"]:
+        cleaned = cleaner.clean_bounded(fetched_data["raw_html"], fetched_data["source_url"], cache=True, mode=item.get("text_mode"))
+        raw_text, avatar_url = cleaned["raw_text"], cleaned["avatar_url"]
+        if cleaned["status"] != "ok":
+            fetched_data["fetch_status"] = cleaned["status"]
+            fetched_data["error_msg"] = cleaned["error_msg"]
+
+    return {
+        "professor_id": professor_id,
+        "url": url,
+        "fetched": fetched_data,
+        "raw_text": raw_text,
+        "avatar_url": avatar_url,
+        "fetch_ms": round(fetch_ms, 1),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def ingest_many(
+    items: List[Dict],
+    max_concurrency: Optional[int] = None,
+    per_host_concurrency: Optional[int] = None,
+) -> List[Dict]:
+    """
+    Fetches and cleans [{"professor_id", "url", "etag"?, "last_modified"?, "text_mode"?}, ...]
+    concurrently.
+    max_concurrency and per_host_concurrency can lower the configured
+    limits, not raise them.
+    Returns one result per item, in input order.
+    """
+    if not items:
+        return []
+
+    workers = max(1, min(max_concurrency or MAX_CONCURRENCY, MAX_CONCURRENCY, len(items)))
+    limiter = _HostLimiter(min(per_host_concurrency or PER_HOST_CONCURRENCY, PER_HOST_CONCURRENCY))
+
+    # Submit hosts round-robin so workers aren't all queued behind one host
+    order = scheduler.interleave_by_host(list(range(len(items))), url_of=lambda i: items[i]["url"])
+
+    logger.info(f"[Batch] Ingesting {len(items)} URLs (workers={workers}, per_host={limiter.limit})")
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest") as pool:
+        futures = {i: pool.submit(_ingest_one, items[i], limiter) for i in order}
+        return [futures[i].result() for i in range(len(items))]
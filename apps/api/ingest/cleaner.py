@@ -1,24 +1,123 @@
-from readability import Document
-from bs4 import BeautifulSoup
+import os
+import re
+import time
+import hashlib
+import logging
+import unicodedata
 
-def clean_html(raw_html: str):
+from ingest import document
+from ingest.document import ParsedDocument, parse_document, CleaningTimeout
+
+logger = logging.getLogger(__name__)
+
+# Bounds for pathological pages (multi-MB publication dumps)
+MAX_HTML_BYTES = int(os.getenv("CLEANER_MAX_BYTES", str(2 * 1024 * 1024)))
+DEADLINE = float(os.getenv("CLEANER_DEADLINE", "10"))
+
+def truncate_html(raw_html: str, max_bytes: int = None):
+    """
+    Cuts HTML past the byte budget, at the end of the last complete tag.
+    Returns (html, truncated).
+    """
+    max_bytes = max_bytes or MAX_HTML_BYTES
+    # Cheap check first: a str can't be more UTF-8 bytes than 4x its length
+    if not raw_html or len(raw_html) * 4 <= max_bytes:
+        return raw_html, False
+    encoded = raw_html.encode("utf-8", "replace")
+    if len(encoded) <= max_bytes:
+        return raw_html, False
+    head = encoded[:max_bytes].decode("utf-8", "ignore")
+    cut = head.rfind(">")
+    return (head[:cut + 1] if cut > 0 else head), True
+
+# Lines that change without the page content changing (footers, counters)
+VOLATILE_LINE_RE = re.compile(
+    r"^\s*(last (updated|modified|revised)|updated on|page (generated|updated)|copyright|©|\(c\) \d{4}|visitors?\b|hits?:)",
+    re.IGNORECASE
+)
+
+def normalize_text(text: str) -> str:
+    """Page text with case, Unicode forms, whitespace and volatile footer lines normalized away."""
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKC", text)
+    lines = (" ".join(line.split()) for line in text.splitlines())
+    return "\n".join(line.lower() for line in lines if line and not VOLATILE_LINE_RE.match(line))
+
+def text_fingerprint(text: str):
+    """sha256 of normalize_text(text); pages with equal fingerprints share a card (not a stored text)."""
+    if text is None:
+        return None
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+def clean_html(raw_html: str, mode: str = None):
     if not raw_html:
         return ""
-    
+    raw_html, _ = truncate_html(raw_html)
+    return clean_document(parse_document(raw_html), mode=mode)
+
+def clean_document(doc: ParsedDocument, mode: str = None, deadline: float = None):
+    """mode: "auto", "fast" or "readability" (see ingest/document.py); default CLEANER_TEXT_MODE."""
+    return doc.extract_text(mode, deadline=deadline)
+
+def clean_page(raw_html: str, source_url: str = "", cache: bool = False, mode: str = None, deadline: float = None,
+               image_candidates: bool = False, budget_s: float = None):
+    """
+    Text + avatar guess for a fetched page, from a single parse.
+    Module-level and returns plain data so it can run in services/cpu_pool.
+    deadline is a time.time() timestamp; past it, CleaningTimeout is raised.
+    budget_s sets the deadline when the call starts, so time a pool task
+    spent queued doesn't count.
+    image_candidates adds the scored avatar candidates (search/image_scraper)
+    from the same parse, for callers whose process never sees the document.
+    """
+    if budget_s:
+        deadline = time.time() + budget_s
+    if not raw_html:
+        cleaned = {"raw_text": "", "avatar_url": None}
+        doc = None
+    else:
+        doc = parse_document(raw_html, source_url, cache=cache)
+        cleaned = {"raw_text": clean_document(doc, mode=mode, deadline=deadline), "avatar_url": extract_document_images(doc)}
+    if image_candidates:
+        from search.image_scraper import score_image_candidates
+        cleaned["image_candidates"] = score_image_candidates(doc) if doc is not None else []
+    return cleaned
+
+def clean_bounded(raw_html: str, source_url: str = "", cache: bool = False, mode: str = None,
+                  max_bytes: int = None, deadline_s: float = None):
+    """
+    clean_page with a byte budget and a deadline on its execution time.
+    Runs in the CPU pool, where an overrunning task is killed; inline runs
+    check the deadline between steps. Returns
+    {"raw_text", "avatar_url", "status": "ok" | "truncated" | "timeout" | "failed", "error_msg"},
+    "failed" when the worker process died cleaning the page.
+    cache=True keeps the page's avatar candidates in this process
+    (document.cache_image_candidates) for a following /extract_avatar; the
+    parsed document itself lives in the pool worker and is not shared.
+    """
+    from services import cpu_pool
+
+    html, truncated = truncate_html(raw_html, max_bytes)
+    status = "truncated" if truncated else "ok"
+    error_msg = f"HTML truncated to {max_bytes or MAX_HTML_BYTES} bytes" if truncated else None
+
+    deadline_s = deadline_s or DEADLINE
     try:
-        doc = Document(raw_html)
-        summary_html = doc.summary()
-        
-        soup = BeautifulSoup(summary_html, "lxml")
-        text = soup.get_text(separator="\n", strip=True)
-        return text
-    except Exception as e:
-        # Fallback if readability fails
-        try:
-            soup = BeautifulSoup(raw_html, "lxml")
-            return soup.get_text(separator="\n", strip=True)
-        except:
-            return ""
+        cleaned = cpu_pool.run(
+            clean_page, html, source_url, mode=mode, image_candidates=cache,
+            budget_s=deadline_s, timeout=deadline_s
+        )
+    except (cpu_pool.TaskTimeout, CleaningTimeout):
+        logger.warning(f"[Cleaner] Gave up on {source_url} after {deadline_s:g}s ({len(html)} chars)")
+        return {"raw_text": None, "avatar_url": None, "status": "timeout", "error_msg": f"Cleaning exceeded {deadline_s:g}s"}
+    except cpu_pool.WorkerDied as e:
+        logger.warning(f"[Cleaner] Cleaning {source_url} failed: {e} ({len(html)} chars)")
+        return {"raw_text": None, "avatar_url": None, "status": "failed", "error_msg": f"Cleaning failed: {e}"}
+    candidates = cleaned.pop("image_candidates", None)
+    if cache and source_url:
+        document.cache_image_candidates(source_url, candidates)
+    return {**cleaned, "status": status, "error_msg": error_msg}
 
 def extract_images(raw_html: str, source_url: str):
     """
@@ -27,50 +126,43 @@ def extract_images(raw_html: str, source_url: str):
     """
     if not raw_html:
         return None
-        
+    raw_html, _ = truncate_html(raw_html)
+    return extract_document_images(parse_document(raw_html, source_url))
+
+def extract_document_images(doc: ParsedDocument):
+    """
+    Same as extract_images, on an already parsed document.
+    """
     try:
-        soup = BeautifulSoup(raw_html, "lxml")
-        
         # 1. Open Graph Image (High confidence)
-        og_image = soup.find("meta", property="og:image")
-        if og_image and og_image.get("content"):
-            return _make_absolute(og_image["content"], source_url)
-            
+        if doc.meta.get("og:image"):
+            return doc.absolute(doc.meta["og:image"])
+
         # 2. Twitter Image
-        twitter_image = soup.find("meta", name="twitter:image")
-        if twitter_image and twitter_image.get("content"):
-            return _make_absolute(twitter_image["content"], source_url)
-            
+        if doc.meta.get("twitter:image"):
+            return doc.absolute(doc.meta["twitter:image"])
+
         # 3. Heuristic: Look for images with "profile", "avatar", "portrait" in src, class, or id.
         # This is risky but useful for academic sites.
-        images = soup.find_all("img")
-        for img in images:
-            src = img.get("src", "")
-            alt = img.get("alt", "")
-            cls = " ".join(img.get("class", []))
-            id_ = img.get("id", "")
-            
+        for img in doc.images:
+            src = img["src"]
+
             score = 0
-            combined = (src + alt + cls + id_).lower()
-            
+            combined = (src + img["alt"] + img["class"] + img["id"]).lower()
+
             if "profile" in combined: score += 2
             if "avatar" in combined: score += 2
             if "portrait" in combined: score += 1
             if "photo" in combined: score += 1
             if "me" in combined.split(): score += 1  # reckless? maybe.
-            
+
             if score >= 2 and src:
-                return _make_absolute(src, source_url)
+                return img["url"]
 
         # 4. Fallback: Find the largest image? (Maybe too risky)
-        
+
     except Exception as e:
         print(f"Image extraction error: {e}")
         return None
-        
-    return None
 
-def _make_absolute(url: str, base: str):
-    if not url: return None
-    from urllib.parse import urljoin
-    return urljoin(base, url)
+    return None
@@ -0,0 +1,282 @@
+"""
+Faculty Directory Crawler — bulk professor discovery from a department listing.
+
+Starting from a faculty-listing URL, the crawler follows pagination and
+sub-listings (up to max_depth) and visits profile links. Each profile page is
+turned into a candidate (name, affiliation, website) using the same
+heuristics as search (extract_affiliation), and new candidates are
+bulk-created as Professor rows.
+
+The frontier is persisted in `crawl_frontier`, with one row per URL, unique
+per crawl. That table is also the seen-set. Progress is committed after
+every wave, so a crawl interrupted by a restart resumes where it stopped.
+Fetches run concurrently through fetch_url, so the per-host scheduler
+applies.
+"""
+import os
+import re
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+from urllib.parse import urldefrag, urlparse
+
+from sqlalchemy.orm import Session
+
+import models
+from ingest import fetcher, document, scheduler, cleaner
+from search import index as search_index
+
+logger = logging.getLogger(__name__)
+
+CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", "4"))
+MAX_DEPTH = int(os.getenv("CRAWL_MAX_DEPTH", "2"))
+MAX_PAGES = int(os.getenv("CRAWL_MAX_PAGES", "200"))
+
+NAME_PARTICLES = r"(?:von|van|de|der|den|da|di|del|della|la|le|du|dos|das|bin|al)"
+NAME_RE = re.compile(
+    r"^(?:Prof\.?\s+|Dr\.?\s+)?"
+    r"([A-Z][a-zA-Z'À-ſ\-]+\.?(?:\s+(?:" + NAME_PARTICLES + r"\s+)?[A-Z][a-zA-Z'À-ſ\-]*\.?){1,3})$"
+)
+PROFILE_PATH_RE = re.compile(r"/(people|person|faculty|profile|profiles|directory|staff|~)[^?#]*[a-z]", re.IGNORECASE)
+LISTING_HINT_RE = re.compile(r"faculty|people|directory|professors", re.IGNORECASE)
+PAGE_PARAM_RE = re.compile(r"(^|[?&])(page|p|pg|start|offset)=\d+", re.IGNORECASE)
+PAGE_PATH_RE = re.compile(r"/page/\d+/?$", re.IGNORECASE)
+HOMEPAGE_TEXT_RE = re.compile(r"home\s*page|personal (web)?site|website|lab page|group page", re.IGNORECASE)
+
+NAV_WORDS = {
+    "home", "about", "news", "events", "contact", "research", "faculty", "people", "staff",
+    "students", "admissions", "courses", "teaching", "publications", "directory", "login",
+    "next", "previous", "search", "more", "read more", "back", "menu", "apply",
+}
+
+# Words that show up in Title Case menu entries but never in a person's name
+NON_NAME_WORDS = {
+    "department", "school", "university", "college", "science", "sciences", "engineering",
+    "research", "graduate", "undergraduate", "admissions", "program", "programs", "contact",
+    "us", "news", "events", "about", "faculty", "people", "staff", "center", "centre",
+    "institute", "lab", "laboratory", "computer", "home", "page", "student", "students",
+    "courses", "office", "directory", "seminar", "seminars", "jobs", "careers", "alumni",
+    "giving", "visit", "resources", "policies", "overview", "services", "information",
+    "welcome", "emeritus", "affiliated", "adjunct", "all", "our", "the", "of", "and", "for",
+    "profile", "publications", "teaching", "group", "members", "visiting", "login",
+}
+
+
+def canonical_url(url: str) -> str:
+    url, _ = urldefrag(url.strip())
+    parsed = urlparse(url)
+    return parsed._replace(scheme=parsed.scheme.lower(), netloc=parsed.netloc.lower()).geturl()
+
+
+def looks_like_name(text: str) -> bool:
+    text = " ".join(text.split())
+    if not text or text.lower() in NAV_WORDS or any(ch.isdigit() for ch in text):
+        return False
+    match = NAME_RE.match(text)
+    if not match:
+        return False
+    return not any(word.strip(".").lower() in NON_NAME_WORDS for word in match.group(1).split())
+
+
+def _is_pagination(link: Dict) -> bool:
+    text = link["text"].strip().lower()
+    if text in ("next", "next page", "next »", "»", "›", ">", "more") or text.isdigit():
+        return True
+    parsed = urlparse(link["url"])
+    return bool(PAGE_PARAM_RE.search("?" + parsed.query) or PAGE_PATH_RE.search(parsed.path))
+
+
+def classify_links(doc: document.ParsedDocument, seed_host: str) -> Dict[str, List[str]]:
+    """Splits a listing page's links into pagination, profile and sub-listing links."""
+    out = {"pagination": [], "profile": [], "listing": []}
+    for link in doc.links:
+        url = canonical_url(link["url"])
+        parsed = urlparse(url)
+        if parsed.scheme not in ("http", "https") or parsed.netloc != seed_host:
+            continue
+        if _is_pagination(link):
+            out["pagination"].append(url)
+        elif looks_like_name(link["text"]) or (PROFILE_PATH_RE.search(parsed.path) and link["text"].strip().lower() not in NAV_WORDS and not LISTING_HINT_RE.fullmatch(link["text"].strip())):
+            out["profile"].append(url)
+        elif LISTING_HINT_RE.search(link["text"]) or LISTING_HINT_RE.search(parsed.path):
+            out["listing"].append(url)
+    return out
+
+
+def extract_candidate(doc: document.ParsedDocument, default_affiliation: str = "") -> Optional[Dict]:
+    """Name / affiliation / website from a profile page, or None if it doesn't look like a person."""
+    from search.engine import extract_affiliation
+
+    title = ""
+    if doc.tree is not None:
+        title = " ".join((doc.tree.findtext(".//title") or "").split())
+    h1 = ""
+    if doc.tree is not None:
+        node = doc.tree.find(".//h1")
+        if node is not None:
+            h1 = " ".join(node.text_content().split())
+
+    # Name: <h1> if it looks like a name, else the first part of the title
+    name = None
+    if looks_like_name(h1):
+        name = h1
+    else:
+        for sep in [" - ", " | ", " – ", " — ", " : ", " at "]:
+            if sep in title:
+                potential = title.split(sep)[0].strip()
+                if looks_like_name(potential):
+                    name = potential
+                    break
+        if name is None and looks_like_name(title):
+            name = title
+    if not name:
+        return None
+    name = NAME_RE.match(name).group(1)
+
+    snippet = doc.text[:500]
+    affiliation = extract_affiliation(title, snippet) or default_affiliation
+
+    # Prefer an explicit personal homepage link over the directory profile
+    website = doc.source_url
+    for link in doc.links:
+        if HOMEPAGE_TEXT_RE.search(link["text"]) and urlparse(link["url"]).scheme in ("http", "https"):
+            website = link["url"]
+            break
+
+    return {"name": name, "affiliation": affiliation, "website_url": website, "profile_url": doc.source_url}
+
+
+def _visit(url: str, kind: str, seed_host: str, safe_urls_only: bool, default_affiliation: str = "") -> Dict:
+    """Worker-thread part of a visit: network + parsing, no DB access."""
+    check_url = None
+    if safe_urls_only:
+        from search.image_scraper import is_safe_url, check_redirect
+        if not is_safe_url(url):
+            return {"url": url, "ok": False, "error": "Unsafe URL"}
+        check_url = check_redirect
+
+    fetched = fetcher.fetch_url(url, check_url=check_url)
+    if not fetched["raw_html"]:
+        return {"url": url, "ok": False, "error": fetched["error_msg"]}
+
+    html, _ = cleaner.truncate_html(fetched["raw_html"])
+    doc = document.parse_document(html, url)
+    result = {"url": url, "ok": True, "error": None, "title": ""}
+    if doc.tree is not None:
+        result["title"] = " ".join((doc.tree.findtext(".//title") or "").split())
+    if kind == "listing":
+        result["links"] = classify_links(doc, seed_host)
+    else:
+        result["candidate"] = extract_candidate(doc, default_affiliation)
+    return result
+
+
+class FacultyCrawler:
+    def __init__(self, db: Session, crawl: models.CrawlRun, safe_urls_only: bool = True, concurrency: int = CONCURRENCY):
+        self.db = db
+        self.crawl = crawl
+        self.safe_urls_only = safe_urls_only
+        self.concurrency = max(concurrency, 1)
+        self.seed_host = urlparse(canonical_url(crawl.seed_url)).netloc
+        self.seen = set(url for (url,) in db.query(models.CrawlFrontier.url).filter(models.CrawlFrontier.crawl_id == crawl.id))
+
+    def _add(self, url: str, depth: int, kind: str):
+        if url in self.seen:
+            return
+        self.seen.add(url)
+        self.db.add(models.CrawlFrontier(crawl_id=self.crawl.id, url=url, depth=depth, kind=kind, status="pending"))
+
+    def run(self) -> models.CrawlRun:
+        crawl = self.crawl
+        if not self.seen:
+            self._add(canonical_url(crawl.seed_url), 0, "listing")
+        crawl.status = "running"
+        self.db.commit()
+
+        while crawl.pages_fetched < crawl.max_pages:
+            budget = crawl.max_pages - crawl.pages_fetched
+            wave = self.db.query(models.CrawlFrontier).filter(
+                models.CrawlFrontier.crawl_id == crawl.id,
+                models.CrawlFrontier.status == "pending"
+            ).order_by(models.CrawlFrontier.depth, models.CrawlFrontier.id).limit(min(self.concurrency * 4, budget)).all()
+            if not wave:
+                break
+
+            wave = scheduler.interleave_by_host(wave, url_of=lambda row: row.url)
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="crawl") as pool:
+                results = list(pool.map(
+                    lambda row: _visit(row.url, row.kind, self.seed_host, self.safe_urls_only, crawl.default_affiliation or ""),
+                    wave
+                ))
+
+            candidates = []
+            for row, res in zip(wave, results):
+                row.status = "done" if res["ok"] else "failed"
+                row.error = res["error"]
+                crawl.pages_fetched += 1
+                if not res["ok"]:
+                    continue
+
+                if row.kind == "listing":
+                    if row.depth == 0 and not crawl.default_affiliation:
+                        from search.engine import extract_affiliation
+                        crawl.default_affiliation = extract_affiliation(res["title"], "") or None
+                    links = res["links"]
+                    for url in links["pagination"]:
+                        self._add(url, row.depth, "listing") # pagination doesn't cost depth
+                    for url in links["profile"]:
+                        self._add(url, row.depth + 1, "profile")
+                    if row.depth + 1 <= crawl.max_depth:
+                        for url in links["listing"]:
+                            self._add(url, row.depth + 1, "listing")
+                elif res["candidate"]:
+                    candidates.append(res["candidate"])
+
+            crawl.professors_created += self._create_professors(candidates)
+            crawl.updated_at = datetime.utcnow()
+            self.db.commit() # checkpoint: frontier + professors for this wave
+            logger.info(f"[Crawler] crawl {crawl.id}: {crawl.pages_fetched} pages, {crawl.professors_created} professors")
+
+        pending = self.db.query(models.CrawlFrontier).filter(
+            models.CrawlFrontier.crawl_id == crawl.id,
+            models.CrawlFrontier.status == "pending"
+        ).count()
+        crawl.status = "done" if not pending else "budget_exhausted"
+        crawl.updated_at = datetime.utcnow()
+        self.db.commit()
+        return crawl
+
+    def _create_professors(self, candidates: List[Dict]) -> int:
+        if not candidates:
+            return 0
+        user_id = self.crawl.user_id
+        urls = {c["website_url"] for c in candidates} | {c["profile_url"] for c in candidates}
+        existing = set(url for (url,) in self.db.query(models.Professor.website_url).filter(
+            models.Professor.user_id == user_id,
+            models.Professor.website_url.in_(urls)
+        ))
+
+        professors = []
+        for c in candidates:
+            if c["website_url"] in existing or c["profile_url"] in existing:
+                continue
+            existing.add(c["website_url"])
+            professors.append(models.Professor(
+                user_id=user_id,
+                name=c["name"],
+                affiliation=c["affiliation"] or "",
+                website_url=c["website_url"]
+            ))
+        if not professors:
+            return 0
+
+        self.db.add_all(professors)
+        self.db.flush()
+        self.db.add_all([models.PipelineStatus(professor_id=p.id) for p in professors])
+        search_index.index_professors(self.db, [p.id for p in professors])
+        return len(professors)
+
+
+def run_crawl(db: Session, crawl: models.CrawlRun, safe_urls_only: bool = True) -> models.CrawlRun:
+    return FacultyCrawler(db, crawl, safe_urls_only=safe_urls_only).run()
@@ -0,0 +1,313 @@
+"""
+Parsed Document — parse a fetched page once, read it many times.
+
+The ingest pipeline used to parse the same HTML up to four times
+(readability, BeautifulSoup for images, BeautifulSoup again in the avatar
+scraper). ParsedDocument builds one lxml tree per fetch and derives clean
+text, meta tags, image candidates and links from it lazily.
+
+Recently parsed documents are kept in a small in-process cache keyed by URL,
+so /extract_avatar right after /ingest doesn't download or parse again.
+When the parse ran in a services/cpu_pool worker, the document stays in
+that process; the ingest then caches the page's scored image candidates
+here instead (cache_image_candidates), which is all the avatar step reads.
+
+Text extraction modes (extract_text(mode), default CLEANER_TEXT_MODE):
+    fast         one walk over the lxml tree, skipping script/style, nav,
+                 footer, aside, forms and nav/menu/footer-classed blocks
+    readability  readability article extraction (slower; better on
+                 cluttered CMS pages)
+    auto         fast, unless the fast text is mostly link text (a menu or
+                 link farm around the content), then readability
+"""
+import copy
+import os
+import re
+import threading
+import time
+import logging
+from typing import Dict, List, Optional
+from urllib.parse import urljoin
+
+import lxml.html
+from cachetools import TTLCache
+from readability import Document
+
+logger = logging.getLogger(__name__)
+
+_utf8_parser = lxml.html.HTMLParser(encoding="utf-8")
+
+# Text nodes that are not code/markup and not comments
+_TEXT_XPATH = ".//text()[not(ancestor::script) and not(ancestor::style) and not(ancestor::noscript)]"
+
+TEXT_MODES = ("auto", "fast", "readability")
+TEXT_MODE = os.getenv("CLEANER_TEXT_MODE", "auto")
+# auto: share of the fast text inside <a> above which readability is used
+AUTO_LINK_DENSITY = float(os.getenv("CLEANER_AUTO_LINK_DENSITY", "0.5"))
+
+# Subtrees the fast extractor drops
+_SKIP_TAGS = {
+    "script", "style", "noscript", "template", "nav", "footer", "aside",
+    "form", "button", "select", "iframe", "svg", "head",
+}
+_SKIP_ROLES = {"navigation", "banner", "contentinfo", "search", "menu", "menubar"}
+_SKIP_CLASS_RE = re.compile(r"(^|[\s_-])(nav|navbar|navigation|menu|footer|breadcrumbs?|sidebar|cookies?|skip)([\s_-]|$)", re.IGNORECASE)
+
+# Parse counters (full-page parses only) and which text path ran
+_stats_lock = threading.Lock()
+_stats = {"parses": 0, "parse_ms": 0.0, "text_fast": 0, "text_readability": 0}
+
+
+def get_parse_stats() -> Dict:
+    with _stats_lock:
+        return dict(_stats, parse_ms=round(_stats["parse_ms"], 1))
+
+
+def reset_parse_stats():
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0
+        _stats["parse_ms"] = 0.0
+
+
+def tree_text(element) -> str:
+    """Newline-separated, stripped text of an element (like BeautifulSoup get_text("\\n", strip=True))."""
+    parts = (t.strip() for t in element.xpath(_TEXT_XPATH))
+    return "\n".join(p for p in parts if p)
+
+
+def _skip(element) -> bool:
+    tag = element.tag
+    if not isinstance(tag, str): # comments, processing instructions
+        return True
+    if tag in _SKIP_TAGS:
+        return True
+    if (element.get("role") or "").lower() in _SKIP_ROLES or element.get("aria-hidden") == "true":
+        return True
+    if tag == "header" and element.find(".//nav") is not None:
+        return True # site banner with the menu, not the page title
+    marker = f"{element.get('id') or ''} {element.get('class') or ''}"
+    return bool(marker.strip()) and bool(_SKIP_CLASS_RE.search(marker))
+
+
+class CleaningTimeout(TimeoutError):
+    pass
+
+
+def _check_deadline(deadline: Optional[float]):
+    if deadline is not None and time.time() > deadline:
+        raise CleaningTimeout("Text extraction deadline exceeded")
+
+
+def fast_text(element, deadline: Optional[float] = None):
+    """
+    tree_text() without page chrome, in one pass.
+    Returns (text, link_density) where link_density is the share of the
+    text's characters that sit inside <a> tags.
+    deadline (a time.time() timestamp) is checked every few thousand nodes.
+    """
+    parts = []
+    total = 0
+    linked = 0
+
+    def add(text, in_link):
+        nonlocal total, linked
+        text = text.strip() if text else ""
+        if text:
+            parts.append(text)
+            total += len(text)
+            if in_link:
+                linked += len(text)
+
+    # Iterative walk: (element, inside_link). Tails belong to the parent, so
+    # they are emitted even when the element itself is skipped.
+    stack = [(element, False, False)]
+    visited = 0
+    while stack:
+        node, in_link, is_tail = stack.pop()
+        visited += 1
+        if visited % 4096 == 0:
+            _check_deadline(deadline)
+        if is_tail:
+            add(node.tail, in_link)
+            continue
+        if node is not element and _skip(node):
+            continue
+        in_link = in_link or node.tag == "a"
+        add(node.text, in_link)
+        for child in reversed(node):
+            stack.append((child, in_link, True))
+            stack.append((child, in_link, False))
+    return "\n".join(parts), (linked / total if total else 0.0)
+
+
+class _TreeDocument(Document):
+    """readability Document that works on a copy of an existing tree instead of reparsing."""
+
+    def _parse(self, input):
+        # readability mutates the tree and may re-run _parse on retry,
+        # so every pass gets a fresh copy of the shared tree
+        return super()._parse(copy.deepcopy(input))
+
+
+class ParsedDocument:
+    def __init__(self, raw_html: str, source_url: str = ""):
+        self.raw_html = raw_html or ""
+        self.source_url = source_url
+        self._tree = None
+        self._parsed = False
+        self._texts = {}
+        self._meta = None
+        self._images = None
+        self._links = None
+
+    # --- Tree ---
+    @property
+    def tree(self):
+        if not self._parsed:
+            self._parsed = True
+            if self.raw_html.strip():
+                started = time.perf_counter()
+                try:
+                    self._tree = lxml.html.document_fromstring(
+                        self.raw_html.encode("utf-8", "replace"), parser=_utf8_parser
+                    )
+                except Exception as e:
+                    logger.warning(f"[Document] Parse failed for {self.source_url}: {e}")
+                with _stats_lock:
+                    _stats["parses"] += 1
+                    _stats["parse_ms"] += (time.perf_counter() - started) * 1000
+        return self._tree
+
+    # --- Clean text ---
+    @property
+    def text(self) -> str:
+        return self.extract_text()
+
+    def extract_text(self, mode: Optional[str] = None, deadline: Optional[float] = None) -> str:
+        """
+        Clean text using mode "auto", "fast" or "readability" (default CLEANER_TEXT_MODE).
+        Raises CleaningTimeout if deadline (time.time() timestamp) passes between steps.
+        """
+        mode = mode or TEXT_MODE
+        if mode not in TEXT_MODES:
+            raise ValueError(f"Unknown text mode: {mode}")
+        if mode not in self._texts:
+            used = "fast"
+            tree = self.tree
+            _check_deadline(deadline)
+            if tree is None:
+                self._texts[mode] = ""
+            elif mode == "readability":
+                self._texts[mode] = self._readability_text()
+                used = "readability"
+            else:
+                text, link_density = fast_text(tree, deadline)
+                self._texts["fast"] = text
+                if mode == "auto":
+                    # A page that is mostly links is menus around the content; let readability find it
+                    if link_density > AUTO_LINK_DENSITY:
+                        _check_deadline(deadline)
+                        text = self._readability_text()
+                        used = "readability"
+                    self._texts["auto"] = text
+            with _stats_lock:
+                _stats[f"text_{used}"] += 1
+        return self._texts[mode]
+
+    def _readability_text(self) -> str:
+        # Readability article, falls back to the whole page
+        if "readability" not in self._texts:
+            try:
+                summary_html = _TreeDocument(self.tree).summary()
+                self._texts["readability"] = tree_text(lxml.html.fromstring(summary_html))
+            except Exception:
+                # Fallback if readability fails
+                self._texts["readability"] = tree_text(self.tree)
+        return self._texts["readability"]
+
+    # --- Meta tags: {"og:image": "...", "description": "..."} ---
+    @property
+    def meta(self) -> Dict[str, str]:
+        if self._meta is None:
+            self._meta = {}
+            if self.tree is not None:
+                for tag in self.tree.iter("meta"):
+                    key = (tag.get("property") or tag.get("name") or "").strip().lower()
+                    content = tag.get("content")
+                    if key and content and key not in self._meta:
+                        self._meta[key] = content.strip()
+        return self._meta
+
+    # --- <img> tags with absolute URLs ---
+    @property
+    def images(self) -> List[Dict]:
+        if self._images is None:
+            self._images = []
+            if self.tree is not None:
+                for img in self.tree.iter("img"):
+                    src = (img.get("src") or "").strip()
+                    self._images.append({
+                        "src": src,
+                        "url": self.absolute(src) if src else None,
+                        "alt": img.get("alt") or "",
+                        "class": img.get("class") or "",
+                        "id": img.get("id") or "",
+                    })
+        return self._images
+
+    # --- <a href> links with absolute URLs ---
+    @property
+    def links(self) -> List[Dict]:
+        if self._links is None:
+            self._links = []
+            if self.tree is not None:
+                for a in self.tree.iter("a"):
+                    href = (a.get("href") or "").strip()
+                    if not href or href.startswith(("#", "javascript:", "mailto:")):
+                        continue
+                    self._links.append({
+                        "url": self.absolute(href),
+                        "text": " ".join(a.text_content().split()),
+                    })
+        return self._links
+
+    def absolute(self, url: str) -> Optional[str]:
+        if not url:
+            return None
+        return urljoin(self.source_url, url)
+
+
+# --- Recently parsed documents (per process) ---
+CACHE_SIZE = int(os.getenv("DOCUMENT_CACHE_SIZE", "32"))
+CACHE_TTL = int(os.getenv("DOCUMENT_CACHE_TTL", "600"))
+
+_cache = TTLCache(maxsize=CACHE_SIZE, ttl=CACHE_TTL)
+_candidates = TTLCache(maxsize=CACHE_SIZE, ttl=CACHE_TTL)
+_cache_lock = threading.Lock()
+
+
+def parse_document(raw_html: str, source_url: str = "", cache: bool = False) -> ParsedDocument:
+    doc = ParsedDocument(raw_html, source_url)
+    if cache and source_url and raw_html:
+        with _cache_lock:
+            _cache[source_url] = doc
+    return doc
+
+
+def get_cached_document(source_url: str) -> Optional[ParsedDocument]:
+    with _cache_lock:
+        return _cache.get(source_url)
+
+
+def cache_image_candidates(source_url: str, candidates: List[str]):
+    """Avatar candidates of a page parsed elsewhere (e.g. in a CPU pool worker)."""
+    if source_url and candidates is not None:
+        with _cache_lock:
+            _candidates[source_url] = list(candidates)
+
+
+def get_cached_image_candidates(source_url: str) -> Optional[List[str]]:
+    with _cache_lock:
+        candidates = _candidates.get(source_url)
+    return list(candidates) if candidates is not None else None
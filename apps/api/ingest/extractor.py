@@ -1,5 +1,93 @@
+import os
 import re
 import json
+from typing import Callable, Dict, List, Optional
+
+from ingest import keywords, publications
+
+# Part of the card memo key (services/pipeline.py): bump on any change that
+# alters extract_professor_card output, so stored cards get re-extracted
+EXTRACTOR_VERSION = "4"
+
+# Texts per CPU-pool task in extract_professor_cards
+BATCH_CHUNK = int(os.getenv("CARD_BATCH_CHUNK", "25"))
+
+SELECTED_PUBLICATIONS = 3 # printed entries in selected_publications
+PUBLICATION_LIMIT = 10 # structured records in publications
+
+# --- Compiled rules ---
+# Look for strong signals of active hiring
+# (matched against the lowercased text, so the "Ph.D" alternatives only ever match via "students")
+HIRING_PATTERNS = [
+    r"looking for (Ph\.?D\.?|students|postdocs|research assistants)",
+    r"openings? for",
+    r"recruiting (Ph\.?D\.?|students)",
+    r"accepting (new )?students",
+    r"join (my|our) (lab|group|team)",
+    r"available positions?",
+    r"apply for",
+    r"fall 202[4-9]", # Update year logic dynamically if needed, but this covers next few years
+]
+HIRING_SCAN_LINES = 100 # hiring info usually at top
+
+# Every line-level rule is a branch of one alternation, so a single finditer
+# over the lowercased text finds every hiring signal, section header and
+# section boundary. Branches stay ungrouped (each starts with a literal, which
+# lets re skip ahead to candidate characters), and a match is attributed to
+# the first rule that matches at its position, as the alternation does.
+# Branches must not overlap: a match hides anything it consumes.
+LINE_RULES = {
+    # Next line (after leading whitespace) starts a section; never recorded for line 0
+    "boundary": r"\n[^\S\n]*(?=selected|public|award|teaching)",
+    "hiring": "|".join(f"(?:{pattern})" for pattern in HIRING_PATTERNS),
+    "interests": r"interests|areas|focus",
+    "publications": r"publications|papers",
+}
+LINE_RULES_RE = re.compile("|".join(LINE_RULES.values()))
+_RULE_RES = [(name, re.compile(pattern)) for name, pattern in LINE_RULES.items()]
+
+# Section rules were case-insensitive searches of the original lines. On
+# lowercased text that is the same, except for letters (?i) equates with
+# ASCII that lower() leaves alone (ı, ſ) or expands (İ). Texts with those get
+# the section rules re-run with IGNORECASE on the original text.
+SECTION_RULES = ("boundary", "interests", "publications")
+_CASE_EXCEPTIONS_RE = re.compile("[\u0130\u0131\u017f]")
+_SECTION_RULES_RE = re.compile("|".join(LINE_RULES[name] for name in SECTION_RULES), re.IGNORECASE)
+_SECTION_RULE_RES = [(name, re.compile(LINE_RULES[name], re.IGNORECASE)) for name in SECTION_RULES]
+
+INTERESTS_RE = re.compile(r"(?i)(current )?(research\s+)?(interests|areas|focus)\s*[:\-\u2013\u2014]?\s*(.*)")
+INLINE_SPLIT_RE = re.compile(r'[,;]')
+LIST_SPLIT_RE = re.compile(r'[,;•\-\*]')
+YEAR_RE = re.compile(r"\b(19|20)\d{2}\b")
+BULLET_RE = re.compile(r"^[\-•\*]")
+
+
+def _scan(text: str, combined_re, rule_res) -> Dict[str, List[int]]:
+    hits = {name: [] for name, _ in rule_res}
+    line, last = 0, 0
+    for match in combined_re.finditer(text):
+        start = match.start()
+        name = next(name for name, rule_re in rule_res if rule_re.match(text, start))
+        # Boundary matches start on the previous line's "\n"; count from their end
+        position = match.end() if name == "boundary" else start
+        line += text.count("\n", last, position)
+        last = position
+        found = hits[name]
+        if not found or found[-1] != line:
+            found.append(line)
+    return hits
+
+
+def index_lines(text: str) -> Dict[str, List[int]]:
+    """
+    One pass of LINE_RULES over the lowercased text.
+    Returns rule name -> ascending line numbers (split on "\n") with a match.
+    """
+    hits = _scan(text.lower(), LINE_RULES_RE, _RULE_RES)
+    if _CASE_EXCEPTIONS_RE.search(text):
+        hits.update(_scan(text, _SECTION_RULES_RE, _SECTION_RULE_RES))
+    return hits
+
 
 def extract_professor_card(text: str) -> dict:
     """
@@ -9,6 +97,7 @@ def extract_professor_card(text: str) -> dict:
         "summary": "",
         "research_interests": [],
         "selected_publications": [],
+        "publications": [],
         "hiring_signals": []
     }
     
@@ -17,50 +106,36 @@ def extract_professor_card(text: str) -> dict:
 
     # 1. Parsing Helpers
     lines = text.split('\n')
-    text_lower = text.lower()
+    index = index_lines(text)
+    boundaries = set(index["boundary"])
 
     # --- A. Hiring Signal Matcher ---
-    # Look for strong signals of active hiring
-    hiring_keywords = [
-        r"looking for (Ph\.?D\.?|students|postdocs|research assistants)",
-        r"openings? for",
-        r"recruiting (Ph\.?D\.?|students)",
-        r"accepting (new )?students",
-        r"join (my|our) (lab|group|team)",
-        r"available positions?",
-        r"apply for",
-        r"fall 202[4-9]", # Update year logic dynamically if needed, but this covers next few years
-    ]
-    
-    # Store unique detected signals
-    detected_signals = set()
-    
-    # Scan first 100 lines for efficiency (hiring info usually at top)
-    for line in lines[:100]:
-        line_lower = line.lower()
-        for pattern in hiring_keywords:
-            if re.search(pattern, line_lower):
-                # Clean up the line for display (truncate if too long)
-                clean_signal = line.strip()
-                if len(clean_signal) > 100:
-                   clean_signal = clean_signal[:100] + "..."
-                detected_signals.add(clean_signal)
-    
+    # Store unique detected signals (in page order)
+    detected_signals = {}
+
+    for i in index["hiring"]:
+        if i >= HIRING_SCAN_LINES:
+            break
+        # Clean up the line for display (truncate if too long)
+        clean_signal = lines[i].strip()
+        if len(clean_signal) > 100:
+           clean_signal = clean_signal[:100] + "..."
+        detected_signals[clean_signal] = None
+
     card["hiring_signals"] = list(detected_signals)
 
     # --- B. Extract Research Interests ---
     # Improve existing logic
-    interests_pattern = re.compile(r"(?i)(current )?(research\s+)?(interests|areas|focus)\s*[:\-\u2013\u2014]?\s*(.*)")
-    
     found_explicit_interests = False
-    for i, line in enumerate(lines):
-        match = interests_pattern.search(line)
+    for i in index["interests"]:
+        line = lines[i]
+        match = INTERESTS_RE.search(line)
         if match:
             content = match.group(4).strip()
             
             # If explicit interests are on the same line
             if content and len(content) > 3:
-                items = [item.strip() for item in re.split(r'[,;]', content) if len(item.strip()) > 2]
+                items = [item.strip() for item in INLINE_SPLIT_RE.split(content) if len(item.strip()) > 2]
                 card["research_interests"].extend(items)
                 found_explicit_interests = True
             # If header is on its own line, look at next lines
@@ -70,10 +145,10 @@ def extract_professor_card(text: str) -> dict:
                     if i + j >= len(lines): break
                     next_line = lines[i+j].strip()
                     if not next_line: continue
-                    if re.match(r"(?i)(selected|public|award|teaching)", next_line): break # hit next section
+                    if i + j in boundaries: break # hit next section
                     
                     # Split comma separated lists or take bullet points
-                    items = [item.strip() for item in re.split(r'[,;•\-\*]', next_line) if len(item.strip()) > 3 and len(item.strip()) < 50]
+                    items = [item.strip() for item in LIST_SPLIT_RE.split(next_line) if len(item.strip()) > 3 and len(item.strip()) < 50]
                     card["research_interests"].extend(items)
                     if items: found_explicit_interests = True
             
@@ -81,29 +156,10 @@ def extract_professor_card(text: str) -> dict:
                 break 
 
     # --- C. Keyword Extractor (Fallback) ---
-    # If no explicit interests found, do a simple frequency analysis of capitalized phrases
+    # If no explicit interests found, rank the page's Title-Case phrases by
+    # TF-IDF against every ingested page (ingest/keywords.py)
     if not card["research_interests"]:
-        # Exclude common words
-        common_stops = {"the", "and", "for", "with", "university", "professor", "department", "science", "school", "research"}
-        
-        # Find 2-3 word phrases that appear frequently or are capitalized (Concept, Machine Learning, etc)
-        # This is a dumb heuristic replacing NLP for now
-        candidates = {}
-        # Look for Title Case phrases in the text
-        phrase_pattern = re.compile(r'\b[A-Z][a-z]+ [A-Z][a-z]+(?: [A-Z][a-z]+)?\b')
-        matches = phrase_pattern.findall(text)
-        
-        for m in matches:
-            if m.lower() in candidates:
-                candidates[m.lower()]['count'] += 1
-            else:
-                # Filter out likely names or boring headers
-                if any(w.lower() in common_stops for w in m.split()): continue
-                candidates[m.lower()] = {'text': m, 'count': 1}
-        
-        # Sort by count
-        sorted_candidates = sorted(candidates.values(), key=lambda x: x['count'], reverse=True)
-        card["research_interests"] = [item['text'] for item in sorted_candidates[:5]]
+        card["research_interests"] = keywords.get_model().rank(text, limit=5)
 
     # Fallback: limit interests
     if len(card["research_interests"]) > 6:
@@ -111,29 +167,14 @@ def extract_professor_card(text: str) -> dict:
 
 
     # --- D. Extract Publications ---
-    pub_header_idx = -1
-    for i, line in enumerate(lines):
-        if re.search(r"(?i)(selected|recent)\s+publications|publications", line):
-            pub_header_idx = i
-            break
-            
-    if pub_header_idx != -1:
-        count = 0
-        # Look for lines that look like citations
-        for i in range(pub_header_idx + 1, min(len(lines), pub_header_idx + 100)):
-            line = lines[i].strip()
-            if not line: continue
-            
-            # Heuristic: Contains Year (199x-202x) AND (Author-ish or Quotes)
-            # 1. Check Year
-            if re.search(r"\b(19|20)\d{2}\b", line) and len(line) > 40:
-                # 2. Check for typical paper indicators: "et al", quoted title, conference acronyms
-                if re.search(r"et al|pp\.|vol\.|proc\.|conf\.|arXiv|CVPR|ICML|NeurIPS|ICLR|ECCV", line, re.IGNORECASE) or '"' in line:
-                    card["selected_publications"].append(line)
-                    count += 1
-            
-            if count >= 3:
-                break
+    # Entries after the first publications header, split into title/authors/venue/year
+    if index["publications"]:
+        start = index["publications"][0] + 1
+        records = publications.parse_section(lines[start:start + publications.SCAN_LINES], limit=PUBLICATION_LIMIT)
+        card["selected_publications"] = [record["text"] for record in records[:SELECTED_PUBLICATIONS]]
+        card["publications"] = [
+            {key: record[key] for key in ("title", "authors", "venue", "year")} for record in records
+        ]
 
     # --- E. Summary ---
     # Take the first substantial paragraph that isn't a header
@@ -141,9 +182,63 @@ def extract_professor_card(text: str) -> dict:
         clean = line.strip()
         if len(clean) > 80:
              # Skip if it looks like a list item or citation
-             if re.match(r"^[\-•\*]", clean) or re.search(r"\b(19|20)\d{2}\b", clean):
+             if BULLET_RE.match(clean) or YEAR_RE.search(clean):
                  continue
              card["summary"] = clean[:300] + "..."
              break
 
     return card
+
+
+def extract_chunk(texts: List[str]) -> List[dict]:
+    return [extract_professor_card(text) for text in texts]
+
+
+def extract_professor_cards(
+    texts: List[str],
+    chunk_size: Optional[int] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> List[Optional[dict]]:
+    """
+    Cards for many texts, in input order.
+    Chunks of CARD_BATCH_CHUNK texts run in parallel in the services/cpu_pool
+    processes (one task per chunk, so pickling is amortized). A chunk that
+    times out or kills its worker is retried text by text; texts that still
+    fail get None.
+    progress(done, total) is called as chunks finish.
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    from services import cpu_pool
+
+    if not texts:
+        return []
+    size = max(chunk_size or BATCH_CHUNK, 1)
+    chunks = [texts[i:i + size] for i in range(0, len(texts), size)]
+    pool = cpu_pool.get_pool()
+
+    def run_chunk(chunk):
+        try:
+            return pool.run(extract_chunk, chunk)
+        except cpu_pool.TaskFailed:
+            if len(chunk) == 1:
+                return [None]
+            cards = []
+            for text in chunk:
+                try:
+                    cards.append(pool.run(extract_professor_card, text))
+                except cpu_pool.TaskFailed:
+                    cards.append(None)
+            return cards
+
+    results = [None] * len(chunks)
+    done = 0
+    # One submitting thread per pool process keeps them all busy
+    with ThreadPoolExecutor(max_workers=max(1, min(pool.workers, len(chunks))), thread_name_prefix="cards") as executor:
+        futures = {executor.submit(run_chunk, chunk): i for i, chunk in enumerate(chunks)}
+        for future in as_completed(futures):
+            i = futures[future]
+            results[i] = future.result()
+            done += len(chunks[i])
+            if progress:
+                progress(done, len(texts))
+    return [card for chunk in results for card in chunk]
@@ -1,33 +1,78 @@
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+import os
+from typing import Callable
+
+from services import http_client, http_cache, singleflight
+
+# Bodies past this are cut off (the page is stored as "truncated")
+MAX_BYTES = int(os.getenv("FETCH_MAX_BYTES", str(5 * 1024 * 1024)))
+# Anything else (PDF CVs, images, archives) is rejected before the body is downloaded
+HTML_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
 
 def get_fetcher_session():
-    session = requests.Session()
-    retry = Retry(connect=3, backoff_factor=0.5)
-    adapter = HTTPAdapter(max_retries=retry)
-    session.mount('http://', adapter)
-    session.mount('https://', adapter)
-    session.headers.update({
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-    })
-    return session
+    # Shared process-wide session (keep-alive pools per host)
+    return http_client.get_session()
+
+def fetch_url(url: str, timeout: int = 15, etag: str = None, last_modified: str = None, max_bytes: int = None,
+              check_url: Callable[[str], None] = None):
+    """
+    Fetches a page. If validators from a previous fetch are given, sends a
+    conditional request; a 304 comes back as fetch_status "not_modified"
+    with no body. Goes through the shared HTTP cache, so a fresh cached copy
+    whose validators match counts as "not_modified" too.
+    The body is streamed and capped at max_bytes (FETCH_MAX_BYTES); a capped
+    page comes back as fetch_status "truncated". Non-HTML responses fail
+    without downloading the body. check_url is called on every redirect hop
+    (see http_cache.get); a hop it rejects fails the fetch.
+    Concurrent fetches of the same URL with the same validators, cap and
+    check share one download (services/singleflight.py).
+    """
+    key = singleflight.make_key(http_cache.cache_key(url), etag, last_modified, max_bytes or MAX_BYTES, check_url)
+    return singleflight.group("fetch").do(key, _fetch_url, url, timeout, etag, last_modified, max_bytes, check_url, copy_result=dict)
+
+def _fetch_url(url: str, timeout: int = 15, etag: str = None, last_modified: str = None, max_bytes: int = None,
+               check_url: Callable[[str], None] = None):
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
 
-def fetch_url(url: str, timeout: int = 15):
-    session = get_fetcher_session()
     try:
-        response = session.get(url, timeout=timeout)
+        response = http_cache.get(
+            url, timeout=timeout, headers=headers,
+            max_bytes=max_bytes or MAX_BYTES, truncate=True, accept_types=HTML_TYPES, check_url=check_url
+        )
+        validators = {
+            "etag": response.headers.get("ETag") or etag,
+            "last_modified": response.headers.get("Last-Modified") or last_modified
+        }
+        unchanged = response.from_cache and (etag or last_modified) and (
+            (not etag or response.headers.get("ETag") == etag) and
+            (not last_modified or response.headers.get("Last-Modified") == last_modified)
+        )
+        if response.status_code == 304 or unchanged:
+            return {
+                "source_url": url,
+                "raw_html": None,
+                "fetch_status": "not_modified",
+                "error_msg": None,
+                **validators
+            }
         response.raise_for_status()
         return {
             "source_url": url,
             "raw_html": response.text,
-            "fetch_status": "ok",
-            "error_msg": None
+            "fetch_status": "truncated" if response.truncated else "ok",
+            "error_msg": f"Body truncated at {max_bytes or MAX_BYTES} bytes" if response.truncated else None,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified")
         }
     except Exception as e:
         return {
             "source_url": url,
             "raw_html": None,
             "fetch_status": "failed",
-            "error_msg": str(e)
+            "error_msg": str(e),
+            "etag": None,
+            "last_modified": None
         }
@@ -0,0 +1,229 @@
+"""
+Keyword model — corpus-wide document frequencies for the research-interest fallback.
+
+When a page has no "Research Interests" section, extractor.py ranks the
+page's Title-Case phrases by TF-IDF: how often a phrase occurs on the page
+times how rare it is across all ingested pages. Phrases most faculty pages
+share ("Computer Science", "Office Hours", "Google Scholar") sink, the ones
+a page is actually about rise.
+
+Storage: term_frequencies has one row per phrase, keyed by a 31-bit crc32
+of the lowercased phrase; row 0 holds the document count. A document is the
+latest usable SourcePage per (professor, url). Ingesting a new version adds
+its phrases and removes the previous version's (record_pages), so an update
+only touches the rows of those two texts. rebuild() recounts from scratch,
+e.g. after professors were deleted.
+
+In memory (KeywordModel) the counts are folded into an array of
+KEYWORD_BUCKETS ints (term id mod buckets), so ranking is array lookups.
+Each process (API workers, cpu_pool workers) loads the table on first use
+and again after KEYWORD_MODEL_TTL seconds; the process recording pages
+applies its own changes immediately.
+
+Cards are memoized on text hash + EXTRACTOR_VERSION, so fallback interests
+reflect the corpus as it was when the card was extracted.
+
+Config (env):
+    KEYWORD_BUCKETS     in-memory table size (default 262144)
+    KEYWORD_MODEL_TTL   seconds before a process reloads the table (default 300)
+"""
+import os
+import re
+import math
+import time
+import zlib
+import threading
+import logging
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+BUCKETS = int(os.getenv("KEYWORD_BUCKETS", str(1 << 18)))
+MODEL_TTL = float(os.getenv("KEYWORD_MODEL_TTL", "300"))
+
+DOCUMENT_COUNT_ID = 0
+PHRASE_RE = re.compile(r'\b[A-Z][a-z]+ [A-Z][a-z]+(?: [A-Z][a-z]+)?\b')
+# Phrases with any of these words are never interests
+STOP_WORDS = {"the", "and", "for", "with", "university", "professor", "department", "science", "school", "research"}
+
+
+def term_id(phrase: str) -> int:
+    """Stable across processes and restarts (unlike hash()); never DOCUMENT_COUNT_ID."""
+    return (zlib.crc32(phrase.lower().encode("utf-8")) & 0x7FFFFFFF) or 1
+
+
+def document_terms(text: str) -> set:
+    """Ids of the distinct candidate phrases in a text."""
+    return {term_id(phrase) for phrase in set(PHRASE_RE.findall(text or ""))}
+
+
+def frequency_deltas(added: Iterable[str] = (), removed: Iterable[str] = ()) -> Dict[int, int]:
+    """term id -> change in document frequency for texts entering/leaving the corpus."""
+    deltas = Counter()
+    for text in added:
+        deltas.update(document_terms(text))
+        deltas[DOCUMENT_COUNT_ID] += 1
+    for text in removed:
+        deltas.subtract(document_terms(text))
+        deltas[DOCUMENT_COUNT_ID] -= 1
+    return {tid: delta for tid, delta in deltas.items() if delta}
+
+
+class KeywordModel:
+    def __init__(self, buckets: int = BUCKETS):
+        self.buckets = max(buckets, 1)
+        self.df = array("l", bytes(array("l").itemsize * self.buckets))
+        self.documents = 0
+        self.loaded_at = time.monotonic()
+
+    def apply(self, deltas: Dict[int, int]):
+        df, buckets = self.df, self.buckets
+        for tid, delta in deltas.items():
+            if tid == DOCUMENT_COUNT_ID:
+                self.documents += delta
+            else:
+                df[tid % buckets] += delta
+
+    def add_texts(self, texts: Iterable[str]):
+        self.apply(frequency_deltas(added=texts))
+
+    def rank(self, text: str, limit: int = 5) -> List[str]:
+        """
+        Top phrases of a text by TF-IDF (smoothed idf: ln((1 + N) / (1 + df)) + 1).
+        Ties keep page order, so with an empty corpus this is plain frequency.
+        Phrases from the page heading (the first line, usually the
+        professor's name) and phrases with STOP_WORDS are skipped.
+        """
+        if not text:
+            return []
+        heading = text.lstrip().split("\n", 1)[0]
+        counts: Dict[str, list] = {}
+        for phrase in PHRASE_RE.findall(text):
+            key = phrase.lower()
+            entry = counts.get(key)
+            if entry is not None:
+                entry[1] += 1
+            elif phrase not in heading and not any(word in STOP_WORDS for word in key.split()):
+                counts[key] = [phrase, 1]
+        if not counts:
+            return []
+
+        phrases = [phrase for phrase, _ in counts.values()]
+        tf = array("l", (count for _, count in counts.values()))
+        ids = array("l", (term_id(key) % self.buckets for key in counts))
+        df, n = self.df, self.documents + 1
+        scores = [count * (math.log(n / (1 + max(df[i], 0))) + 1) for count, i in zip(tf, ids)]
+        order = sorted(range(len(scores)), key=scores.__getitem__, reverse=True)
+        return [phrases[i] for i in order[:limit]]
+
+
+# --- Persistence ---
+
+def _insert(db):
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+def _upsert(db, deltas: Dict[int, int]):
+    import models
+
+    if not deltas:
+        return
+    table = models.TermFrequency.__table__
+    stmt = _insert(db)(table)
+    stmt = stmt.on_conflict_do_update(index_elements=[table.c.term_id], set_={"df": table.c.df + stmt.excluded.df})
+    # Sorted ids: concurrent ingests lock rows in the same order
+    db.execute(stmt, [{"term_id": tid, "df": deltas[tid]} for tid in sorted(deltas)])
+
+
+def record_pages(db, added: List[str], removed: List[str] = ()):
+    """
+    Adds the texts of new pages to the corpus and removes the texts they
+    replace. Runs in the caller's transaction; the caller commits.
+    """
+    deltas = frequency_deltas(added=[t for t in added if t], removed=[t for t in removed if t])
+    if not deltas:
+        return
+    _upsert(db, deltas)
+    with _lock:
+        if _model is not None:
+            _model.apply(deltas)
+
+
+def load(db, buckets: int = BUCKETS) -> KeywordModel:
+    import models
+
+    model = KeywordModel(buckets)
+    deltas = dict(db.query(models.TermFrequency.term_id, models.TermFrequency.df).all())
+    model.apply(deltas)
+    return model
+
+
+def rebuild(db) -> int:
+    """Recounts the table from the latest usable page per (professor, url). Returns the document count."""
+    import crud, models
+
+    latest = {}
+    rows = db.query(
+        models.SourcePage.professor_id, models.SourcePage.source_url, models.SourcePage.raw_text_hash
+    ).filter(
+        models.SourcePage.fetch_status.in_(crud.USABLE_FETCH_STATUSES),
+        models.SourcePage.raw_text_hash != None
+    ).order_by(models.SourcePage.fetched_at.asc())
+    for professor_id, url, text_hash in rows:
+        latest[(professor_id, url)] = text_hash
+
+    # Pages with identical text share a blob: count it once per page
+    documents = Counter(latest.values())
+    deltas = Counter()
+    hashes = list(documents)
+    for i in range(0, len(hashes), 200):
+        for blob in db.query(models.ContentBlob).filter(models.ContentBlob.hash.in_(hashes[i:i + 200])):
+            for tid in document_terms(blob.text):
+                deltas[tid] += documents[blob.hash]
+    deltas[DOCUMENT_COUNT_ID] = sum(documents.values())
+
+    db.query(models.TermFrequency).delete()
+    _upsert(db, {tid: df for tid, df in deltas.items() if df})
+    db.commit()
+    set_model(load(db), pinned=False)
+    logger.info(f"[Keywords] Rebuilt document frequencies from {deltas[DOCUMENT_COUNT_ID]} pages")
+    return deltas[DOCUMENT_COUNT_ID]
+
+
+# --- Process-wide model ---
+
+_lock = threading.Lock()
+_model: Optional[KeywordModel] = None
+_pinned = False
+
+
+def get_model() -> KeywordModel:
+    """The corpus model for this process, (re)loaded from the database every KEYWORD_MODEL_TTL seconds."""
+    global _model
+    with _lock:
+        if _model is None or (not _pinned and time.monotonic() - _model.loaded_at > MODEL_TTL):
+            from database import SessionLocal
+
+            db = SessionLocal()
+            try:
+                _model = load(db)
+            except Exception as e:
+                # No table yet (migrations not run) or no database: rank by frequency
+                logger.warning(f"[Keywords] Could not load document frequencies: {e}")
+                _model = KeywordModel()
+            finally:
+                db.close()
+        return _model
+
+
+def set_model(model: Optional[KeywordModel], pinned: bool = True):
+    """Replaces the process-wide model; a pinned model is never reloaded (scripts, benchmarks)."""
+    global _model, _pinned
+    with _lock:
+        _model, _pinned = model, pinned and model is not None
@@ -0,0 +1,251 @@
+"""
+Publication parser — turns the lines under a "Publications" header into
+records: {"title", "authors", "venue", "year", "text"}.
+
+Entries are found in one pass over the lines: a line with a year ends an
+entry, and lines without one (title / authors / "In RECOMB" on their own
+lines, as Jekyll and Google Sites themes print them) are buffered into the
+next entry. Venues come from a dictionary automaton: every name and acronym
+in venues.tsv (plus PUBLICATION_VENUES_FILE) is compiled into one
+trie-shaped regex, so a single finditer over the whole section finds every
+venue mention, longest name first, without trying names one by one. Each
+entry then takes the first venue after its title and maps it to the
+canonical name (NIPS and "Neural Information Processing Systems" both
+become NeurIPS).
+
+An entry counts as a publication if it has a year, is longer than 40
+characters and has a quoted title, a known venue or a citation marker
+(et al, pp., vol., ...).
+
+Config (env):
+    PUBLICATION_VENUES_FILE   extra venue lists in the venues.tsv format
+                              (os.pathsep-separated), e.g. exported from DBLP
+"""
+import os
+import re
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+VENUES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "venues.tsv")
+EXTRA_VENUES = [p for p in os.getenv("PUBLICATION_VENUES_FILE", "").split(os.pathsep) if p]
+
+SCAN_LINES = 100 # lines after the header
+MAX_ENTRY_LINES = 5
+MIN_ENTRY_CHARS = 40
+MAX_RAW_VENUE_CHARS = 80
+
+YEAR_RE = re.compile(r"\b(?:19|20)\d{2}\b")
+CITATION_RE = re.compile(r"et al|pp\.|vol\.|proc\.|conf\.|arXiv|CVPR|ICML|NeurIPS|ICLR|ECCV", re.IGNORECASE)
+QUOTED_RE = re.compile(r"[\"“]\s*([^\"“”]{8,}?)\s*[\"”]")
+INITIAL_RE = re.compile(r"(?:^|[\s,])[A-Z]\.(?=\s|,|$|[A-Z]\.)")
+INITIALS_ONLY_RE = re.compile(r"(?:[A-Z]\.\s*-?)+")
+AUTHOR_SPLIT_RE = re.compile(r",\s*(?:and\s+)?|\s+and\s+|;\s*|\s+&\s+")
+ET_AL_RE = re.compile(r",?\s*\bet al\.?", re.IGNORECASE)
+SENTENCE_END_RE = re.compile(r"\.\s+(?=[A-Z0-9\"“])")
+# After an initial, the author list goes on if the next word is another initial, a surname or "and"
+NAME_CONTINUES_RE = re.compile(r"[A-Z]\.|[A-Z][\w'\-]*(?:,|\.|\s+and\b|\s*$)|and\b")
+PAREN_YEAR_RE = re.compile(r"\(\s*(?:19|20)\d{2}[a-z]?\s*\)")
+VENUE_PREFIX_RE = re.compile(r"^(?:[\s,.:;]|In\b|in\b|Proc\b\.?|Proceedings of( the)?\b|To appear( in)?\b)+")
+LINK_LINE_RE = re.compile(r"^(?:\[[^\]]*\]\s*)+$") # "[PDF] [Code]"
+
+
+# --- Venue automaton ---
+
+def load_venues(paths: List[str]) -> Dict[str, str]:
+    """surface form -> canonical name, from tab-separated files (first column canonical, # comments)."""
+    venues = {}
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip() or line.startswith("#"):
+                    continue
+                names = [name.strip() for name in line.rstrip("\n").split("\t") if name.strip()]
+                for name in names:
+                    venues.setdefault(name, names[0])
+    return venues
+
+
+def trie_pattern(words) -> str:
+    """
+    Regex matching any of words, shaped like their trie: one branch per next
+    character, so matching costs the length of the match, not the number of
+    words. Optional endings are greedy, so the longest word wins.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def emit(node) -> str:
+        branches = [re.escape(ch) + emit(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            body = f"(?:{body})?"
+        return body
+
+    return emit(trie)
+
+
+VENUES = load_venues([VENUES_PATH] + EXTRA_VENUES)
+# Whole words only; letters (not digits) after the name rule it out, so "CVPR'24" and "ICML2022" still match
+VENUE_RE = re.compile(r"(?<!\w)(?:" + trie_pattern(VENUES) + r")(?![^\W\d_])")
+
+
+# --- Entries ---
+
+def _clean(text: str) -> str:
+    return " ".join(text.split())
+
+
+def looks_like_authors(text: str) -> bool:
+    if INITIAL_RE.search(text) or ET_AL_RE.search(text):
+        return True
+    if "," not in text and " and " not in text:
+        return False
+    words = [w for w in re.split(r"[\s,;]+", text) if w and w not in ("and", "&")]
+    return bool(words) and sum(w[0].isupper() for w in words) >= 0.8 * len(words)
+
+
+def split_authors(text: str) -> List[str]:
+    text = ET_AL_RE.sub("", PAREN_YEAR_RE.sub("", _clean(text))).strip(" .,;:")
+    names = []
+    for part in AUTHOR_SPLIT_RE.split(text):
+        part = part.strip(" .")
+        if not part:
+            continue
+        # "Doe, J." style: the initials belong to the previous name
+        if names and INITIALS_ONLY_RE.fullmatch(part + "."):
+            names[-1] = f"{names[-1]}, {part}."
+        else:
+            names.append(part)
+    return names
+
+
+def _sentences(text: str, start: int, end: int) -> List[Tuple[int, int]]:
+    """Spans of ". "-separated segments, not splitting after initials or "et al."."""
+    spans, last = [], start
+    for m in SENTENCE_END_RE.finditer(text, start, end):
+        k = m.start()
+        if k > 0 and text[k - 1].isupper() and (k < 2 or not text[k - 2].isalpha()) \
+                and NAME_CONTINUES_RE.match(text, m.end(), end):
+            continue # initial inside the author list
+        if text[max(start, k - 6):k].endswith("et al"):
+            continue
+        spans.append((last, k))
+        last = m.end()
+    spans.append((last, end))
+    return [(a, b) for a, b in spans if text[a:b].strip()]
+
+
+def parse_entry(text: str, line_spans: List[Tuple[int, int]], venues: List[Tuple[int, int, str]]) -> Optional[dict]:
+    """
+    Record for one entry. text is the section with newlines blanked out (so
+    offsets match the venue hits); line_spans are the entry's lines.
+    """
+    start, end = line_spans[0][0], line_spans[-1][1]
+    entry = text[start:end]
+    years = YEAR_RE.findall(entry)
+    if not years or len(entry.strip()) <= MIN_ENTRY_CHARS:
+        return None
+    hits = venues[bisect_left(venues, (start,)):bisect_left(venues, (end,))]
+
+    title_span = authors_span = None
+    quoted = QUOTED_RE.search(text, start, end)
+    if quoted:
+        title_span = quoted.span(1)
+        authors_span = (start, quoted.start())
+    elif not hits and not CITATION_RE.search(entry):
+        return None
+    elif len(line_spans) > 1:
+        for a, b in line_spans:
+            line = text[a:b]
+            if authors_span is None and looks_like_authors(line):
+                authors_span = (a, b)
+            elif title_span is None and not YEAR_RE.search(line) and not any(a <= h[0] < b for h in hits):
+                title_span = (a, b)
+    else:
+        segments = _sentences(text, start, end)
+        if len(segments) > 1 and looks_like_authors(text[segments[0][0]:segments[0][1]]):
+            authors_span, segments = segments[0], segments[1:]
+        title_span = segments[0]
+
+    if title_span is None:
+        return None
+    title = _clean(text[title_span[0]:title_span[1]]).strip(" .,;:\"“”")
+    if not title:
+        return None
+
+    after = max(title_span[1], authors_span[1] if authors_span else 0)
+    venue = next((name for a, _, name in hits if a >= title_span[1]), None)
+    if venue is None:
+        venue = next((name for a, b, name in hits if b <= title_span[0] or a >= title_span[1]), None)
+    if venue is None:
+        raw = text[after:end]
+        year = YEAR_RE.search(raw)
+        raw = _clean(VENUE_PREFIX_RE.sub("", raw[:year.start()] if year else raw)).strip(" .,;:()\"“”")
+        venue = raw if 2 < len(raw) <= MAX_RAW_VENUE_CHARS else None
+
+    return {
+        "title": title,
+        "authors": split_authors(text[authors_span[0]:authors_span[1]]) if authors_span else [],
+        "venue": venue,
+        "year": int(years[-1]),
+        "text": _clean(entry),
+    }
+
+
+def format_publication(record: dict) -> str:
+    """'Title (Venue Year)' for card markdown and prompts."""
+    where = " ".join(str(part) for part in (record.get("venue"), record.get("year")) if part)
+    return f"{record['title']} ({where})" if where else record["title"]
+
+
+def parse_section(lines: List[str], limit: int = 10) -> List[dict]:
+    """
+    Publication records from the lines following a publications header
+    (callers pass up to SCAN_LINES of them), in page order, at most limit.
+    "text" is the entry as printed on the page.
+    """
+    text = "\n".join(lines)
+    # One finditer over the section, advanced only as far as the entries parsed so far
+    venue_matches = VENUE_RE.finditer(text)
+    venues: List[Tuple[int, int, str]] = []
+    scanned = 0
+    text = text.replace("\n", " ")
+
+    records = []
+    pending: List[Tuple[int, int]] = [] # lines without a year, waiting for the one that ends the entry
+    offset = 0
+    for line in lines:
+        span = (offset, offset + len(line))
+        offset += len(line) + 1
+        stripped = line.strip()
+        if not stripped or LINK_LINE_RE.match(stripped):
+            pending = []
+            continue
+        if not YEAR_RE.search(stripped):
+            pending = (pending + [span])[-(MAX_ENTRY_LINES - 1):]
+            continue
+
+        # A line with its own quoted title stands alone; otherwise it ends the buffered entry
+        candidates = [[span]] if not pending or QUOTED_RE.search(stripped) else [pending + [span], [span]]
+        pending = []
+        while scanned < span[1]:
+            match = next(venue_matches, None)
+            if match is None:
+                scanned = len(text)
+            else:
+                scanned = match.end()
+                venues.append((match.start(), match.end(), VENUES[match.group()]))
+        for line_spans in candidates:
+            record = parse_entry(text, line_spans, venues)
+            if record:
+                records.append(record)
+                break
+        if len(records) >= limit:
+            break
+    return records
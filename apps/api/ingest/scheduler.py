@@ -0,0 +1,194 @@
+"""
+Fetch Scheduler — per-host politeness for everything we download.
+
+Many professors share a host (cs.stanford.edu, *.github.io), so bulk ingest
+must not fire all requests at one server at once. Every fetch goes through
+get_scheduler().slot(url), which:
+  - keeps a token bucket per host (FETCH_HOST_RATE req/s, FETCH_HOST_BURST burst)
+  - enforces a minimum delay between requests to the same host
+    (FETCH_MIN_DELAY, or the robots.txt Crawl-delay if larger)
+and allowed(url) checks robots.txt, cached per host for ROBOTS_TTL seconds.
+
+interleave_by_host() orders a batch so consecutive items hit different hosts,
+which keeps worker threads busy instead of queueing behind one slow host.
+"""
+import os
+import time
+import threading
+import logging
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+from services import http_client
+
+logger = logging.getLogger(__name__)
+
+HOST_RATE = float(os.getenv("FETCH_HOST_RATE", "1.0"))
+HOST_BURST = float(os.getenv("FETCH_HOST_BURST", "3"))
+MIN_DELAY = float(os.getenv("FETCH_MIN_DELAY", "0.25"))
+MAX_CRAWL_DELAY = float(os.getenv("FETCH_MAX_CRAWL_DELAY", "10"))
+ROBOTS_ENABLED = os.getenv("ROBOTS_ENABLED", "true").lower() == "true"
+ROBOTS_TTL = int(os.getenv("ROBOTS_TTL", "3600"))
+ROBOTS_TIMEOUT = float(os.getenv("ROBOTS_TIMEOUT", "5"))
+
+
+def host_key(url: str) -> str:
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{(parsed.netloc or '').lower()}"
+
+
+class _HostState:
+    def __init__(self, burst: float):
+        self.lock = threading.Lock()
+        self.tokens = burst
+        self.last_refill = time.monotonic()
+        self.next_allowed = 0.0
+        self.robots: Optional[RobotFileParser] = None
+        self.robots_expires = 0.0
+
+
+class FetchScheduler:
+    def __init__(
+        self,
+        rate: float = HOST_RATE,
+        burst: float = HOST_BURST,
+        min_delay: float = MIN_DELAY,
+        robots_enabled: bool = ROBOTS_ENABLED,
+        robots_ttl: int = ROBOTS_TTL,
+        max_hosts: int = 1024,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.min_delay = min_delay
+        self.robots_enabled = robots_enabled
+        self.robots_ttl = robots_ttl
+        self.max_hosts = max_hosts
+        self._hosts: "OrderedDict[str, _HostState]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"slots": 0, "waited_s": 0.0, "robots_hits": 0, "robots_misses": 0, "robots_blocked": 0}
+
+    def _host(self, key: str) -> _HostState:
+        with self._lock:
+            state = self._hosts.get(key)
+            if state is None:
+                state = self._hosts[key] = _HostState(self.burst)
+                if len(self._hosts) > self.max_hosts:
+                    self._hosts.popitem(last=False)
+            else:
+                self._hosts.move_to_end(key)
+            return state
+
+    def _count(self, key: str, amount=1):
+        with self._lock:
+            self._stats[key] += amount
+
+    # --- robots.txt ---
+    def _robots(self, key: str, state: _HostState) -> Optional[RobotFileParser]:
+        now = time.monotonic()
+        with state.lock:
+            if state.robots is not None and now < state.robots_expires:
+                self._count("robots_hits")
+                return state.robots
+
+        self._count("robots_misses")
+        parser = RobotFileParser()
+        try:
+            resp = http_client.get_session().get(f"{key}/robots.txt", timeout=ROBOTS_TIMEOUT)
+            if resp.status_code in (401, 403):
+                parser.disallow_all = True
+            elif resp.status_code >= 400:
+                parser.allow_all = True
+            else:
+                parser.parse(resp.text.splitlines())
+        except Exception as e:
+            # Unreachable robots.txt shouldn't block ingest
+            logger.info(f"[Scheduler] robots.txt unavailable for {key}: {e}")
+            parser.allow_all = True
+
+        with state.lock:
+            state.robots = parser
+            state.robots_expires = now + self.robots_ttl
+        return parser
+
+    def allowed(self, url: str) -> bool:
+        if not self.robots_enabled:
+            return True
+        key = host_key(url)
+        robots = self._robots(key, self._host(key))
+        ok = robots.can_fetch(http_client.USER_AGENT, url)
+        if not ok:
+            self._count("robots_blocked")
+            logger.warning(f"[Scheduler] Disallowed by robots.txt: {url}")
+        return ok
+
+    def _delay_for(self, key: str, state: _HostState) -> float:
+        delay = self.min_delay
+        if self.robots_enabled and state.robots is not None:
+            crawl_delay = state.robots.crawl_delay(http_client.USER_AGENT)
+            if crawl_delay:
+                delay = max(delay, min(float(crawl_delay), MAX_CRAWL_DELAY))
+        return delay
+
+    # --- Rate limiting ---
+    def reserve(self, url: str) -> float:
+        """Reserves the next request slot for this host; returns seconds to wait."""
+        key = host_key(url)
+        state = self._host(key)
+        with state.lock:
+            now = time.monotonic()
+            state.tokens = min(self.burst, state.tokens + (now - state.last_refill) * self.rate)
+            state.last_refill = now
+
+            wait = (1 - state.tokens) / self.rate if state.tokens < 1 and self.rate > 0 else 0.0
+            start_at = max(now + wait, state.next_allowed)
+            state.tokens -= 1
+            state.next_allowed = start_at + self._delay_for(key, state)
+            return start_at - now
+
+    @contextmanager
+    def slot(self, url: str):
+        wait = self.reserve(url)
+        if wait > 0:
+            time.sleep(wait)
+        with self._lock:
+            self._stats["slots"] += 1
+            self._stats["waited_s"] += wait
+        yield
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["hosts"] = len(self._hosts)
+        stats["waited_s"] = round(stats["waited_s"], 2)
+        return stats
+
+
+def interleave_by_host(items: List, url_of: Callable = lambda item: item["url"]) -> List:
+    """Round-robin items across hosts: a1 b1 c1 a2 b2 a3 ..."""
+    buckets = defaultdict(list)
+    for item in items:
+        buckets[host_key(url_of(item))].append(item)
+    ordered = []
+    queues = list(buckets.values())
+    depth = max((len(q) for q in queues), default=0)
+    for i in range(depth):
+        for q in queues:
+            if i < len(q):
+                ordered.append(q[i])
+    return ordered
+
+
+# Singleton
+_scheduler: Optional[FetchScheduler] = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler() -> FetchScheduler:
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = FetchScheduler()
+    return _scheduler
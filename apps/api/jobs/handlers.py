@@ -0,0 +1,87 @@
+"""
+Job handlers: kind -> function(db, user_id, payload) returning a JSON-able result.
+"""
+from fastapi.encoders import jsonable_encoder
+
+import crud, schemas
+from services import pipeline
+
+
+def _serialize(schema, obj):
+    # Flat response schemas: read each declared field off the ORM object
+    return jsonable_encoder({name: getattr(obj, name, None) for name in schema.__fields__})
+
+
+def _get_professor(db, user_id: int, professor_id: int):
+    db_professor = crud.get_professor(db, professor_id=professor_id, user_id=user_id)
+    if not db_professor:
+        raise pipeline.PipelineError("Professor not found", status_code=404)
+    return db_professor
+
+
+def handle_ingest(db, user_id: int, payload: dict):
+    db_professor = _get_professor(db, user_id, payload["professor_id"])
+    page = pipeline.ingest_page(db, db_professor, payload["url"], text_mode=payload.get("text_mode"))
+    return _serialize(schemas.SourcePage, page)
+
+
+def handle_generate_card(db, user_id: int, payload: dict):
+    _get_professor(db, user_id, payload["professor_id"])
+    card = pipeline.generate_card(db, payload["professor_id"])
+    return _serialize(schemas.ProfessorCard, card)
+
+
+def handle_generate_cards(db, user_id: int, payload: dict):
+    import time
+    from jobs import queue
+    started = time.perf_counter()
+    owned = {p.id for p in crud.get_professors_by_ids(db, payload["professor_ids"], user_id=user_id)}
+    items = pipeline.generate_cards(db, [i for i in payload["professor_ids"] if i in owned], progress=queue.report_progress)
+    return pipeline.summarize_cards(items, (time.perf_counter() - started) * 1000)
+
+
+def handle_generate_email(db, user_id: int, payload: dict):
+    db_professor = _get_professor(db, user_id, payload["professor_id"])
+    request = schemas.EmailGenerationRequest(**payload["request"]) if payload.get("request") else None
+    draft = pipeline.generate_email(db, db_professor, request)
+    return _serialize(schemas.EmailDraft, draft)
+
+
+def handle_extract_avatar(db, user_id: int, payload: dict):
+    return {"avatar_url": pipeline.extract_avatar(db, payload["website_url"], user_id=user_id)}
+
+
+def handle_crawl(db, user_id: int, payload: dict):
+    import models
+    from ingest import crawler
+    crawl = db.query(models.CrawlRun).filter(models.CrawlRun.id == payload["crawl_id"], models.CrawlRun.user_id == user_id).first()
+    if crawl is None:
+        raise pipeline.PipelineError("Crawl not found", status_code=404)
+    # Resumes from the persisted frontier if this is a retry
+    try:
+        crawl = crawler.run_crawl(db, crawl)
+    except Exception:
+        db.rollback()
+        crawl.status = "failed"
+        db.commit()
+        raise
+    return _serialize(schemas.CrawlRun, crawl)
+
+
+def handle_refresh(db, user_id: int, payload: dict):
+    from jobs import refresher
+    db_professor = _get_professor(db, user_id, payload["professor_id"])
+    result = pipeline.refresh_professor(db, db_professor)
+    refresher.record_result(result)
+    return result
+
+
+HANDLERS = {
+    "ingest": handle_ingest,
+    "generate_card": handle_generate_card,
+    "generate_cards": handle_generate_cards,
+    "generate_email": handle_generate_email,
+    "extract_avatar": handle_extract_avatar,
+    "crawl": handle_crawl,
+    "refresh": handle_refresh,
+}
@@ -0,0 +1,200 @@
+"""
+Job Queue — durable work queue stored in the `jobs` table.
+
+Works on SQLite and Postgres: a job is claimed with a conditional UPDATE
+(only one worker can flip it to "running"), and the claim is a lease.
+If a worker dies mid-job, the lease expires and another worker picks the
+job up again, so queued work survives restarts. Completing or failing a
+job is conditional on the lease too: a worker whose lease expired and
+whose job was reclaimed can't overwrite the new holder's outcome.
+
+Config (env):
+    JOB_LEASE_SECONDS   how long a claim is valid (default 300)
+    JOB_MAX_ATTEMPTS    tries before a job is marked failed (default 3)
+    JOB_RETRY_BACKOFF   base seconds between retries, doubled per attempt (default 5)
+"""
+import os
+import json
+import time
+import threading
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from sqlalchemy import or_, and_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import models
+
+logger = logging.getLogger(__name__)
+
+LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+RETRY_BACKOFF = float(os.getenv("JOB_RETRY_BACKOFF", "5"))
+
+# Set on enqueue so in-process workers wake up immediately instead of polling
+new_job_event = threading.Event()
+
+# Job the current worker thread is running (see report_progress)
+_current = threading.local()
+PROGRESS_INTERVAL = 1.0 # seconds between progress writes
+
+
+def enqueue(db: Session, user_id: int, kind: str, payload: Dict, max_attempts: int = None,
+            dedupe_key: str = None) -> Optional[models.Job]:
+    """
+    Adds a queued job. With a dedupe_key, returns None instead if a queued or
+    running job already has that key; a unique partial index makes the check
+    atomic across processes.
+    """
+    job = models.Job(
+        user_id=user_id,
+        kind=kind,
+        status="queued",
+        payload=json.dumps(payload),
+        max_attempts=max_attempts or MAX_ATTEMPTS,
+        run_after=datetime.utcnow(),
+        dedupe_key=dedupe_key
+    )
+    try:
+        with db.begin_nested():
+            db.add(job)
+    except IntegrityError:
+        db.commit()
+        return None
+    db.commit()
+    db.refresh(job)
+    new_job_event.set()
+    return job
+
+
+def get_job(db: Session, job_id: int, user_id: int) -> Optional[models.Job]:
+    return db.query(models.Job).filter(models.Job.id == job_id, models.Job.user_id == user_id).first()
+
+
+def _claimable(now: datetime):
+    return or_(
+        and_(models.Job.status == "queued", models.Job.run_after <= now),
+        and_(models.Job.status == "running", models.Job.lease_expires_at < now)
+    )
+
+
+def claim(db: Session, worker_id: str) -> Optional[models.Job]:
+    """
+    Leases the oldest runnable job to this worker, or returns None.
+    Jobs whose lease expired (worker crashed/restarted) are runnable again.
+    """
+    now = datetime.utcnow()
+    candidates = db.query(models.Job.id).filter(_claimable(now)).order_by(models.Job.id).limit(5).all()
+
+    for (job_id,) in candidates:
+        claimed = db.query(models.Job).filter(models.Job.id == job_id, _claimable(now)).update({
+            models.Job.status: "running",
+            models.Job.locked_by: worker_id,
+            models.Job.lease_expires_at: now + timedelta(seconds=LEASE_SECONDS),
+            models.Job.attempts: models.Job.attempts + 1,
+            models.Job.updated_at: now
+        }, synchronize_session=False)
+        db.commit()
+        if not claimed:
+            continue # another worker got it first
+
+        job = db.get(models.Job, job_id)
+        db.refresh(job)
+        # A job that keeps killing its worker shouldn't be retried forever
+        if job.attempts > job.max_attempts:
+            fail(db, job, worker_id, "Lease expired too many times", retry=False)
+            continue
+        return job
+    return None
+
+
+def renew(db: Session, job_id: int, worker_id: str) -> bool:
+    """Extends the lease of a job this worker still holds."""
+    now = datetime.utcnow()
+    renewed = db.query(models.Job).filter(
+        models.Job.id == job_id,
+        models.Job.status == "running",
+        models.Job.locked_by == worker_id
+    ).update({models.Job.lease_expires_at: now + timedelta(seconds=LEASE_SECONDS)}, synchronize_session=False)
+    db.commit()
+    return bool(renewed)
+
+
+def _finish(db: Session, job: models.Job, worker_id: str, values: Dict) -> bool:
+    """Writes a job's outcome if worker_id still holds its lease. Returns False if it lost it."""
+    job_id = job.id
+    updated = db.query(models.Job).filter(
+        models.Job.id == job_id,
+        models.Job.status == "running",
+        models.Job.locked_by == worker_id
+    ).update({**values, models.Job.locked_by: None, models.Job.lease_expires_at: None}, synchronize_session=False)
+    db.commit()
+    if not updated:
+        logger.warning(f"[Jobs] {worker_id} lost the lease on job {job_id}; outcome discarded")
+    return bool(updated)
+
+
+def complete(db: Session, job: models.Job, worker_id: str, result: Any) -> bool:
+    return _finish(db, job, worker_id, {
+        models.Job.status: "done",
+        models.Job.result: json.dumps(result),
+        models.Job.error: None,
+        models.Job.finished_at: datetime.utcnow()
+    })
+
+
+def fail(db: Session, job: models.Job, worker_id: str, error: str, retry: bool = True) -> bool:
+    now = datetime.utcnow()
+    values = {models.Job.error: error}
+    if retry and job.attempts < job.max_attempts:
+        values[models.Job.status] = "queued"
+        values[models.Job.run_after] = now + timedelta(seconds=RETRY_BACKOFF * (2 ** (job.attempts - 1)))
+    else:
+        values[models.Job.status] = "failed"
+        values[models.Job.finished_at] = now
+    return _finish(db, job, worker_id, values)
+
+
+def set_current_job(job_id: Optional[int]):
+    _current.job_id = job_id
+    _current.reported_at = 0.0
+
+
+def report_progress(done: int, total: int):
+    """
+    Records {"done", "total"} on the job running in this thread, for GET /jobs/{id}.
+    Writes at most every PROGRESS_INTERVAL seconds (always the final one);
+    a no-op outside a job worker.
+    """
+    job_id = getattr(_current, "job_id", None)
+    now = time.monotonic()
+    if job_id is None or (done < total and now - _current.reported_at < PROGRESS_INTERVAL):
+        return
+    _current.reported_at = now
+
+    from database import SessionLocal
+    db = SessionLocal()
+    try:
+        db.query(models.Job).filter(models.Job.id == job_id).update(
+            {models.Job.progress: json.dumps({"done": done, "total": total})}, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def to_schema_dict(job: models.Job) -> Dict:
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "attempts": job.attempts,
+        "result": json.loads(job.result) if job.result else None,
+        "progress": json.loads(job.progress) if job.progress else None,
+        "error": job.error,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+        "finished_at": job.finished_at
+    }
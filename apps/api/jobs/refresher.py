@@ -0,0 +1,183 @@
+"""
+Background refresher — keeps professor cards current without manual re-runs.
+
+Every REFRESH_INTERVAL seconds the API looks for professors whose website
+was last fetched longer ago than the max age for their pipeline status, and
+enqueues a "refresh" job for each (up to REFRESH_BATCH per scan). The job
+(services/pipeline.refresh_professor) re-fetches with the stored validators
+and only re-runs card extraction when the normalized page text changed; the
+new card version records what changed (e.g. new hiring signals).
+
+Priority: most overdue first (time since last fetch / max age for the
+status), so a Draft 10 days old comes before a Sent 15 days old. Professors
+never fetched come first. Closed professors are not refreshed.
+Professors that already have a queued or running refresh job are skipped;
+refresh jobs carry a dedupe key (one pending job per professor, enforced
+by the jobs table), so several API processes scanning at once don't pile
+up duplicates.
+
+Config (env):
+    REFRESH_INTERVAL   seconds between scans (default 3600; 0 disables)
+    REFRESH_BATCH      max jobs enqueued per scan (default 20)
+    REFRESH_MAX_AGE    status:days pairs (default "Draft:7,Sent:14,Replied:30,Meeting:30")
+"""
+import os
+import json
+import threading
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, or_, and_
+from sqlalchemy.orm import Session
+
+import models
+from database import SessionLocal
+from jobs import queue
+
+logger = logging.getLogger(__name__)
+
+INTERVAL = float(os.getenv("REFRESH_INTERVAL", "3600"))
+BATCH = int(os.getenv("REFRESH_BATCH", "20"))
+FIRST_SCAN_DELAY = 60.0
+
+
+def _parse_max_age(value: str) -> Dict[str, timedelta]:
+    ages = {}
+    for pair in value.split(","):
+        if ":" in pair:
+            status, days = pair.split(":", 1)
+            ages[status.strip()] = timedelta(days=float(days))
+    return ages
+
+
+MAX_AGE = _parse_max_age(os.getenv("REFRESH_MAX_AGE", "Draft:7,Sent:14,Replied:30,Meeting:30"))
+DEFAULT_STATUS = "Draft" # professors without a pipeline_timestamps row
+
+_stats_lock = threading.Lock()
+_stats = {"scans": 0, "enqueued": 0, "refreshed": 0, "text_changed": 0, "cards_updated": 0, "fetch_failed": 0}
+
+
+def _count(key: str, n: int = 1):
+    with _stats_lock:
+        _stats[key] += n
+
+
+def dedupe_key(professor_id: int) -> str:
+    return f"refresh:{professor_id}"
+
+
+def pending_professor_ids(db: Session) -> set:
+    """Professors with a refresh job that hasn't finished yet."""
+    jobs = db.query(models.Job.payload).filter(
+        models.Job.kind == "refresh",
+        models.Job.status.in_(("queued", "running"))
+    ).all()
+    return {json.loads(payload).get("professor_id") for (payload,) in jobs}
+
+
+def select_stale(db: Session, limit: int = BATCH, now: Optional[datetime] = None) -> List[models.Professor]:
+    """Professors due for a refresh, most overdue first."""
+    now = now or datetime.utcnow()
+    last_fetch = db.query(
+        models.SourcePage.professor_id,
+        models.SourcePage.source_url,
+        func.max(models.SourcePage.fetched_at).label("fetched_at")
+    ).group_by(models.SourcePage.professor_id, models.SourcePage.source_url).subquery()
+
+    status = func.coalesce(models.PipelineStatus.status, DEFAULT_STATUS)
+    due = [
+        and_(status == name, or_(last_fetch.c.fetched_at == None, last_fetch.c.fetched_at < now - max_age))
+        for name, max_age in MAX_AGE.items()
+    ]
+    if not due:
+        return []
+
+    rows = db.query(models.Professor, status, last_fetch.c.fetched_at).outerjoin(
+        models.PipelineStatus, models.PipelineStatus.professor_id == models.Professor.id
+    ).outerjoin(
+        last_fetch, and_(
+            last_fetch.c.professor_id == models.Professor.id,
+            last_fetch.c.source_url == models.Professor.website_url
+        )
+    ).filter(
+        models.Professor.website_url != None,
+        models.Professor.website_url != "",
+        or_(*due)
+    ).all()
+
+    def overdue(row):
+        _, name, fetched_at = row
+        if fetched_at is None:
+            return float("inf")
+        return (now - fetched_at) / MAX_AGE[name]
+
+    pending = pending_professor_ids(db)
+    rows = [row for row in rows if row[0].id not in pending]
+    rows.sort(key=overdue, reverse=True)
+    return [professor for professor, _, _ in rows[:limit]]
+
+
+def scan(db: Session, limit: int = BATCH) -> List[int]:
+    """Enqueues refresh jobs for the stalest professors. Returns the job ids."""
+    job_ids = []
+    for professor in select_stale(db, limit=limit):
+        job = queue.enqueue(db, professor.user_id, "refresh", {"professor_id": professor.id},
+                            dedupe_key=dedupe_key(professor.id))
+        if job is not None: # None: another process enqueued it since select_stale
+            job_ids.append(job.id)
+    _count("scans")
+    _count("enqueued", len(job_ids))
+    if job_ids:
+        logger.info(f"[Refresher] Enqueued {len(job_ids)} refresh jobs")
+    return job_ids
+
+
+def record_result(result: dict):
+    """Called by the refresh job handler so /metrics shows how often pages actually change."""
+    _count("refreshed")
+    if result.get("text_changed"):
+        _count("text_changed")
+    if result.get("card_updated"):
+        _count("cards_updated")
+    if result.get("fetch_status") not in ("ok", "truncated", "not_modified"):
+        _count("fetch_failed")
+
+
+def get_stats() -> Dict:
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["interval"] = INTERVAL
+    return stats
+
+
+class Refresher:
+    def __init__(self, interval: float = INTERVAL, batch: int = BATCH):
+        self.interval = interval
+        self.batch = batch
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="card-refresher", daemon=True)
+        self._thread.start()
+        logger.info(f"[Refresher] Scanning every {self.interval:g}s (batch {self.batch})")
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def _run(self):
+        wait = min(FIRST_SCAN_DELAY, self.interval)
+        while not self._stop.wait(wait):
+            db = SessionLocal()
+            try:
+                scan(db, limit=self.batch)
+            except Exception as e:
+                logger.error(f"[Refresher] Scan failed: {e}")
+                db.rollback()
+            finally:
+                db.close()
+            wait = self.interval
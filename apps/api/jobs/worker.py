@@ -0,0 +1,144 @@
+"""
+In-process worker pool for the job queue.
+
+Started by the API on startup (JOB_WORKERS threads, default 2; set 0 to
+disable) or standalone with:
+    python -m jobs.worker
+"""
+import os
+import json
+import time
+import uuid
+import socket
+import threading
+import logging
+from typing import List
+
+from database import SessionLocal
+from jobs import queue
+from jobs.handlers import HANDLERS
+from services.pipeline import PipelineError
+
+logger = logging.getLogger(__name__)
+
+WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+
+
+class WorkerPool:
+    def __init__(self, size: int = WORKERS):
+        self.size = size
+        self.worker_prefix = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self):
+        for i in range(self.size):
+            t = threading.Thread(target=self._run, args=(f"{self.worker_prefix}:{i}",), name=f"job-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        logger.info(f"[Jobs] Started {self.size} workers ({self.worker_prefix})")
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        queue.new_job_event.set()
+        for t in self._threads:
+            t.join(timeout=timeout)
+        self._threads = []
+
+    def _run(self, worker_id: str):
+        while not self._stop.is_set():
+            try:
+                ran = self.run_once(worker_id)
+            except Exception as e:
+                logger.error(f"[Jobs] Worker {worker_id} loop error: {e}")
+                ran = False
+            if not ran:
+                queue.new_job_event.wait(POLL_INTERVAL)
+                queue.new_job_event.clear()
+
+    def run_once(self, worker_id: str) -> bool:
+        """Claims and runs one job. Returns False if nothing was runnable."""
+        db = SessionLocal()
+        try:
+            job = queue.claim(db, worker_id)
+            if job is None:
+                return False
+
+            handler = HANDLERS.get(job.kind)
+            if handler is None:
+                queue.fail(db, job, worker_id, f"Unknown job kind: {job.kind}", retry=False)
+                return True
+
+            logger.info(f"[Jobs] {worker_id} running job {job.id} ({job.kind}, attempt {job.attempts})")
+            heartbeat = _LeaseHeartbeat(job.id, worker_id)
+            heartbeat.start()
+            started = time.perf_counter()
+            queue.set_current_job(job.id)
+            try:
+                result = handler(db, job.user_id, json.loads(job.payload))
+            except PipelineError as e:
+                db.rollback()
+                queue.fail(db, job, worker_id, e.detail, retry=False)
+            except Exception as e:
+                db.rollback()
+                logger.error(f"[Jobs] Job {job.id} failed: {e}")
+                queue.fail(db, job, worker_id, str(e))
+            else:
+                if queue.complete(db, job, worker_id, result):
+                    logger.info(f"[Jobs] Job {job.id} done in {time.perf_counter() - started:.1f}s")
+            finally:
+                queue.set_current_job(None)
+                heartbeat.stop()
+            return True
+        finally:
+            db.close()
+
+
+class _LeaseHeartbeat:
+    """Renews a job lease in the background while a long handler runs."""
+
+    def __init__(self, job_id: int, worker_id: str):
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=1.0)
+
+    def _run(self):
+        interval = max(queue.LEASE_SECONDS / 3, 1)
+        while not self._stop.wait(interval):
+            db = SessionLocal()
+            try:
+                queue.renew(db, self.job_id, self.worker_id)
+            except Exception as e:
+                logger.warning(f"[Jobs] Lease renewal failed for job {self.job_id}: {e}")
+            finally:
+                db.close()
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+
+    import models
+    from database import engine
+    from search import index as search_index
+    models.Base.metadata.create_all(bind=engine)
+    # Before the workers start writing to it
+    search_index.ensure_index(engine)
+
+    pool = WorkerPool(max(WORKERS, 1))
+    pool.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pool.stop()
@@ -10,8 +10,10 @@ from jose import JWTError, jwt
 import crud, models, schemas, auth
 from database import SessionLocal, engine
 from fastapi.middleware.cors import CORSMiddleware
-from ingest import fetcher, cleaner, extractor
-from emails import generator
+from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
+from jobs import queue as job_queue
+from services import pipeline
 
 models.Base.metadata.create_all(bind=engine)
 
@@ -58,6 +60,51 @@ async def get_current_active_user(token: str = Depends(auth.oauth2_scheme), db:
         raise credentials_exception
     return user
 
+def _enqueue(db: Session, current_user: models.User, kind: str, payload: dict):
+    """Queues slow work for the job workers; the client polls GET /jobs/{id}."""
+    job = job_queue.enqueue(db, user_id=current_user.id, kind=kind, payload=payload)
+    return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=jsonable_encoder(job_queue.to_schema_dict(job)))
+
+@app.on_event("startup")
+def create_search_index():
+    # Before the job workers start writing to it
+    from search import index as search_index
+    search_index.ensure_index(engine)
+
+@app.on_event("startup")
+def start_job_workers():
+    from jobs.worker import WorkerPool, WORKERS
+    if WORKERS > 0:
+        app.job_workers = WorkerPool(WORKERS)
+        app.job_workers.start()
+
+@app.on_event("startup")
+def start_refresher():
+    from jobs.refresher import Refresher, INTERVAL
+    if INTERVAL > 0:
+        app.refresher = Refresher(INTERVAL)
+        app.refresher.start()
+
+@app.on_event("startup")
+def start_cpu_pool():
+    from services import cpu_pool
+    cpu_pool.warm_up()
+
+@app.on_event("shutdown")
+def stop_job_workers():
+    if hasattr(app, "job_workers"):
+        app.job_workers.stop()
+
+@app.on_event("shutdown")
+def stop_refresher():
+    if hasattr(app, "refresher"):
+        app.refresher.stop()
+
+@app.on_event("shutdown")
+def stop_cpu_pool():
+    from services import cpu_pool
+    cpu_pool.get_pool().shutdown()
+
 @app.post("/token", response_model=schemas.Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     user = crud.get_user_by_email(db, email=form_data.username)
@@ -89,6 +136,29 @@ def read_professors(skip: int = 0, limit: int = 100, db: Session = Depends(get_d
     professors = crud.get_professors(db, user_id=current_user.id, skip=skip, limit=limit)
     return professors
 
+@app.get("/professors/search", response_model=schemas.ProfessorSearchResponse)
+def search_professors_index(q: str, skip: int = 0, limit: int = 20, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
+    """
+    Full-text search over the user's professors: name, affiliation, card
+    interests and page text, best match first. Declared before
+    /professors/{professor_id} so "search" isn't taken for an id.
+    """
+    import time
+    from search import index as search_index
+
+    started = time.perf_counter()
+    limit = max(1, min(limit, 100))
+    total, hits = search_index.search(db, current_user.id, q, skip=max(skip, 0), limit=limit)
+    professors = {p.id: p for p in crud.get_professors_by_ids(db, [professor_id for professor_id, _, _ in hits], user_id=current_user.id)}
+    return {
+        "total": total,
+        "items": [
+            {"professor": professors[professor_id], "rank": rank, "snippet": snippet}
+            for professor_id, rank, snippet in hits if professor_id in professors
+        ],
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
 @app.get("/professors/{professor_id}", response_model=schemas.Professor)
 def read_professor(professor_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
     db_professor = crud.get_professor(db, professor_id=professor_id, user_id=current_user.id)
@@ -113,78 +183,166 @@ def delete_professor(professor_id: int, db: Session = Depends(get_db), current_u
     return None
 
 @app.post("/ingest", response_model=schemas.SourcePage)
-def ingest_professor_page(request: schemas.IngestRequest, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
+def ingest_professor_page(request: schemas.IngestRequest, background: bool = False, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
     # Check if professor exists (and belongs to user)
     db_professor = crud.get_professor(db, professor_id=request.professor_id, user_id=current_user.id)
     if not db_professor:
         raise HTTPException(status_code=404, detail="Professor not found")
 
-    # Fetch URL
-    fetched_data = fetcher.fetch_url(request.url)
-    
-    # Clean HTML
-    raw_text = ""
-    avatar_url = None
-    if fetched_data["raw_html"]:
-        raw_text = cleaner.clean_html(fetched_data["raw_html"])
-        avatar_url = cleaner.extract_images(fetched_data["raw_html"], fetched_data["source_url"])
-
-    # Update Professor avatar if not already set (or always?)
-    # Let's update it if we found one
-    if avatar_url:
-        db_professor.avatar_url = avatar_url
-        db.add(db_professor) # commit later
-
-    # Save to DB
-    db_source_page = models.SourcePage(
-        professor_id=request.professor_id,
-        source_url=fetched_data["source_url"],
-        raw_html=fetched_data["raw_html"],
-        raw_text=raw_text,
-        fetch_status=fetched_data["fetch_status"],
-        error_msg=fetched_data["error_msg"]
-    )
-    db.add(db_source_page)
+    if background:
+        return _enqueue(db, current_user, "ingest", {"professor_id": request.professor_id, "url": request.url, "text_mode": request.text_mode})
+
+    return pipeline.ingest_page(db, db_professor, request.url, text_mode=request.text_mode)
+
+@app.post("/ingest/batch", response_model=schemas.BatchIngestResponse)
+def ingest_professor_pages_batch(request: schemas.BatchIngestRequest, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
+    """
+    Fetches many professor pages concurrently (global + per-host caps)
+    and stores all SourcePage rows in a single transaction.
+    """
+    import time
+    from ingest import batch, keywords
+    from search import index as search_index
+
+    if len(request.items) > batch.MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Too many items (max {batch.MAX_ITEMS})")
+
+    started = time.perf_counter()
+
+    # Ownership check for all professors in one query
+    professors = {p.id: p for p in crud.get_professors_by_ids(db, [i.professor_id for i in request.items], user_id=current_user.id)}
+    previous_pages = crud.get_latest_source_pages(db, list(professors))
+
+    work = []
+    for i in request.items:
+        if i.professor_id not in professors:
+            continue
+        previous = previous_pages.get((i.professor_id, i.url))
+        work.append({
+            "professor_id": i.professor_id,
+            "url": i.url,
+            "text_mode": i.text_mode,
+            "etag": previous.etag if previous else None,
+            "last_modified": previous.last_modified if previous else None
+        })
+
+    results = batch.ingest_many(work, max_concurrency=request.max_concurrency, per_host_concurrency=request.per_host_concurrency)
+
+    # Bulk write (unchanged pages, 304 or identical text, are only touched)
+    rows = []
+    added_texts, replaced_texts = [], []
+    reindexed = []
+    for res in results:
+        fetched_data = res["fetched"]
+        previous = previous_pages.get((res["professor_id"], res["url"]))
+        if res["avatar_url"]:
+            professors[res["professor_id"]].avatar_url = res["avatar_url"]
+        if fetched_data["fetch_status"] == "not_modified" or crud.same_source_text(previous, fetched_data, res["raw_text"]):
+            rows.append(crud.touch_source_page(db, previous, fetched_data))
+            continue
+        rows.append(crud.build_source_page(db, res["professor_id"], fetched_data, res["raw_text"]))
+        if res["raw_text"] and fetched_data["fetch_status"] in crud.USABLE_FETCH_STATUSES:
+            added_texts.append(res["raw_text"])
+            reindexed.append(res["professor_id"])
+            if previous:
+                replaced_texts.append(previous.raw_text)
+    db.add_all(rows)
+    keywords.record_pages(db, added_texts, replaced_texts)
+    search_index.index_professors(db, reindexed)
+    db.flush()
+    page_ids = [row.id for row in rows]
     db.commit()
-    db.refresh(db_source_page)
-    return db_source_page
+
+    # Per-item report (input order)
+    done = iter(zip(results, page_ids))
+    items = []
+    for item in request.items:
+        if item.professor_id not in professors:
+            items.append(schemas.BatchIngestItem(professor_id=item.professor_id, url=item.url, status="not_found", error_msg="Professor not found"))
+            continue
+        res, page_id = next(done)
+        items.append(schemas.BatchIngestItem(
+            professor_id=item.professor_id,
+            url=item.url,
+            status=res["fetched"]["fetch_status"],
+            source_page_id=page_id,
+            error_msg=res["fetched"]["error_msg"],
+            fetch_ms=res["fetch_ms"],
+            elapsed_ms=res["elapsed_ms"]
+        ))
+
+    succeeded = sum(1 for i in items if i.status in crud.USABLE_FETCH_STATUSES + ("not_modified",))
+    return schemas.BatchIngestResponse(
+        items=items,
+        succeeded=succeeded,
+        failed=len(items) - succeeded,
+        elapsed_ms=round((time.perf_counter() - started) * 1000, 1)
+    )
+
+@app.post("/professors/generate-cards", response_model=schemas.GenerateCardsResponse)
+def generate_professor_cards(request: schemas.GenerateCardsRequest = None, background: bool = False, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
+    """
+    Card generation for many professors (default: all of the user's) in one pass.
+    Professors whose text didn't change keep their current card.
+    With ?background=true, GET /jobs/{id} reports {"done", "total"} progress.
+    """
+    import time
+    started = time.perf_counter()
+
+    if request is None or request.professor_ids is None:
+        requested = crud.get_professor_ids(db, user_id=current_user.id)
+        owned = set(requested)
+    else:
+        requested = list(dict.fromkeys(request.professor_ids))
+        owned = {p.id for p in crud.get_professors_by_ids(db, requested, user_id=current_user.id)}
+
+    if background:
+        return _enqueue(db, current_user, "generate_cards", {"professor_ids": [i for i in requested if i in owned]})
+
+    results = iter(pipeline.generate_cards(db, [i for i in requested if i in owned]))
+    items = [
+        next(results) if i in owned else
+        {"professor_id": i, "status": "not_found", "card_id": None, "version": None, "error_msg": "Professor not found"}
+        for i in requested
+    ]
+    return pipeline.summarize_cards(items, (time.perf_counter() - started) * 1000)
 
 @app.post("/professors/{professor_id}/generate-card", response_model=schemas.ProfessorCard)
-def generate_professor_card(professor_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
+def generate_professor_card(professor_id: int, background: bool = False, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
     # 1. Get professor
     db_professor = crud.get_professor(db, professor_id=professor_id, user_id=current_user.id)
     if not db_professor:
         raise HTTPException(status_code=404, detail="Professor not found")
-    
-    # Get the most recent source page with text
-    source_page = db.query(models.SourcePage).filter(
-        models.SourcePage.professor_id == professor_id,
-        models.SourcePage.raw_text != None
-    ).order_by(models.SourcePage.fetched_at.desc()).first()
-
-    if not source_page:
-        raise HTTPException(status_code=400, detail="No source text available. Please ingest URL first.")
-
-    # 2. Extract Data
-    import json
-    card_data = extractor.extract_professor_card(source_page.raw_text)
-    
-    # 3. Save to DB
-    db_card = models.ProfessorCard(
-        professor_id=professor_id,
-        card_json=json.dumps(card_data),
-        card_md=f"## Summary\n{card_data['summary']}\n\n## Interests\n" + "\n".join(f"- {i}" for i in card_data['research_interests']),
-        version=1
-    )
-    db.add(db_card)
-    db.commit()
-    db.refresh(db_card)
-    return db_card
+
+    if background:
+        return _enqueue(db, current_user, "generate_card", {"professor_id": professor_id})
+
+    # 2. Extract & Save
+    try:
+        return pipeline.generate_card(db, professor_id)
+    except pipeline.PipelineError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+@app.post("/professors/{professor_id}/refresh", response_model=schemas.RefreshResult)
+def refresh_professor(professor_id: int, background: bool = False, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
+    """Re-fetches the professor's website; a new card version is extracted only if the text changed."""
+    db_professor = crud.get_professor(db, professor_id=professor_id, user_id=current_user.id)
+    if not db_professor:
+        raise HTTPException(status_code=404, detail="Professor not found")
+
+    if background:
+        return _enqueue(db, current_user, "refresh", {"professor_id": professor_id})
+
+    try:
+        return pipeline.refresh_professor(db, db_professor)
+    except pipeline.PipelineError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
 
 @app.post("/professors/{professor_id}/generate-email", response_model=schemas.EmailDraft)
 def generate_email_draft(
     professor_id: int, 
     request: schemas.EmailGenerationRequest = None,
+    background: bool = False,
     db: Session = Depends(get_db), 
     current_user: models.User = Depends(get_current_active_user)
 ):
@@ -192,37 +350,13 @@ def generate_email_draft(
     db_professor = crud.get_professor(db, professor_id=professor_id, user_id=current_user.id)
     if not db_professor:
         raise HTTPException(status_code=404, detail="Professor not found")
-        
-    # 2. Get latest card (for interests)
-    latest_card = db.query(models.ProfessorCard).filter(
-        models.ProfessorCard.professor_id == professor_id
-    ).order_by(models.ProfessorCard.generated_at.desc()).first()
-    
-    import json
-    card_data = {}
-    if latest_card:
-        card_data = json.loads(latest_card.card_json)
-        
-    # 3. Generate (Pass the whole request object)
-    # If request is None (from old clients), create default
-    if request is None:
-        request = schemas.EmailGenerationRequest()
-
-    email_content = generator.generate_email(db_professor, card_data, request)
-    
-    # 4. Save
-    db_draft = models.EmailDraft(
-        professor_id=professor_id,
-        type=request.template,
-        tone=request.tone,
-        content_short=email_content["subject"], 
-        content_long=email_content["body"]
-    )
-    
-    db.add(db_draft)
-    db.commit()
-    db.refresh(db_draft)
-    
+
+    if background:
+        return _enqueue(db, current_user, "generate_email", {"professor_id": professor_id, "request": request.dict() if request else None})
+
+    # 2. Generate & Save
+    db_draft = pipeline.generate_email(db, db_professor, request)
+
     # Return matched schema
     return schemas.EmailDraft(
         id=db_draft.id,
@@ -233,6 +367,58 @@ def generate_email_draft(
         body=db_draft.content_long
     )
 
+@app.post("/crawls", response_model=schemas.CrawlRun, status_code=status.HTTP_202_ACCEPTED)
+def start_crawl(request: schemas.CrawlRequest, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
+    """
+    Crawls a department faculty listing in the background and bulk-creates professors.
+    """
+    from ingest import crawler
+    crawl = models.CrawlRun(
+        user_id=current_user.id,
+        seed_url=request.seed_url,
+        status="queued",
+        max_depth=min(request.max_depth if request.max_depth is not None else crawler.MAX_DEPTH, crawler.MAX_DEPTH),
+        max_pages=min(request.max_pages or crawler.MAX_PAGES, crawler.MAX_PAGES),
+        pages_fetched=0,
+        professors_created=0
+    )
+    db.add(crawl)
+    db.commit()
+    job = job_queue.enqueue(db, user_id=current_user.id, kind="crawl", payload={"crawl_id": crawl.id})
+    crawl.job_id = job.id
+    db.commit()
+    db.refresh(crawl)
+    return crawl
+
+@app.get("/crawls/{crawl_id}", response_model=schemas.CrawlRun)
+def read_crawl(crawl_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
+    crawl = db.query(models.CrawlRun).filter(models.CrawlRun.id == crawl_id, models.CrawlRun.user_id == current_user.id).first()
+    if crawl is None:
+        raise HTTPException(status_code=404, detail="Crawl not found")
+    return crawl
+
+@app.post("/crawls/{crawl_id}/resume", response_model=schemas.CrawlRun, status_code=status.HTTP_202_ACCEPTED)
+def resume_crawl(crawl_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
+    """Re-queues a stopped crawl; it continues from its persisted frontier."""
+    crawl = db.query(models.CrawlRun).filter(models.CrawlRun.id == crawl_id, models.CrawlRun.user_id == current_user.id).first()
+    if crawl is None:
+        raise HTTPException(status_code=404, detail="Crawl not found")
+    if crawl.status in ("queued", "running"):
+        raise HTTPException(status_code=409, detail="Crawl is already in progress")
+    job = job_queue.enqueue(db, user_id=current_user.id, kind="crawl", payload={"crawl_id": crawl.id})
+    crawl.job_id = job.id
+    crawl.status = "queued"
+    db.commit()
+    db.refresh(crawl)
+    return crawl
+
+@app.get("/jobs/{job_id}", response_model=schemas.Job)
+def read_job(job_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
+    job = job_queue.get_job(db, job_id=job_id, user_id=current_user.id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_queue.to_schema_dict(job)
+
 @app.patch("/professors/{professor_id}/status", response_model=schemas.PipelineStatus)
 def update_status(professor_id: int, status_update: schemas.PipelineStatusUpdate, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
     db_status = crud.update_pipeline_status(db, professor_id=professor_id, status_update=status_update, user_id=current_user.id)
@@ -243,7 +429,7 @@ def update_status(professor_id: int, status_update: schemas.PipelineStatusUpdate
 @app.get("/search_professors", response_model=List[schemas.SearchResult])
 def search_professors(query: str, current_user: models.User = Depends(get_current_active_user)):
     from search import engine
-    return engine.search_professor(query)
+    return engine.search_professor(query, user_id=current_user.id)
 
 # Singleton LLM service (initialized once on first use)
 _llm_service = None
@@ -257,70 +443,17 @@ def get_llm_service():
 @app.post("/extract_avatar")
 def extract_avatar(
     request: schemas.AvatarExtractionRequest, 
+    background: bool = False,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
     """
-    AI-Powered Avatar Extraction Pipeline:
-    1. Scrape images from website
-    2. Vision Model verifies if it's a professional photo
-    3. Return best match
+    AI-Powered Avatar Extraction Pipeline (see services/pipeline.extract_avatar).
     """
-    from search import image_scraper
-    from services.vision import get_vision_service
-    from cachetools import TTLCache
-    import logging # Added import for logger
-    logger = logging.getLogger(__name__) # Initialize logger
-    
-    # Cache to prevent abuse/repeated AI calls (24h)
-    if not hasattr(app, "avatar_cache"):
-        app.avatar_cache = TTLCache(maxsize=100, ttl=86400)
-    
-    if request.website_url in app.avatar_cache:
-        cached = app.avatar_cache[request.website_url]
-        logger.info(f"[Avatar] Cache hit for {request.website_url}")
-        return {"avatar_url": cached}
-
-    # 1. Scrape Candidates
-    logger.info(f"[Avatar] Scraping images from: {request.website_url}")
-    candidates = image_scraper.get_image_candidates(request.website_url)
-    logger.info(f"[Avatar] Found {len(candidates)} candidates.")
-    
-    if not candidates:
-        logger.warning("[Avatar] No image candidates found.")
-        app.avatar_cache[request.website_url] = None
-        return {"avatar_url": None}
-
-    vision = get_vision_service()
-    best_avatar = None
-
-    # 2. Verify Candidates (max 5)
-    for i, img_url in enumerate(candidates[:5]):
-        logger.info(f"[Avatar] Checking candidate {i+1}/{min(5, len(candidates))}: {img_url}")
-        content = image_scraper.download_image(img_url)
-        if not content:
-            logger.warning(f"[Avatar] Failed to download: {img_url}")
-            continue
-        
-        # 3. Vision Check
-        result = vision.verify_avatar(content)
-        logger.info(f"[Avatar] Vision Result: {result}")
-        
-        if result["is_valid"]: # Relaxed check handled in vision.py now
-            logger.info(f"[Avatar] ACCEPTED: {img_url} (Confidence: {result.get('confidence')})")
-            best_avatar = img_url
-            break 
-        else:
-             logger.info(f"[Avatar] REJECTED: {result.get('reason')}")
-        logger.info(f"[Avatar] Verified {img_url}: {result}")
-        
-        if result["is_valid"] and result["confidence"] >= 0.75:
-            best_avatar = img_url
-            break # Found a good one
-    
-    # 4. Cache & Return
-    app.avatar_cache[request.website_url] = best_avatar
-    return {"avatar_url": best_avatar}
+    if background:
+        return _enqueue(db, current_user, "extract_avatar", {"website_url": request.website_url, "name": request.name})
+
+    return {"avatar_url": pipeline.extract_avatar(db, request.website_url, user_id=current_user.id)}
 
 @app.post("/parse_search_result", response_model=schemas.ParseResponse)
 def parse_search_result(req: schemas.ParseRequest, current_user: models.User = Depends(get_current_active_user)):
@@ -369,3 +502,26 @@ def parse_search_result(req: schemas.ParseRequest, current_user: models.User = D
     
     return schemas.ParseResponse(name=name, affiliation=affiliation or None, confidence=0.3)
 
+
+@app.get("/metrics")
+def read_metrics(current_user: models.User = Depends(get_current_active_user)):
+    """
+    Process-level counters for the shared infrastructure (connection reuse etc).
+    """
+    from services import http_client, http_cache, cpu_pool, singleflight
+    from services.resolver import get_resolver
+    from jobs import refresher
+    from ingest.scheduler import get_scheduler
+    from search import cache as search_cache, providers as search_providers, index as search_index
+    return {
+        "http_pool": http_client.get_pool_stats(),
+        "http_cache": http_cache.get_stats(),
+        "search_cache": search_cache.get_stats(),
+        "search_providers": search_providers.get_stats(),
+        "search_index": search_index.get_stats(),
+        "dns": get_resolver().get_stats(),
+        "cpu_pool": cpu_pool.get_pool().get_stats(),
+        "fetch_scheduler": get_scheduler().get_stats(),
+        "refresher": refresher.get_stats(),
+        "singleflight": singleflight.get_stats(),
+    }
@@ -1,4 +1,6 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime, Text
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime, Text, LargeBinary, UniqueConstraint, Index
+from sqlalchemy import text
+from sqlalchemy.orm import deferred
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
@@ -47,19 +49,50 @@ class PipelineStatus(Base):
 
     professor = relationship("Professor", back_populates="pipeline_status")
 
+class ContentBlob(Base):
+    __tablename__ = "content_blobs"
+
+    hash = Column(String(64), primary_key=True) # sha256 of the uncompressed text
+    codec = Column(String, default="zlib") # zlib, zstd
+    size = Column(Integer) # uncompressed bytes
+    data = deferred(Column(LargeBinary))
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    @property
+    def text(self):
+        # Decompress once per loaded instance
+        if not hasattr(self, "_text"):
+            from services import blob_store
+            self._text = blob_store.decompress(self.codec, self.data)
+        return self._text
+
 class SourcePage(Base):
     __tablename__ = "source_pages"
 
     id = Column(Integer, primary_key=True, index=True)
     professor_id = Column(Integer, ForeignKey("professors.id"))
     source_url = Column(String)
-    raw_html = Column(Text, nullable=True)
-    raw_text = Column(Text)
+    raw_html_hash = Column(String(64), ForeignKey("content_blobs.hash"), nullable=True)
+    raw_text_hash = Column(String(64), ForeignKey("content_blobs.hash"), nullable=True, index=True)
+    text_fingerprint = Column(String(64), nullable=True) # sha256 of the normalized text (cleaner.text_fingerprint)
     fetched_at = Column(DateTime, default=datetime.utcnow)
-    fetch_status = Column(String) # ok, failed
+    fetch_status = Column(String) # ok, truncated (text from the first CLEANER_MAX_BYTES), timeout (cleaning gave up), failed
     error_msg = Column(String, nullable=True)
+    etag = Column(String, nullable=True)
+    last_modified = Column(String, nullable=True) # HTTP-date, sent back as If-Modified-Since
 
     professor = relationship("Professor", back_populates="source_pages")
+    raw_html_blob = relationship("ContentBlob", foreign_keys=[raw_html_hash])
+    raw_text_blob = relationship("ContentBlob", foreign_keys=[raw_text_hash])
+
+    # Bodies live in content_blobs; only loaded and decompressed on access
+    @property
+    def raw_html(self):
+        return self.raw_html_blob.text if self.raw_html_blob else None
+
+    @property
+    def raw_text(self):
+        return self.raw_text_blob.text if self.raw_text_blob else None
 
 class ProfessorCard(Base):
     __tablename__ = "professor_cards"
@@ -71,10 +104,24 @@ class ProfessorCard(Base):
     card_md = Column(Text)
     hiring_signals = Column(Text, nullable=True) # JSON list of strings
     version = Column(Integer, default=1)
+    source_text_hash = Column(String(64), nullable=True) # raw_text_hash of the page it was extracted from
+    extractor_version = Column(String, nullable=True) # extractor.EXTRACTOR_VERSION that produced card_json
+    source_fingerprint = Column(String(64), nullable=True) # text_fingerprint of the page it was extracted from
+    changes = Column(Text, nullable=True) # JSON diff against the previous version
     generated_at = Column(DateTime, default=datetime.utcnow)
 
     professor = relationship("Professor", back_populates="professor_cards")
 
+    # Card memo lookups: (source_text_hash, extractor_version)
+    __table_args__ = (Index("ix_professor_cards_text_key", "source_text_hash", "extractor_version"),)
+
+class TermFrequency(Base):
+    # Document frequency per phrase across ingested pages (ingest/keywords.py)
+    __tablename__ = "term_frequencies"
+
+    term_id = Column(Integer, primary_key=True, autoincrement=False) # 31-bit crc32 of the lowercased phrase; 0 = document count
+    df = Column(Integer, nullable=False, default=0)
+
 class EmailDraft(Base):
     __tablename__ = "email_drafts"
 
@@ -95,3 +142,60 @@ class EmailDraft(Base):
         return self.content_long
 
     professor = relationship("Professor", back_populates="email_drafts")
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    kind = Column(String) # ingest, generate_card, generate_cards, generate_email, extract_avatar, crawl, refresh
+    status = Column(String, default="queued", index=True) # queued, running, done, failed
+    payload = Column(Text) # JSON
+    result = Column(Text, nullable=True) # JSON
+    progress = Column(Text, nullable=True) # JSON {"done", "total"} for batch jobs
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    run_after = Column(DateTime, default=datetime.utcnow) # retry backoff
+    locked_by = Column(String, nullable=True) # worker id holding the lease
+    lease_expires_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+    dedupe_key = Column(String, nullable=True) # at most one queued or running job per key (queue.enqueue)
+
+    __table_args__ = (
+        Index(
+            "ix_jobs_pending_dedupe_key", "dedupe_key", unique=True,
+            sqlite_where=text("status IN ('queued', 'running')"),
+            postgresql_where=text("status IN ('queued', 'running')")
+        ),
+    )
+
+class CrawlRun(Base):
+    __tablename__ = "crawl_runs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    seed_url = Column(String)
+    status = Column(String, default="queued") # queued, running, done, budget_exhausted, failed
+    max_depth = Column(Integer, default=2)
+    max_pages = Column(Integer, default=200)
+    pages_fetched = Column(Integer, default=0)
+    professors_created = Column(Integer, default=0)
+    default_affiliation = Column(String, nullable=True) # from the seed listing's title
+    job_id = Column(Integer, ForeignKey("jobs.id"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class CrawlFrontier(Base):
+    __tablename__ = "crawl_frontier"
+    __table_args__ = (UniqueConstraint("crawl_id", "url"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    crawl_id = Column(Integer, ForeignKey("crawl_runs.id"), index=True)
+    url = Column(String)
+    depth = Column(Integer, default=0)
+    kind = Column(String) # listing, profile
+    status = Column(String, default="pending") # pending, done, failed
+    error = Column(String, nullable=True)
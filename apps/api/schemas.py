@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict, Any, Literal
 from datetime import datetime
 from typing import Optional, List
 from pydantic import BaseModel
@@ -46,6 +46,7 @@ class SearchResult(BaseModel):
     link: str
     snippet: str
     affiliation: Optional[str] = None
+    sources: List[str] = [] # search providers that returned this link
 
 class ParseRequest(BaseModel):
     query: str
@@ -84,6 +85,9 @@ class SourcePage(SourcePageBase):
     professor_id: int
     fetched_at: datetime
     raw_text: Optional[str] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    text_fingerprint: Optional[str] = None
 
     class Config:
         orm_mode = True
@@ -91,6 +95,45 @@ class SourcePage(SourcePageBase):
 class IngestRequest(BaseModel):
     professor_id: int
     url: str
+    text_mode: Optional[Literal["auto", "fast", "readability"]] = None # default: CLEANER_TEXT_MODE
+
+class BatchIngestRequest(BaseModel):
+    items: List[IngestRequest]
+    # Can only lower the server's INGEST_BATCH_CONCURRENCY / INGEST_PER_HOST_CONCURRENCY
+    max_concurrency: Optional[int] = Field(None, ge=1, le=64)
+    per_host_concurrency: Optional[int] = Field(None, ge=1, le=16)
+
+class BatchIngestItem(BaseModel):
+    professor_id: int
+    url: str
+    status: str # ok, truncated, timeout, failed, not_modified, not_found
+    source_page_id: Optional[int] = None
+    error_msg: Optional[str] = None
+    fetch_ms: Optional[float] = None
+    elapsed_ms: Optional[float] = None
+
+class BatchIngestResponse(BaseModel):
+    items: List[BatchIngestItem]
+    succeeded: int
+    failed: int
+    elapsed_ms: float
+
+class GenerateCardsRequest(BaseModel):
+    professor_ids: Optional[List[int]] = None # default: all of the user's professors
+
+class GenerateCardsItem(BaseModel):
+    professor_id: int
+    status: str # created, unchanged, no_source, timeout, not_found
+    card_id: Optional[int] = None
+    version: Optional[int] = None
+    error_msg: Optional[str] = None
+
+class GenerateCardsResponse(BaseModel):
+    items: List[GenerateCardsItem]
+    created: int
+    unchanged: int
+    failed: int
+    elapsed_ms: float
 
 class ProfessorCardBase(BaseModel):
     card_json: str
@@ -102,10 +145,22 @@ class ProfessorCard(ProfessorCardBase):
     professor_id: int
     version: int
     generated_at: datetime
+    changes: Optional[str] = None # JSON diff against the previous version
+    extractor_version: Optional[str] = None
 
     class Config:
         orm_mode = True
 
+class RefreshResult(BaseModel):
+    professor_id: int
+    source_page_id: int
+    fetch_status: str # ok, truncated, timeout, failed
+    text_changed: bool # normalized text differs from the previous fetch
+    card_id: Optional[int] = None
+    card_version: Optional[int] = None
+    card_updated: bool = False # a new card version was extracted
+    changes: Optional[Dict[str, Any]] = None # per-field added/removed items
+
 class EmailDraftBase(BaseModel):
     type: str # summer_intern, phd
     subject: Optional[str] = None
@@ -160,3 +215,46 @@ class Professor(ProfessorBase):
 
     class Config:
         orm_mode = True
+
+class ProfessorSearchHit(BaseModel):
+    professor: Professor
+    rank: float # higher is better
+    snippet: Optional[str] = None # matched words wrapped in [ ]
+
+class ProfessorSearchResponse(BaseModel):
+    total: int
+    items: List[ProfessorSearchHit]
+    elapsed_ms: float
+
+class Job(BaseModel):
+    id: int
+    kind: str
+    status: str # queued, running, done, failed
+    attempts: int
+    result: Optional[Any] = None
+    progress: Optional[Dict[str, int]] = None # {"done", "total"} while a batch job runs
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class CrawlRequest(BaseModel):
+    seed_url: str
+    max_depth: Optional[int] = None
+    max_pages: Optional[int] = None
+
+class CrawlRun(BaseModel):
+    id: int
+    seed_url: str
+    status: str
+    max_depth: int
+    max_pages: int
+    pages_fetched: int
+    professors_created: int
+    default_affiliation: Optional[str] = None
+    job_id: Optional[int] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
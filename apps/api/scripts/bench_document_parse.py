@@ -0,0 +1,97 @@
+"""
+Benchmark: parses and CPU time per ingest, before/after ParsedDocument.
+
+"Before" replays the old pipeline: readability on the raw string, BeautifulSoup
+on the summary, BeautifulSoup again for extract_images and once more (html.parser)
+in image_scraper.get_image_candidates. "After" builds one ParsedDocument and
+reads text, avatar and candidates from it.
+
+Usage:
+    python scripts/bench_document_parse.py [dir_with_html_files] [--rounds N]
+"""
+import sys
+import os
+import glob
+import time
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+from readability import Document
+
+from ingest import cleaner, document
+from search import image_scraper
+
+
+def synthetic_pages(n: int = 20):
+    pages = []
+    for i in range(n):
+        pubs = "\n".join(
+            f'<li>Author {j}, Doe J. et al. "A study of topic {j} in learning systems." NeurIPS {2000 + j % 25}.</li>'
+            for j in range(50 * (i % 5 + 1))
+        )
+        pages.append(f"""<html><head><title>Prof {i}</title>
+<meta property="og:image" content="/img/prof{i}.jpg"><script>var tracking = {i};</script></head>
+<body><nav><a href="/">Home</a> | <a href="/people">People</a> | <a href="/research">Research</a></nav>
+<div id="main"><h1>Professor {i}</h1>
+<img src="/img/logo.png" alt="department logo"><img src="/img/headshot{i}.jpg" alt="profile photo">
+<p>Professor {i} is a faculty member in Computer Science working on machine learning, robotics and computer vision. {'Lorem ipsum dolor sit amet. ' * 20}</p>
+<h2>Research Interests</h2><p>Machine Learning, Computer Vision, Robotics</p>
+<h2>Selected Publications</h2><ul>{pubs}</ul></div>
+<footer>Copyright University</footer></body></html>""")
+    return pages
+
+
+def before(raw_html: str, url: str):
+    parses = 0
+    summary = Document(raw_html).summary(); parses += 1
+    text = BeautifulSoup(summary, "lxml").get_text(separator="\n", strip=True); parses += 1
+    soup = BeautifulSoup(raw_html, "lxml"); parses += 1
+    og = soup.find("meta", property="og:image")
+    soup2 = BeautifulSoup(raw_html.encode("utf-8"), "html.parser"); parses += 1
+    imgs = [img.get("src") for img in soup2.find_all("img")]
+    return parses, text, og, imgs
+
+
+def after(raw_html: str, url: str):
+    document.reset_parse_stats()
+    doc = document.parse_document(raw_html, url)
+    text = cleaner.clean_document(doc)
+    avatar = cleaner.extract_document_images(doc)
+    candidates = image_scraper.score_image_candidates(doc)
+    return document.get_parse_stats()["parses"], text, avatar, candidates
+
+
+def run(label, fn, pages, rounds):
+    parses = 0
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    for _ in range(rounds):
+        for i, page in enumerate(pages):
+            parses += fn(page, f"http://example.edu/~prof{i}/")[0]
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+    n = rounds * len(pages)
+    print(f"{label:<8} parses/ingest={parses / n:.1f}  cpu/ingest={cpu / n * 1000:.2f}ms  wall/ingest={wall / n * 1000:.2f}ms")
+    return cpu / n
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("corpus", nargs="?", help="directory of .html files (default: synthetic pages)")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.corpus:
+        pages = []
+        for path in sorted(glob.glob(os.path.join(args.corpus, "*.html"))):
+            with open(path, encoding="utf-8", errors="replace") as f:
+                pages.append(f.read())
+    else:
+        pages = synthetic_pages()
+
+    print(f"Pages: {len(pages)}  ({sum(len(p) for p in pages) / 1024:.0f} KB)  rounds: {args.rounds}")
+    cpu_before = run("before", before, pages, args.rounds)
+    cpu_after = run("after", after, pages, args.rounds)
+    print(f"CPU reduction: {(1 - cpu_after / cpu_before) * 100:.0f}%")
@@ -0,0 +1,190 @@
+"""
+Benchmark: extract_professor_card lines/sec, per-line regex loops vs the compiled rule engine.
+
+"Before" is the previous extractor, kept below as legacy_extract_professor_card:
+8 hiring patterns re.search'ed per line over the first 100 lines, then full
+rescans of the lines for interests and publications. "After" is
+ingest/extractor.py, which finds all of them in one pass (index_lines).
+
+Pages are cleaned to text once up front (not timed). Both versions must give
+the same cards; hiring_signals are compared as sets, since the old version
+returned them in set order. The research-interest fallback is shared (both
+use ingest/keywords.py, with an empty corpus). Publications are not
+compared: ingest/publications.py has since replaced the line scan (see
+scripts/eval_extraction.py for its quality). Besides the pages themselves, every text is also
+checked with its lines shuffled, to move headers, boundaries and signals
+around.
+
+Usage:
+    python scripts/bench_extractor.py [dir_with_html_files] [--rounds N]
+"""
+import sys
+import os
+import re
+import glob
+import time
+import random
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingest import cleaner, extractor, keywords
+from bench_document_parse import synthetic_pages
+
+EXTRA_TEXTS = [
+    # Header on its own line, items below, indented next section
+    "Jane Doe\nResearch Interests\nRobotics, Control Theory\n  Machine Perception\n   Selected Awards\nNSF CAREER 2020\n",
+    # Hiring signals past line 100 are ignored
+    "\n".join(["filler line"] * 120 + ["We are recruiting students for Fall 2026."]),
+    # Case: "Ph.D" never matched the lowercased line, "students" does
+    "I am looking for Ph.D. students.\nI am looking for students to join our lab.\nOpenings for postdocs.\n",
+    "Areas:\n- Databases\n- Distributed Systems\nPublications\nDoe J. et al. \"A very long and descriptive title of a paper.\" VLDB 2021.\n",
+    "İnterests: Ünicode handling, Straße\nΣΟΦΙΑ focus: ΑΣ\nfocus\n\n\npublic talks\n",
+]
+
+
+def legacy_extract_professor_card(text: str) -> dict:
+    card = {
+        "summary": "",
+        "research_interests": [],
+        "selected_publications": [],
+        "hiring_signals": []
+    }
+
+    if not text:
+        return card
+
+    lines = text.split('\n')
+    text_lower = text.lower()
+
+    hiring_keywords = [
+        r"looking for (Ph\.?D\.?|students|postdocs|research assistants)",
+        r"openings? for",
+        r"recruiting (Ph\.?D\.?|students)",
+        r"accepting (new )?students",
+        r"join (my|our) (lab|group|team)",
+        r"available positions?",
+        r"apply for",
+        r"fall 202[4-9]",
+    ]
+
+    detected_signals = set()
+    for line in lines[:100]:
+        line_lower = line.lower()
+        for pattern in hiring_keywords:
+            if re.search(pattern, line_lower):
+                clean_signal = line.strip()
+                if len(clean_signal) > 100:
+                   clean_signal = clean_signal[:100] + "..."
+                detected_signals.add(clean_signal)
+
+    card["hiring_signals"] = list(detected_signals)
+
+    interests_pattern = re.compile(r"(?i)(current )?(research\s+)?(interests|areas|focus)\s*[:\-\u2013\u2014]?\s*(.*)")
+
+    found_explicit_interests = False
+    for i, line in enumerate(lines):
+        match = interests_pattern.search(line)
+        if match:
+            content = match.group(4).strip()
+            if content and len(content) > 3:
+                items = [item.strip() for item in re.split(r'[,;]', content) if len(item.strip()) > 2]
+                card["research_interests"].extend(items)
+                found_explicit_interests = True
+            else:
+                for j in range(1, 5):
+                    if i + j >= len(lines): break
+                    next_line = lines[i+j].strip()
+                    if not next_line: continue
+                    if re.match(r"(?i)(selected|public|award|teaching)", next_line): break
+                    items = [item.strip() for item in re.split(r'[,;•\-\*]', next_line) if len(item.strip()) > 3 and len(item.strip()) < 50]
+                    card["research_interests"].extend(items)
+                    if items: found_explicit_interests = True
+
+            if found_explicit_interests:
+                break
+
+    if not card["research_interests"]:
+        # The frequency fallback has since become TF-IDF; use the current one so only the rules are compared
+        card["research_interests"] = keywords.get_model().rank(text, limit=5)
+
+    if len(card["research_interests"]) > 6:
+        card["research_interests"] = card["research_interests"][:6]
+
+    pub_header_idx = -1
+    for i, line in enumerate(lines):
+        if re.search(r"(?i)(selected|recent)\s+publications|publications", line):
+            pub_header_idx = i
+            break
+
+    if pub_header_idx != -1:
+        count = 0
+        for i in range(pub_header_idx + 1, min(len(lines), pub_header_idx + 100)):
+            line = lines[i].strip()
+            if not line: continue
+            if re.search(r"\b(19|20)\d{2}\b", line) and len(line) > 40:
+                if re.search(r"et al|pp\.|vol\.|proc\.|conf\.|arXiv|CVPR|ICML|NeurIPS|ICLR|ECCV", line, re.IGNORECASE) or '"' in line:
+                    card["selected_publications"].append(line)
+                    count += 1
+            if count >= 3:
+                break
+
+    for line in lines[:25]:
+        clean = line.strip()
+        if len(clean) > 80:
+             if re.match(r"^[\-•\*]", clean) or re.search(r"\b(19|20)\d{2}\b", clean):
+                 continue
+             card["summary"] = clean[:300] + "..."
+             break
+
+    return card
+
+
+def comparable(card: dict) -> dict:
+    card = {key: value for key, value in card.items() if key not in ("selected_publications", "publications")}
+    return {**card, "hiring_signals": sorted(card["hiring_signals"])}
+
+
+def time_extractor(fn, texts, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        cards = [fn(text) for text in texts]
+    return cards, time.perf_counter() - started
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("corpus", nargs="?", help="directory of .html files (default: synthetic pages)")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    keywords.set_model(keywords.KeywordModel())
+    pages = synthetic_pages()
+    if args.corpus:
+        for path in sorted(glob.glob(os.path.join(args.corpus, "*.html"))):
+            with open(path, encoding="utf-8", errors="replace") as f:
+                pages.append(f.read())
+    texts = [cleaner.clean_page(page, mode="fast")["raw_text"] for page in pages] + EXTRA_TEXTS
+
+    # Same texts with lines shuffled: checked for identical output, not timed
+    rng = random.Random(0)
+    shuffled = []
+    for text in texts:
+        lines = text.split("\n")
+        rng.shuffle(lines)
+        shuffled.append("\n".join(lines))
+    mismatches = [
+        i for i, text in enumerate(texts + shuffled)
+        if comparable(legacy_extract_professor_card(text)) != comparable(extractor.extract_professor_card(text))
+    ]
+
+    total_lines = sum(text.count("\n") + 1 for text in texts) * args.rounds
+    print(f"Texts: {len(texts)}  ({sum(len(t) for t in texts) / 1024:.0f} KB, {total_lines // args.rounds} lines)  rounds: {args.rounds}")
+    _, before = time_extractor(legacy_extract_professor_card, texts, args.rounds)
+    _, after = time_extractor(extractor.extract_professor_card, texts, args.rounds)
+    print(f"{'before':<8} {total_lines / before:12,.0f} lines/s  {before / (len(texts) * args.rounds) * 1000:7.3f} ms/text")
+    print(f"{'after':<8} {total_lines / after:12,.0f} lines/s  {after / (len(texts) * args.rounds) * 1000:7.3f} ms/text  x{before / after:.1f} faster")
+    if mismatches:
+        print(f"!! {len(mismatches)} of {len(texts) * 2} texts produced different cards: {mismatches[:10]}")
+        sys.exit(1)
+    print(f"Identical cards on all {len(texts) * 2} texts (incl. shuffled)")
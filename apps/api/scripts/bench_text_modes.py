@@ -0,0 +1,84 @@
+"""
+Benchmark: text extraction speed and overlap, fast vs readability vs auto.
+
+Each mode runs on a freshly parsed document (parse time excluded), so the
+numbers compare extraction only. Overlap is measured against readability
+(the previous behaviour):
+  - recall     share of readability's words that fast/auto also returns
+  - precision  share of fast/auto words that readability also returns
+(word multisets, case-insensitive).
+
+Usage:
+    python scripts/bench_text_modes.py [dir_with_html_files] [--rounds N]
+"""
+import sys
+import os
+import re
+import glob
+import time
+import argparse
+from collections import Counter
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingest import document
+from bench_document_parse import synthetic_pages
+
+WORD_RE = re.compile(r"\w+")
+
+
+def words(text: str) -> Counter:
+    return Counter(w.lower() for w in WORD_RE.findall(text))
+
+
+def overlap(candidate: str, reference: str):
+    cand, ref = words(candidate), words(reference)
+    common = sum((cand & ref).values())
+    precision = common / sum(cand.values()) if cand else 1.0
+    recall = common / sum(ref.values()) if ref else 1.0
+    return precision, recall
+
+
+def time_mode(pages, mode, rounds):
+    texts = []
+    elapsed = 0.0
+    for _ in range(rounds):
+        texts = []
+        for i, page in enumerate(pages):
+            doc = document.parse_document(page, f"http://example.edu/~prof{i}/")
+            doc.tree # parse outside the timed section
+            started = time.perf_counter()
+            texts.append(doc.extract_text(mode))
+            elapsed += time.perf_counter() - started
+    return texts, elapsed / (rounds * len(pages))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("corpus", nargs="?", help="directory of .html files (default: synthetic pages)")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.corpus:
+        pages = []
+        for path in sorted(glob.glob(os.path.join(args.corpus, "*.html"))):
+            with open(path, encoding="utf-8", errors="replace") as f:
+                pages.append(f.read())
+    else:
+        pages = synthetic_pages()
+
+    print(f"Pages: {len(pages)}  ({sum(len(p) for p in pages) / 1024:.0f} KB)  rounds: {args.rounds}")
+    reference, ref_time = time_mode(pages, "readability", args.rounds)
+    print(f"{'readability':<12} {ref_time * 1000:7.2f} ms/page")
+
+    for mode in ("fast", "auto"):
+        document.reset_parse_stats()
+        texts, mode_time = time_mode(pages, mode, args.rounds)
+        scores = [overlap(t, r) for t, r in zip(texts, reference)]
+        precision = sum(p for p, _ in scores) / len(scores)
+        recall = sum(r for _, r in scores) / len(scores)
+        worst = min(r for _, r in scores)
+        stats = document.get_parse_stats()
+        used = f"  (readability used on {stats['text_readability'] // args.rounds}/{len(pages)} pages)" if mode == "auto" else ""
+        print(f"{mode:<12} {mode_time * 1000:7.2f} ms/page  x{ref_time / mode_time:.1f} faster  "
+              f"precision {precision:.2f}  recall {recall:.2f} (worst page {worst:.2f}){used}")
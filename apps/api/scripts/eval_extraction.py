@@ -0,0 +1,302 @@
+"""
+Extraction benchmark: speed and card quality on a fixed corpus of saved pages.
+
+The corpus (scripts/extraction_corpus/) is a set of saved professor pages
+(pages/*.html) with hand-labelled cards in expected.json: summary,
+research_interests, hiring_signals and selected_publications per page (the
+first few publications, as a card would show them). It covers the layouts
+the extractor has to deal with: department profiles, GitHub/Google Sites
+pages, pages without section headers, hiring banners, non-ASCII names and a
+400-entry publication dump.
+
+Stages (each page cleaned/extracted --rounds times):
+  clean    HTML -> text, parse included (cleaner.clean_page)
+  extract  text -> card (extractor.extract_professor_card)
+  total    both
+For each: pages/s, MB/s of input (HTML for clean/total, text for extract),
+p50/p99 latency per page and peak Python heap (tracemalloc, separate untimed
+pass; lxml's own allocations are not traced).
+
+Research-interest fallbacks (ingest/keywords.py) are ranked against document
+frequencies over the corpus pages themselves.
+
+Quality, per field: card items are matched one-to-one to expected items
+(case/whitespace-insensitive; equal, or one contains the other, ignoring a
+trailing "..."). Research interests must also be at least 60% of the
+length of what they match, so "Self" doesn't count for "Self-supervised
+learning". Micro precision/recall over all pages.
+
+Baseline: baseline.json holds the numbers, the cards, EXTRACTOR_VERSION and
+the machine from the last --save-baseline. A normal run compares against it
+and exits 1 on:
+  - a precision or recall drop of more than 0.01 on any field
+  - a card that changed for the same text while EXTRACTOR_VERSION did not
+    (stored cards are memoized on text hash + version and would go stale)
+  - with --check-timing: throughput below / p99 above the baseline by more
+    than --tolerance. Timings depend on the machine, so they are only
+    compared against a baseline saved on the same one (skipped otherwise).
+
+Usage:
+    python scripts/eval_extraction.py [--rounds N] [--mode auto|fast|readability]
+                                      [--check-timing] [--tolerance 0.25] [--save-baseline]
+"""
+import sys
+import os
+import re
+import json
+import time
+import argparse
+import platform
+import resource
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingest import cleaner, document, extractor, keywords
+from services import blob_store
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "extraction_corpus")
+FIELDS = ("summary", "research_interests", "hiring_signals", "selected_publications")
+STAGES = ("clean", "extract", "total")
+# Shortest share of the matched item's length a card item may cover, per field
+MIN_MATCH_RATIO = {"research_interests": 0.6}
+QUALITY_TOLERANCE = 0.01
+
+SPACE_RE = re.compile(r"\s+")
+
+
+def load_corpus(corpus_dir: str):
+    with open(os.path.join(corpus_dir, "expected.json"), encoding="utf-8") as f:
+        expected = json.load(f)
+    pages = []
+    for name in sorted(expected):
+        with open(os.path.join(corpus_dir, "pages", name), encoding="utf-8") as f:
+            pages.append((name, expected[name]["url"], f.read()))
+    return pages, expected
+
+
+# --- Quality ---
+
+def normalize_item(item: str) -> str:
+    item = SPACE_RE.sub(" ", item).strip().lower()
+    if item.endswith("..."):
+        item = item[:-3].rstrip()
+    return item.strip(" .;,")
+
+
+def items_match(found: str, wanted: str, min_ratio: float = 0.0) -> bool:
+    if not found or not wanted:
+        return False
+    if found == wanted:
+        return True
+    shorter, longer = sorted((found, wanted), key=len)
+    return shorter in longer and len(found) >= min_ratio * len(wanted)
+
+
+def field_items(value) -> list:
+    if isinstance(value, str):
+        value = [value] if value else []
+    return [item for item in (normalize_item(v) for v in value) if item]
+
+
+def score_field(found, wanted, min_ratio: float = 0.0):
+    """(matched, found count, expected count) with one-to-one greedy matching."""
+    found, wanted = field_items(found), field_items(wanted)
+    unmatched = list(wanted)
+    matched = 0
+    for item in found:
+        for i, target in enumerate(unmatched):
+            if items_match(item, target, min_ratio):
+                del unmatched[i]
+                matched += 1
+                break
+    return matched, len(found), len(wanted)
+
+
+def score_cards(cards: dict, expected: dict) -> dict:
+    quality = {}
+    for field in FIELDS:
+        matched = found = wanted = 0
+        for name, card in cards.items():
+            m, f, w = score_field(card[field], expected[name][field], MIN_MATCH_RATIO.get(field, 0.0))
+            matched, found, wanted = matched + m, found + f, wanted + w
+        quality[field] = {
+            "precision": round(matched / found, 4) if found else 1.0,
+            "recall": round(matched / wanted, 4) if wanted else 1.0,
+        }
+    return quality
+
+
+# --- Speed ---
+
+def percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run_stages(pages, mode: str, rounds: int):
+    """Timed runs; returns (texts, cards, per-stage latencies in seconds)."""
+    latencies = {stage: [] for stage in STAGES}
+    texts, cards = {}, {}
+    for _ in range(rounds):
+        for name, url, html in pages:
+            started = time.perf_counter()
+            text = cleaner.clean_page(html, url, mode=mode)["raw_text"]
+            cleaned = time.perf_counter()
+            card = extractor.extract_professor_card(text)
+            done = time.perf_counter()
+            latencies["clean"].append(cleaned - started)
+            latencies["extract"].append(done - cleaned)
+            latencies["total"].append(done - started)
+            texts[name], cards[name] = text, card
+    return texts, cards, latencies
+
+
+def peak_memory(pages, texts: dict, mode: str) -> dict:
+    """Peak traced Python heap per stage, in MB (one untimed pass each)."""
+    def traced(fn):
+        tracemalloc.start()
+        try:
+            fn()
+            return tracemalloc.get_traced_memory()[1] / 1e6
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "clean": traced(lambda: [cleaner.clean_page(html, url, mode=mode) for _, url, html in pages]),
+        "extract": traced(lambda: [extractor.extract_professor_card(texts[name]) for name, _, _ in pages]),
+        "total": traced(lambda: [
+            extractor.extract_professor_card(cleaner.clean_page(html, url, mode=mode)["raw_text"])
+            for _, url, html in pages
+        ]),
+    }
+
+
+def perf_report(pages, texts: dict, latencies: dict, memory: dict) -> dict:
+    html_mb = sum(len(html.encode("utf-8")) for _, _, html in pages) / 1e6
+    text_mb = sum(len(text.encode("utf-8")) for text in texts.values()) / 1e6
+    rounds = len(latencies["total"]) // len(pages)
+    perf = {}
+    for stage in STAGES:
+        elapsed = sum(latencies[stage])
+        input_mb = text_mb if stage == "extract" else html_mb
+        perf[stage] = {
+            "pages_per_s": round(len(latencies[stage]) / elapsed, 1),
+            "mb_per_s": round(input_mb * rounds / elapsed, 2),
+            "p50_ms": round(percentile(latencies[stage], 50) * 1000, 3),
+            "p99_ms": round(percentile(latencies[stage], 99) * 1000, 3),
+            "peak_mb": round(memory[stage], 2),
+        }
+    return perf
+
+
+# --- Baseline ---
+
+def machine() -> str:
+    return f"{platform.node()} ({platform.machine()}, {os.cpu_count()} CPUs, Python {platform.python_version()})"
+
+
+def compare(result: dict, baseline: dict, tolerance: float = None) -> list:
+    """Regressions against the baseline; timings only with a tolerance."""
+    problems = []
+    for field in FIELDS:
+        for metric in ("precision", "recall"):
+            before, after = baseline["quality"][field][metric], result["quality"][field][metric]
+            if after < before - QUALITY_TOLERANCE:
+                problems.append(f"{field} {metric} dropped {before:.3f} -> {after:.3f}")
+
+    for stage in STAGES if tolerance is not None else ():
+        before, after = baseline["perf"][stage], result["perf"][stage]
+        if after["pages_per_s"] < before["pages_per_s"] * (1 - tolerance):
+            problems.append(f"{stage} throughput {before['pages_per_s']:,.0f} -> {after['pages_per_s']:,.0f} pages/s")
+        if after["p99_ms"] > before["p99_ms"] * (1 + tolerance):
+            problems.append(f"{stage} p99 {before['p99_ms']:.2f} -> {after['p99_ms']:.2f} ms")
+
+    if result["extractor_version"] == baseline["extractor_version"]:
+        for name, page in result["pages"].items():
+            old = baseline["pages"].get(name)
+            if old and old["text_hash"] == page["text_hash"] and old["card"] != page["card"]:
+                problems.append(f"{name}: card changed but EXTRACTOR_VERSION is still {result['extractor_version']!r}")
+    return problems
+
+
+def print_report(result: dict, baseline: dict = None):
+    print(f"{'stage':<8} {'pages/s':>10} {'MB/s':>8} {'p50 ms':>9} {'p99 ms':>9} {'peak MB':>8}")
+    for stage in STAGES:
+        p = result["perf"][stage]
+        line = f"{stage:<8} {p['pages_per_s']:>10,.0f} {p['mb_per_s']:>8.2f} {p['p50_ms']:>9.3f} {p['p99_ms']:>9.3f} {p['peak_mb']:>8.2f}"
+        if baseline:
+            line += f"   (baseline {baseline['perf'][stage]['pages_per_s']:,.0f} pages/s, p99 {baseline['perf'][stage]['p99_ms']:.3f} ms)"
+        print(line)
+    print(f"max RSS: {result['max_rss_mb']:.0f} MB")
+    print()
+    print(f"{'field':<22} {'precision':>9} {'recall':>7}")
+    for field in FIELDS:
+        q = result["quality"][field]
+        line = f"{field:<22} {q['precision']:>9.3f} {q['recall']:>7.3f}"
+        if baseline:
+            b = baseline["quality"][field]
+            line += f"   (baseline {b['precision']:.3f} / {b['recall']:.3f})"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default=CORPUS_DIR, help="directory with pages/ and expected.json")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--mode", help="cleaner text mode (default: the baseline's, else CLEANER_TEXT_MODE)")
+    parser.add_argument("--check-timing", action="store_true", help="also fail on slowdowns (same-machine baselines only)")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown (default 0.25)")
+    parser.add_argument("--save-baseline", action="store_true", help="write baseline.json instead of comparing")
+    args = parser.parse_args()
+
+    baseline_path = os.path.join(args.corpus, "baseline.json")
+    baseline = None
+    if os.path.exists(baseline_path) and not args.save_baseline:
+        with open(baseline_path, encoding="utf-8") as f:
+            baseline = json.load(f)
+    mode = args.mode or (baseline["mode"] if baseline else document.TEXT_MODE)
+    if baseline and baseline["mode"] != mode:
+        sys.exit(f"Baseline was recorded with mode {baseline['mode']!r}; rerun with --mode {baseline['mode']} or --save-baseline")
+
+    pages, expected = load_corpus(args.corpus)
+    # Fallback interests are ranked against the corpus itself, as if these were all the ingested pages
+    corpus = keywords.KeywordModel()
+    corpus.add_texts(cleaner.clean_page(html, url, mode=mode)["raw_text"] for _, url, html in pages)
+    keywords.set_model(corpus)
+    html_kb = sum(len(html) for _, _, html in pages) / 1024
+    print(f"Pages: {len(pages)}  ({html_kb:.0f} KB)  rounds: {args.rounds}  mode: {mode}  extractor: v{extractor.EXTRACTOR_VERSION}")
+
+    texts, cards, latencies = run_stages(pages, mode, args.rounds)
+    result = {
+        "extractor_version": extractor.EXTRACTOR_VERSION,
+        "mode": mode,
+        "machine": machine(),
+        "perf": perf_report(pages, texts, latencies, peak_memory(pages, texts, mode)),
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "quality": score_cards(cards, expected),
+        "pages": {name: {"text_hash": blob_store.content_hash(texts[name]), "card": cards[name]} for name in sorted(cards)},
+    }
+    print_report(result, baseline)
+
+    if args.save_baseline:
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        print(f"\nBaseline saved to {baseline_path}")
+    elif baseline is None:
+        print("\nNo baseline yet; run with --save-baseline to record one")
+    else:
+        tolerance = None
+        if args.check_timing and baseline.get("machine") != result["machine"]:
+            print(f"\nBaseline timings are from {baseline.get('machine') or 'an unknown machine'}; "
+                  f"not comparing them (--save-baseline here to check timing)")
+        elif args.check_timing:
+            tolerance = args.tolerance
+        problems = compare(result, baseline, tolerance)
+        if problems:
+            print("\n!! Regressions against baseline:")
+            for problem in problems:
+                print(f"   {problem}")
+            sys.exit(1)
+        print("\nNo regressions against baseline")
@@ -0,0 +1,29 @@
+"""
+Recounts the keyword document frequencies (term_frequencies) from the
+latest page per professor and URL.
+
+Ingest keeps the table up to date; run this once after the migration to
+count pages ingested before it, or after deleting many professors.
+
+Usage:
+    python scripts/rebuild_keyword_stats.py
+"""
+import sys
+import os
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import models
+from database import SessionLocal
+from ingest import keywords
+
+if __name__ == "__main__":
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        documents = keywords.rebuild(db)
+        terms = db.query(models.TermFrequency).filter(models.TermFrequency.term_id != keywords.DOCUMENT_COUNT_ID).count()
+    finally:
+        db.close()
+    print(f"Counted {documents} pages, {terms} distinct phrases in {time.perf_counter() - started:.1f}s")
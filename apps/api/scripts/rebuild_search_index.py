@@ -0,0 +1,28 @@
+"""
+Rebuilds the professor full-text index (search/index.py) from the current
+professors, cards and page texts.
+
+The API keeps the index up to date and fills it on startup when documents
+are missing; run this after changing SEARCH_INDEX_MAX_CHARS or the
+tokenizer, or to time a full rebuild.
+
+Usage:
+    python scripts/rebuild_search_index.py
+"""
+import sys
+import os
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import SessionLocal
+from search import index as search_index
+
+if __name__ == "__main__":
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        documents = search_index.rebuild(db)
+    finally:
+        db.close()
+    print(f"Indexed {documents} professors in {time.perf_counter() - started:.1f}s")
@@ -1,8 +1,12 @@
 import sys
 import os
 import logging
+import tempfile
 from dotenv import load_dotenv
 
+# Keep the HTTP cache out of the working directory
+os.environ["HTTP_CACHE_PATH"] = os.path.join(tempfile.mkdtemp(), "http_cache.db")
+
 # Add parent dir to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
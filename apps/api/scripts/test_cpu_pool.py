@@ -0,0 +1,177 @@
+"""
+Checks the ingest path with cleaning in CPU pool worker processes.
+
+  - /ingest then /extract_avatar parses the page once: in the pool worker,
+    which sends the avatar candidates back; the API process neither parses
+    nor reloads the page from the DB
+  - a task that times out only takes its own worker down: tasks running in
+    the other worker finish in the pool, not inline
+  - time spent queued behind other tasks doesn't count toward the timeout
+  - a task that kills its worker raises WorkerDied instead of re-running
+    inline (which would take the test process down with it); a worker that
+    died while idle is replaced without failing the next task
+
+Usage:
+    python scripts/test_cpu_pool.py
+"""
+import sys
+import os
+import time
+import tempfile
+import threading
+import http.server
+import socketserver
+
+TMP_DIR = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TMP_DIR, 'app.db')}"
+os.environ["HTTP_CACHE_PATH"] = os.path.join(TMP_DIR, "http_cache.db")
+os.environ["CPU_POOL_WORKERS"] = "2"
+os.environ["LLM_PARSING_ENABLED"] = "false"
+os.environ.setdefault("FETCH_MIN_DELAY", "0")
+os.environ.setdefault("ROBOTS_ENABLED", "false")
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PAGE = b"""<html><head><title>Jane Doe</title></head><body>
+<h1>Jane Doe</h1><img src="/img/logo.png" alt="department logo"><img src="/img/jane-headshot.jpg" alt="profile photo">
+<p>Jane Doe is a professor of computer science working on machine learning.</p></body></html>"""
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(PAGE)))
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+    def log_message(self, *args):
+        pass
+
+
+def sleep_for(seconds: float) -> int:
+    time.sleep(seconds)
+    return os.getpid()
+
+
+def crash() -> int:
+    os._exit(3)
+
+
+def concurrently(*calls):
+    """Runs each () -> value in its own thread; returns values (or exceptions) in order."""
+    results = [None] * len(calls)
+
+    def run(i, call):
+        try:
+            results[i] = call()
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=run, args=(i, call)) for i, call in enumerate(calls)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def serve() -> str:
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    import crud
+    import models
+    from database import SessionLocal, engine as db_engine
+    from ingest import document
+    from search import image_scraper
+    from search import index as search_index
+    from services import cpu_pool, pipeline, vision
+
+    models.Base.metadata.create_all(bind=db_engine)
+    search_index.ensure_index(db_engine)
+    db = SessionLocal()
+    user = models.User(email="owner@example.com")
+    db.add(user)
+    db.commit()
+    url = f"{serve()}/~jdoe/"
+    professor = models.Professor(user_id=user.id, name="Jane Doe", website_url=url)
+    db.add(professor)
+    db.commit()
+
+    # Offline: the test server is on loopback, and no vision model runs
+    image_scraper.is_safe_url = lambda u: True
+    downloads = []
+    image_scraper.download_image = lambda u, **kwargs: downloads.append(u) or b"\xff\xd8\xff"
+    vision.get_vision_service().verify_avatar = lambda content: {"is_valid": True, "confidence": 0.9, "reason": "face"}
+    reloads = []
+    load_page = crud.get_latest_user_source_page
+    crud.get_latest_user_source_page = lambda *args, **kwargs: reloads.append(1) or load_page(*args, **kwargs)
+
+    # 1. Ingest + avatar: one parse, in the pool
+    cpu_pool.warm_up()
+    document.reset_parse_stats()
+    page = pipeline.ingest_page(db, professor, url)
+    assert page.fetch_status == "ok" and "machine learning" in page.raw_text
+    avatar = pipeline.extract_avatar(db, url, user.id)
+    parses = document.get_parse_stats()["parses"]
+    pool = cpu_pool.get_pool().get_stats()
+    print(f"Ingest + avatar: {pool['completed'] - 1} pool task(s), {parses} parse(s) in the API process, "
+          f"{len(reloads)} DB reload(s), avatar {avatar}")
+    assert avatar and avatar.endswith("/img/jane-headshot.jpg"), (avatar, downloads)
+    assert pool["completed"] == 2 and pool["fallback"] == 0 and pool["inline"] == 0, pool
+    assert parses == 0 and not reloads
+    db.close()
+    cpu_pool.get_pool().shutdown()
+
+    # 2. A timeout recycles only the stuck worker
+    pool = cpu_pool.CPUPool(workers=2, max_pending=8, timeout=0.6)
+    pool.start()
+    stuck, healthy = concurrently(
+        lambda: pool.run(sleep_for, 5),
+        lambda: [pool.run(sleep_for, 0.25) for _ in range(4)],
+    )
+    stats = pool.get_stats()
+    print(f"Stuck task: {type(stuck).__name__}; 4 tasks beside it ran in worker(s) {sorted(set(healthy))}; {stats}")
+    assert isinstance(stuck, cpu_pool.TaskTimeout)
+    assert len(set(healthy)) == 1 and os.getpid() not in healthy # one untouched worker, not inline
+    assert stats["timeouts"] == 1 and stats["restarts"] == 1 and stats["fallback"] == 0 and stats["completed"] == 4
+    assert pool.run(sleep_for, 0) != os.getpid() # replacement worker
+    pool.shutdown()
+
+    # 3. Queue wait isn't execution time
+    pool = cpu_pool.CPUPool(workers=1, max_pending=8, timeout=0.5)
+    started = time.perf_counter()
+    results = concurrently(*[lambda: pool.run(sleep_for, 0.3)] * 3)
+    elapsed = time.perf_counter() - started
+    print(f"3 x 0.3s tasks on 1 worker with a 0.5s timeout: {elapsed:.2f}s, {pool.get_stats()['timeouts']} timeouts")
+    assert elapsed >= 0.9 and not any(isinstance(r, Exception) for r in results), results
+    pool.shutdown()
+
+    # 4. A dead worker fails its task, not the API process
+    pool = cpu_pool.CPUPool(workers=1, max_pending=8, timeout=5)
+    pool.start()
+    try:
+        pool.run(crash)
+        raise AssertionError("crash() returned")
+    except cpu_pool.WorkerDied as e:
+        crashed = e
+    pool.start()
+    idle = pool._idle[0]
+    idle.process.kill()
+    idle.process.join()
+    replacement = pool.run(sleep_for, 0)
+    stats = pool.get_stats()
+    print(f"Crashing task: {type(crashed).__name__} ({crashed}); after an idle worker died: ran in {replacement}; {stats}")
+    assert replacement != os.getpid() and stats["crashes"] == 1 and stats["fallback"] == 0 and stats["restarts"] == 2, stats
+    pool.shutdown()
+
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
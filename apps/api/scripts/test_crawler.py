@@ -0,0 +1,175 @@
+"""
+Runs the faculty-directory crawler against a local static site.
+
+Builds a small department site (2 paginated listing pages, profile pages,
+nav links) in a temp dir, serves it with http.server and crawls it into a
+throwaway SQLite DB, and checks the crawled professors are in the search
+index. Then stops a crawl early and resumes it, and checks a safe-URLs-only
+crawl refuses a redirect to an internal host (DNS faked as in
+test_ssrf_guard.py).
+
+Usage:
+    python scripts/test_crawler.py
+"""
+import sys
+import os
+import tempfile
+import threading
+import functools
+import http.server
+import socketserver
+from collections import Counter
+
+TMP_DIR = tempfile.mkdtemp()
+DB_PATH = os.path.join(TMP_DIR, "crawler_test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ["HTTP_CACHE_PATH"] = os.path.join(TMP_DIR, "http_cache.db")
+os.environ["SEARCH_CACHE_PATH"] = os.path.join(TMP_DIR, "search_cache.db")
+os.environ.setdefault("FETCH_MIN_DELAY", "0")
+os.environ.setdefault("FETCH_HOST_RATE", "100")
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import models
+from database import SessionLocal, engine
+from ingest import crawler
+from search import index as search_index
+
+PROFESSORS = [
+    ("Ada Lovelace", "ada"), ("Alan Turing", "turing"), ("Grace Hopper", "hopper"),
+    ("John von Neumann", "vonneumann"), ("Barbara Liskov", "liskov"),
+]
+
+HITS = Counter()
+# Hosts the fake DNS knows; only internal.test counts as internal
+FAKE_DNS = {"127.0.0.1": ["127.0.0.1"], "public.test": ["127.0.0.1"], "internal.test": ["10.0.0.1"]}
+
+NAV = '<nav><a href="/index.html">Home</a> <a href="/news.html">News</a> <a href="/admissions.html">Graduate Admissions</a></nav>'
+
+
+def build_site(root: str):
+    os.makedirs(os.path.join(root, "people"), exist_ok=True)
+    pages = {
+        "faculty.html": PROFESSORS[:3],
+        "faculty-2.html": PROFESSORS[3:],
+    }
+    for i, (filename, profs) in enumerate(pages.items()):
+        links = "".join(f'<li><a href="/people/{slug}.html">{name}</a></li>' for name, slug in profs)
+        pager = '<a href="/faculty-2.html?page=2">Next</a>' if i == 0 else '<a href="/faculty.html">1</a>'
+        with open(os.path.join(root, filename), "w") as f:
+            f.write(f"<html><head><title>Faculty | Department of Computer Science | Example University</title></head>"
+                    f"<body>{NAV}<h1>Faculty</h1><ul>{links}</ul>{pager}</body></html>")
+    for name, slug in PROFESSORS:
+        homepage = f'<a href="https://{slug}.example.org/">Personal website</a>' if slug == "turing" else ""
+        with open(os.path.join(root, "people", f"{slug}.html"), "w") as f:
+            f.write(f"<html><head><title>{name} - Example University</title></head>"
+                    f"<body>{NAV}<h1>{name}</h1><p>{name} is a Professor of Computer Science at Example University.</p>{homepage}</body></html>")
+    for filename in ("index.html", "news.html", "admissions.html"):
+        with open(os.path.join(root, filename), "w") as f:
+            f.write(f"<html><head><title>Example</title></head><body>{NAV}<p>Nothing here.</p></body></html>")
+
+
+def serve(root: str):
+    class QuietHandler(http.server.SimpleHTTPRequestHandler):
+        def do_GET(self):
+            host = self.headers["Host"].split(":")[0]
+            HITS[host] += 1
+            if self.path.startswith("/moved/"):
+                # /moved/<host>/<path> -> http://<host>:<port>/<path>
+                target_host, _, path = self.path[len("/moved/"):].partition("/")
+                self.send_response(302)
+                self.send_header("Location", f"http://{target_host}:{self.server.server_address[1]}/{path}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            super().do_GET()
+
+        def log_message(self, *args):
+            pass
+
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), functools.partial(QuietHandler, directory=root))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    site = tempfile.mkdtemp()
+    build_site(site)
+    server = serve(site)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    models.Base.metadata.create_all(bind=engine)
+    search_index.ensure_index(engine)
+    db = SessionLocal()
+    user = models.User(email="crawler@test", hashed_password="x")
+    db.add(user)
+    db.commit()
+
+    # 1. Full crawl
+    crawl = models.CrawlRun(user_id=user.id, seed_url=f"{base}/faculty.html", max_depth=1, max_pages=50, pages_fetched=0, professors_created=0)
+    db.add(crawl)
+    db.commit()
+    crawl = crawler.run_crawl(db, crawl, safe_urls_only=False)
+    names = sorted(p.name for p in db.query(models.Professor).filter(models.Professor.user_id == user.id))
+    print(f"Crawl 1: status={crawl.status} pages={crawl.pages_fetched} created={crawl.professors_created}")
+    print(f"  affiliation: {crawl.default_affiliation}")
+    print(f"  professors: {names}")
+    assert names == sorted(n for n, _ in PROFESSORS), names
+    turing = db.query(models.Professor).filter(models.Professor.name == "Alan Turing").first()
+    assert turing.website_url == "https://turing.example.org/", turing.website_url
+    # Indexed by the crawler itself: no write errors, and no rebuild filling the gaps
+    stats = search_index.get_stats()
+    assert stats["indexed"] == len(PROFESSORS) and stats["errors"] == 0, stats
+    total, hits = search_index.search(db, user.id, "liskov")
+    print(f"  search 'liskov': {total} hit(s), {hits[0][2] if hits else None}")
+    assert total == 1 and db.get(models.Professor, hits[0][0]).name == "Barbara Liskov"
+    assert search_index.search(db, user.id, "example university")[0] == len(PROFESSORS) # affiliation
+    assert search_index.get_stats()["rebuilds"] == 0
+
+    # 2. Re-crawl doesn't duplicate professors
+    crawl2 = models.CrawlRun(user_id=user.id, seed_url=f"{base}/faculty.html", max_depth=1, max_pages=50, pages_fetched=0, professors_created=0)
+    db.add(crawl2)
+    db.commit()
+    crawl2 = crawler.run_crawl(db, crawl2, safe_urls_only=False)
+    print(f"Crawl 2 (same site): created={crawl2.professors_created}")
+    assert crawl2.professors_created == 0
+
+    # 3. Stop early, then resume from the persisted frontier
+    other = models.User(email="crawler2@test", hashed_password="x")
+    db.add(other)
+    db.commit()
+    crawl3 = models.CrawlRun(user_id=other.id, seed_url=f"{base}/faculty.html", max_depth=1, max_pages=3, pages_fetched=0, professors_created=0)
+    db.add(crawl3)
+    db.commit()
+    crawl3 = crawler.run_crawl(db, crawl3, safe_urls_only=False)
+    print(f"Crawl 3 (budget 3): status={crawl3.status} pages={crawl3.pages_fetched} created={crawl3.professors_created}")
+    crawl3.max_pages = 50
+    db.commit()
+    crawl3 = crawler.run_crawl(db, crawl3, safe_urls_only=False)
+    print(f"Crawl 3 resumed: status={crawl3.status} pages={crawl3.pages_fetched} created={crawl3.professors_created}")
+    assert crawl3.status == "done" and crawl3.professors_created == len(PROFESSORS)
+
+    # 4. Safe URLs only: every redirect hop is checked, not just the seed
+    from services import resolver
+    resolver.get_resolver().resolve = lambda host: list(FAKE_DNS[host.lower()])
+    resolver.is_blocked_address = lambda address: address.startswith("10.")
+    port = server.server_address[1]
+    crawl4 = models.CrawlRun(user_id=user.id, seed_url=f"http://public.test:{port}/moved/internal.test/faculty.html",
+                             max_depth=1, max_pages=50, pages_fetched=0, professors_created=0)
+    db.add(crawl4)
+    db.commit()
+    crawl4 = crawler.run_crawl(db, crawl4, safe_urls_only=True)
+    seed = db.query(models.CrawlFrontier).filter(models.CrawlFrontier.crawl_id == crawl4.id).one()
+    print(f"Crawl 4 (redirect to internal): status={crawl4.status} seed={seed.status} ({seed.error})")
+    assert seed.status == "failed" and "Unsafe redirect" in seed.error and crawl4.professors_created == 0
+    assert HITS["internal.test"] == 0, HITS # refused before it was requested
+    crawl5 = models.CrawlRun(user_id=other.id, seed_url=f"http://public.test:{port}/moved/public.test/faculty.html",
+                             max_depth=1, max_pages=50, pages_fetched=0, professors_created=0)
+    db.add(crawl5)
+    db.commit()
+    crawl5 = crawler.run_crawl(db, crawl5, safe_urls_only=True)
+    print(f"Crawl 5 (redirect to public): status={crawl5.status} pages={crawl5.pages_fetched}")
+    assert crawl5.status == "done" and crawl5.pages_fetched > 1
+
+    server.shutdown()
+    print("✅ Crawler OK")
@@ -0,0 +1,173 @@
+"""
+Checks the persistent HTTP cache against a local server.
+
+Serves a profile page and an image with different Cache-Control headers,
+counts how often each one actually hits the server, and checks:
+  - /ingest followed by avatar extraction downloads the page once
+  - a new cache instance on the same file (restart / other worker) still hits
+  - stale entries are revalidated with a 304 instead of re-downloading
+  - no-store responses are never cached
+  - LRU eviction keeps the file under the size limit
+  - fetch_url rejects PDFs from the headers, caps big pages and picks the
+    charset from <meta> when the header has none
+
+Usage:
+    python scripts/test_http_cache.py
+"""
+import sys
+import os
+import time
+import tempfile
+import threading
+import http.server
+import socketserver
+from collections import Counter
+
+CACHE_DIR = tempfile.mkdtemp()
+os.environ["HTTP_CACHE_PATH"] = os.path.join(CACHE_DIR, "http_cache.db")
+os.environ.setdefault("FETCH_MIN_DELAY", "0")
+os.environ.setdefault("FETCH_HOST_RATE", "100")
+os.environ.setdefault("ROBOTS_ENABLED", "false")
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import http_cache
+from ingest import fetcher
+from search import image_scraper
+
+HITS = Counter()
+PAGE = b"""<html><head><title>Jane Doe</title></head><body><h1>Jane Doe</h1>
+<img src="/img/profile.jpg" alt="profile photo"></body></html>"""
+IMAGE = b"\xff\xd8\xff" + b"x" * 20000
+BIG = os.urandom(5000) # incompressible
+
+ROUTES = {
+    "/jane": (PAGE, "text/html; charset=utf-8", "max-age=600", '"page-v1"'),
+    "/img/profile.jpg": (IMAGE, "image/jpeg", "max-age=600", None),
+    "/stale": (PAGE, "text/html", "max-age=0", '"stale-v1"'),
+    "/private": (PAGE, "text/html", "no-store", None),
+    "/cv.pdf": (b"%PDF-1.4" + b"0" * 100000, "application/pdf", "max-age=600", None),
+    "/latin1": ('<html><head><meta charset="iso-8859-1"></head><body><h1>José Müller</h1></body></html>'.encode("latin-1"), "text/html", "max-age=600", None),
+    "/huge": (b"<html><body>" + b"<p>publication</p>" * 20000 + b"</body></html>", "text/html", "max-age=600", None),
+}
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        HITS[path] += 1
+        if path.startswith("/big/"):
+            body, ctype, cache_control, etag = BIG, "text/html", "max-age=600", None
+        elif path in ROUTES:
+            body, ctype, cache_control, etag = ROUTES[path]
+        else:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if etag and self.headers.get("If-None-Match") == etag:
+            HITS[path + " (304)"] += 1
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", cache_control)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Cache-Control", cache_control)
+        if etag:
+            self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class QuietServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+
+    def handle_error(self, request, client_address):
+        pass # capped/rejected downloads hang up mid-body on purpose
+
+
+def serve() -> str:
+    server = QuietServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    base = serve()
+    image_scraper.is_safe_url = lambda url: True # local server is on 127.0.0.1
+
+    # 1. ingest, then avatar extraction of the same page
+    fetched = fetcher.fetch_url(f"{base}/jane")
+    assert fetched["fetch_status"] == "ok", fetched
+    candidates = image_scraper.get_image_candidates(f"{base}/jane")
+    assert candidates == [f"{base}/img/profile.jpg"], candidates
+    assert image_scraper.download_image(candidates[0]) == IMAGE
+    assert image_scraper.download_image(candidates[0]) == IMAGE
+    print(f"Page fetches: {HITS['/jane']}, image downloads: {HITS['/img/profile.jpg']}")
+    assert HITS["/jane"] == 1 and HITS["/img/profile.jpg"] == 1
+
+    # Re-ingest with the stored validators: fresh cached copy counts as unchanged
+    again = fetcher.fetch_url(f"{base}/jane", etag=fetched["etag"])
+    assert again["fetch_status"] == "not_modified", again
+    assert HITS["/jane"] == 1
+
+    # 2. "Restart": a new cache object on the same file
+    restarted = http_cache.HTTPCache(os.environ["HTTP_CACHE_PATH"])
+    r = restarted.get(f"{base}/img/profile.jpg")
+    assert r.from_cache and r.content == IMAGE
+    print(f"After restart: image served from disk cache (downloads still {HITS['/img/profile.jpg']})")
+
+    # 3. Stale entry -> conditional request -> 304
+    for _ in range(3):
+        r = http_cache.get(f"{base}/stale")
+        assert r.status_code == 200 and r.content == PAGE
+    print(f"Stale page: {HITS['/stale']} requests, {HITS['/stale (304)']} answered with 304")
+    assert HITS["/stale (304)"] == 2
+
+    # 4. no-store
+    for _ in range(2):
+        http_cache.get(f"{base}/private")
+    assert HITS["/private"] == 2
+
+    # 5. LRU eviction
+    small = http_cache.HTTPCache(os.path.join(CACHE_DIR, "small.db"), max_bytes=20000)
+    for i in range(20):
+        small.get(f"{base}/big/{i}")
+        time.sleep(0.001)
+    stats = small.get_stats()
+    print(f"Small cache: {stats['entries']} entries, {stats['bytes']} bytes, {stats['evictions']} evictions")
+    assert stats["bytes"] <= 20000 and stats["evictions"] > 0
+
+    # 6. Size cap on downloads
+    try:
+        http_cache.get(f"{base}/big/cap", max_bytes=1000)
+        raise AssertionError("expected ResponseTooLarge")
+    except http_cache.ResponseTooLarge:
+        pass
+
+    # 7. Content type, size cap, charset
+    pdf = fetcher.fetch_url(f"{base}/cv.pdf")
+    assert pdf["fetch_status"] == "failed" and "application/pdf" in pdf["error_msg"], pdf
+    huge = fetcher.fetch_url(f"{base}/huge", max_bytes=10000)
+    assert huge["fetch_status"] == "truncated" and len(huge["raw_html"]) == 10000, huge["fetch_status"]
+    latin = fetcher.fetch_url(f"{base}/latin1")
+    assert "José Müller" in latin["raw_html"], latin["raw_html"]
+    print(f"PDF: {pdf['error_msg']}; huge page: {huge['fetch_status']}; latin-1 page decoded")
+
+    print(f"Stats: {http_cache.get_stats()}")
+    print("✅ HTTP cache OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Checks when a re-fetched page gets a new SourcePage version, through
+pipeline.ingest_page and /ingest/batch.
+
+  - a page whose text changed only in case gets a new row with the new
+    text, but its card is re-keyed, not re-extracted
+  - a page whose markup changed but whose text is identical keeps its row,
+    which points at the new HTML
+
+Usage:
+    python scripts/test_page_versions.py
+"""
+import sys
+import os
+import tempfile
+import threading
+import http.server
+import socketserver
+
+TMP_DIR = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TMP_DIR, 'app.db')}"
+os.environ["HTTP_CACHE_PATH"] = os.path.join(TMP_DIR, "http_cache.db")
+os.environ["SEARCH_CACHE_PATH"] = os.path.join(TMP_DIR, "search_cache.db")
+os.environ["CPU_POOL_WORKERS"] = "0"
+os.environ["LLM_PARSING_ENABLED"] = "false"
+os.environ.setdefault("FETCH_MIN_DELAY", "0")
+os.environ.setdefault("FETCH_HOST_RATE", "100")
+os.environ.setdefault("ROBOTS_ENABLED", "false")
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PAGES = {}
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = PAGES[self.path].encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Cache-Control", "no-store")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def page(text: str, markup: str = "") -> str:
+    return f"<html><head><title>Jane Doe</title></head><body>{markup}<h1>Jane Doe</h1><p>{text}</p></body></html>"
+
+
+def serve() -> str:
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    import crud
+    import main as api
+    import models
+    import schemas
+    from database import SessionLocal, engine as db_engine
+    from ingest import extractor
+    from search import index as search_index
+    from services import pipeline
+
+    models.Base.metadata.create_all(bind=db_engine)
+    search_index.ensure_index(db_engine)
+    db = SessionLocal()
+    user = models.User(email="owner@example.com")
+    db.add(user)
+    db.commit()
+    base = serve()
+    single = models.Professor(user_id=user.id, name="Jane Doe", website_url=f"{base}/single")
+    batched = models.Professor(user_id=user.id, name="Jane Doe", website_url=f"{base}/batch")
+    db.add_all([single, batched])
+    db.commit()
+
+    extracted = []
+    extract = extractor.extract_professor_cards
+    extractor.extract_professor_cards = lambda texts, **kwargs: extracted.extend(texts) or extract(texts, **kwargs)
+
+    def ingest_single():
+        return pipeline.ingest_page(db, single, single.website_url)
+
+    def ingest_batch():
+        request = schemas.BatchIngestRequest(items=[{"professor_id": batched.id, "url": batched.website_url}])
+        item = api.ingest_professor_pages_batch(request, db=db, current_user=user).items[0]
+        return db.get(models.SourcePage, item.source_page_id)
+
+    for name, ingest, path in [("ingest_page", ingest_single, "/single"), ("/ingest/batch", ingest_batch, "/batch")]:
+        professor_id = single.id if path == "/single" else batched.id
+        PAGES[path] = page("Jane Doe works on Machine Learning at Example University.")
+        first = ingest()
+        card, created = pipeline.update_card(db, professor_id)
+        assert created and len(extracted) == 1
+
+        # 1. Only the case changed: new text stored, same card
+        PAGES[path] = page("Jane Doe works on machine learning at Example University.")
+        second = ingest()
+        assert second.id != first.id and "machine learning" in second.raw_text, (first.id, second.id, second.raw_text)
+        assert crud.get_latest_text_pages(db, [professor_id])[professor_id].id == second.id
+        rekeyed, created = pipeline.update_card(db, professor_id)
+        assert not created and rekeyed.id == card.id and rekeyed.source_text_hash == second.raw_text_hash
+        assert len(extracted) == 1, extracted
+
+        # 2. Only the markup changed: same row, new HTML
+        PAGES[path] = page("Jane Doe works on machine learning at Example University.", markup="<nav>menu</nav>")
+        third = ingest()
+        assert third.id == second.id and "<nav>" in third.raw_html
+        print(f"{name}: case change -> new version, card re-keyed; markup change -> row kept")
+        extracted.clear()
+
+    db.close()
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Checks the persistent search cache, with DuckDuckGo replaced by a counting stub.
+
+  - "Yann LeCun" and "yann  lecun " share one entry
+  - a new cache object on the same file (restart / other worker) still hits
+  - a stale entry is returned immediately and refreshed once in the background,
+    even when several lookups see it stale at the same time
+  - failed searches are not cached; a failed refresh keeps the stale results
+  - LRU eviction keeps the entry count under the limit
+
+Usage:
+    python scripts/test_search_cache.py
+"""
+import sys
+import os
+import time
+import tempfile
+import threading
+from collections import Counter
+
+CACHE_DIR = tempfile.mkdtemp()
+os.environ["SEARCH_CACHE_PATH"] = os.path.join(CACHE_DIR, "search_cache.db")
+os.environ["HTTP_CACHE_PATH"] = os.path.join(CACHE_DIR, "http_cache.db")
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search import cache as search_cache
+from search import engine
+
+SEARCHES = Counter()
+FAILING = set()
+SLOW = threading.Event() # set: searches take 0.3s
+
+
+def fake_search(query: str, max_results: int):
+    SEARCHES[query.lower()] += 1
+    if SLOW.is_set():
+        time.sleep(0.3)
+    if query.lower() in FAILING:
+        raise ConnectionError("search backend down")
+    return [{"title": f"{query} #{i} (v{SEARCHES[query.lower()]})", "name": query, "link": f"https://example.edu/{i}",
+             "snippet": "", "affiliation": ""} for i in range(max_results)]
+
+
+def wait_for(condition, timeout: float = 5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.01)
+
+
+def main():
+    engine._search_duckduckgo = fake_search
+    cache = search_cache.get_cache()
+    assert isinstance(cache.store, search_cache.SQLiteStore)
+
+    # 1. Normalized keys
+    first = engine.search_professor("Yann LeCun")
+    again = engine.search_professor("yann  lecun ")
+    assert first == again and SEARCHES["yann lecun"] == 1, SEARCHES
+    assert len(engine.search_professor("YANN LECUN", max_results=2)) == 2 and SEARCHES["yann lecun"] == 1
+    engine.search_professor("Yann LeCun", max_results=8) # more than stored: searched again
+    assert SEARCHES["yann lecun"] == 2
+    print(f"Normalized queries: {SEARCHES['yann lecun']} searches for 5 lookups")
+
+    # 2. "Restart": a new cache object on the same file
+    restarted = search_cache.SearchCache(search_cache.SQLiteStore(os.environ["SEARCH_CACHE_PATH"]))
+    results = restarted.get_or_fetch("yann lecun", 5, lambda: fake_search("yann lecun", 5), namespace="duckduckgo")
+    assert len(results) == 5 and SEARCHES["yann lecun"] == 2
+    assert restarted.get_stats()["hits"] == 1
+    print("After restart: served from disk cache")
+
+    # 3. Stale-while-revalidate
+    stale = search_cache.SearchCache(search_cache.SQLiteStore(os.environ["SEARCH_CACHE_PATH"]), ttl=0.2)
+    search_cache.set_cache(stale)
+    engine.search_professor("Geoffrey Hinton")
+    time.sleep(0.3)
+    SLOW.set()
+    started = time.perf_counter()
+    served = []
+    threads = [threading.Thread(target=lambda: served.append(engine.search_professor("geoffrey hinton"))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    assert elapsed < 0.25, f"stale lookups waited for the refresh ({elapsed:.2f}s)"
+    assert all(r[0]["title"].endswith("(v1)") for r in served)
+    wait_for(lambda: stale.get_stats()["refreshes"] == 1)
+    SLOW.clear()
+    assert SEARCHES["geoffrey hinton"] == 2, SEARCHES
+    assert engine.search_professor("Geoffrey Hinton")[0]["title"].endswith("(v2)")
+    print(f"Stale entry: 5 concurrent lookups answered in {elapsed * 1000:.0f}ms, refreshed once in the background")
+
+    # 4. Errors
+    FAILING.add("nobody")
+    assert engine.search_professor("Nobody") == [] and engine.search_professor("Nobody") == []
+    assert SEARCHES["nobody"] == 2
+    FAILING.add("geoffrey hinton")
+    time.sleep(0.3)
+    assert engine.search_professor("Geoffrey Hinton")[0]["title"].endswith("(v2)")
+    wait_for(lambda: stale.get_stats()["refresh_failures"] == 1)
+    assert engine.search_professor("Geoffrey Hinton")[0]["title"].endswith("(v2)")
+    print("Failed searches not cached; failed refresh kept the stale results")
+
+    # 5. LRU eviction
+    small = search_cache.SearchCache(search_cache.SQLiteStore(os.path.join(CACHE_DIR, "small.db"), max_entries=10))
+    for i in range(25):
+        small.get_or_fetch(f"professor {i}", 5, lambda: [])
+    stats = small.get_stats()
+    assert stats["entries"] <= 10 and stats["evictions"] >= 15, stats
+    print(f"Eviction: {stats['entries']} entries kept, {stats['evictions']} evicted")
+
+    print(stale.get_stats())
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
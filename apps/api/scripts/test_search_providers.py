@@ -0,0 +1,122 @@
+"""
+Checks the search fan-out offline, with stub providers instead of DuckDuckGo.
+
+  - providers run concurrently: total time is the slowest provider, not the sum
+  - results are deduplicated by canonical URL (scheme, www., trailing slash,
+    tracking parameters) and keep every source
+  - at the deadline, the results so far are returned; the late provider
+    still fills the search cache for the next search
+  - a failing provider doesn't fail the search
+  - the local provider only shows the searching user's own professors
+
+Usage:
+    python scripts/test_search_providers.py
+"""
+import sys
+import os
+import time
+import tempfile
+
+TMP_DIR = tempfile.mkdtemp()
+os.environ["SEARCH_CACHE_PATH"] = os.path.join(TMP_DIR, "search_cache.db")
+os.environ["HTTP_CACHE_PATH"] = os.path.join(TMP_DIR, "http_cache.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TMP_DIR, 'app.db')}"
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import models
+from database import SessionLocal, engine as db_engine
+from search import engine, providers
+from search import index as search_index
+
+
+def result(name: str, link: str, affiliation: str = "") -> dict:
+    return {"title": f"{name} - {affiliation}" if affiliation else name, "name": name, "link": link,
+            "snippet": "", "affiliation": affiliation}
+
+
+WEB = [
+    result("Jane Doe", "https://www.cs.example.edu/~jdoe/"),
+    result("Jane Doe", "https://scholar.example.com/citations?user=abc&utm_source=x"),
+    result("Jane Doe Lab", "https://janedoelab.org"),
+]
+DIRECTORY = [
+    result("Jane Doe", "http://cs.example.edu/~jdoe", "Example University"),
+    result("Jane Doe", "https://people.example.edu/jdoe/index.html", "Example University"),
+]
+
+
+class CachedStub(providers.StaticProvider):
+    cacheable = True
+
+
+def timed(fn):
+    started = time.perf_counter()
+    value = fn()
+    return value, time.perf_counter() - started
+
+
+def main():
+    # 1. Canonical URLs
+    same = ["https://www.cs.example.edu/~jdoe/", "http://cs.example.edu/~jdoe#bio", "https://cs.example.edu:443/~jdoe/index.html"]
+    assert len({providers.canonical_url(u) for u in same}) == 1
+    assert providers.canonical_url("https://a.edu/p?utm_source=x&id=2") == providers.canonical_url("https://a.edu/p?id=2")
+    assert providers.canonical_url("https://a.edu/p?id=2") != providers.canonical_url("https://a.edu/p?id=3")
+
+    # 2. Concurrent, merged, deduplicated
+    providers.set_providers([
+        providers.StaticProvider("web", WEB, delay=0.3),
+        providers.StaticProvider("directory", DIRECTORY, delay=0.3),
+    ])
+    results, elapsed = timed(lambda: engine.search_professor("jane doe", deadline=2))
+    links = [r["link"] for r in results]
+    print(f"Two 0.3s providers: {elapsed:.2f}s, {len(results)} results: {links}")
+    assert elapsed < 0.5, elapsed
+    assert len(results) == 4, links
+    homepage = next(r for r in results if "jdoe" in r["link"] and "people" not in r["link"])
+    assert sorted(homepage["sources"]) == ["directory", "web"]
+    assert homepage["affiliation"] == "Example University" # filled in from the second copy
+
+    # 3. Deadline: the slow provider is cut off, then warms the cache
+    slow = CachedStub("slow-web", WEB, delay=0.5)
+    providers.set_providers([providers.StaticProvider("directory", DIRECTORY), slow])
+    results, elapsed = timed(lambda: engine.search_professor("jane doe", deadline=0.2))
+    print(f"Deadline 0.2s with a 0.5s provider: {elapsed:.2f}s, sources {sorted({s for r in results for s in r['sources']})}")
+    assert elapsed < 0.4 and all(r["sources"] == ["directory"] for r in results)
+    time.sleep(0.5)
+    results, elapsed = timed(lambda: engine.search_professor("Jane  Doe", deadline=0.2))
+    print(f"Next search: {elapsed:.2f}s, sources {sorted({s for r in results for s in r['sources']})}")
+    assert elapsed < 0.2 and any("slow-web" in r["sources"] for r in results)
+    assert providers.get_stats()["slow-web"]["late"] == 1
+
+    # 4. A failing provider
+    providers.set_providers([providers.StaticProvider("broken", WEB, error=ConnectionError("down")),
+                             providers.StaticProvider("directory", DIRECTORY)])
+    results = engine.search_professor("jane doe")
+    assert len(results) == 2 and providers.get_stats()["broken"]["errors"] == 1
+    print("Failing provider: other results still returned")
+
+    # 5. Local provider, per user
+    models.Base.metadata.create_all(bind=db_engine)
+    search_index.ensure_index(db_engine)
+    db = SessionLocal()
+    owner, other = models.User(email="owner@example.com"), models.User(email="other@example.com")
+    db.add_all([owner, other])
+    db.commit()
+    db.add(models.Professor(user_id=owner.id, name="Jane Doe", affiliation="Example University",
+                            website_url="https://cs.example.edu/~jdoe"))
+    db.commit()
+    providers.set_providers([providers.LocalProvider(), providers.StaticProvider("web", WEB)])
+    mine = engine.search_professor("doe jane", user_id=owner.id)
+    theirs = engine.search_professor("doe jane", user_id=other.id)
+    assert "local" in mine[0]["sources"] and "web" in mine[0]["sources"], mine[0]
+    assert not any("local" in r["sources"] for r in theirs)
+    db.close()
+    print("Local provider: only the owner's professors")
+
+    print(providers.get_stats())
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
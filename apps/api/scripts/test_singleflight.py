@@ -0,0 +1,161 @@
+"""
+Checks request coalescing (services/singleflight.py) with concurrent callers.
+
+  - SingleFlight: N concurrent calls with one key run once; followers get
+    copies of the result, or the same exception; a call after the first
+    finished runs again
+  - fetch_url: concurrent fetches of an uncacheable page hit a local server once
+  - search_professor: concurrent identical searches (differently spelled)
+    call the provider once
+  - LLM and vision calls with the same prompt / image run once
+
+Usage:
+    python scripts/test_singleflight.py
+"""
+import sys
+import os
+import time
+import tempfile
+import threading
+import http.server
+import socketserver
+from collections import Counter
+
+TMP_DIR = tempfile.mkdtemp()
+os.environ["HTTP_CACHE_PATH"] = os.path.join(TMP_DIR, "http_cache.db")
+os.environ["SEARCH_CACHE_PATH"] = os.path.join(TMP_DIR, "search_cache.db")
+os.environ["LLM_PARSING_ENABLED"] = "false"
+os.environ.setdefault("FETCH_MIN_DELAY", "0")
+os.environ.setdefault("FETCH_HOST_RATE", "100")
+os.environ.setdefault("ROBOTS_ENABLED", "false")
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import singleflight
+from ingest import fetcher
+from search import engine, providers
+
+HITS = Counter()
+CALLERS = 8
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        HITS[self.path] += 1
+        time.sleep(0.3)
+        body = b"<html><body><h1>Jane Doe</h1></body></html>"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Cache-Control", "no-store")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve() -> str:
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def concurrently(fn, args_list):
+    """Runs fn(*args) for each args in parallel threads; returns results (or exceptions) in order."""
+    results = [None] * len(args_list)
+    barrier = threading.Barrier(len(args_list))
+
+    def run(i, args):
+        barrier.wait()
+        try:
+            results[i] = fn(*args)
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=run, args=(i, args)) for i, args in enumerate(args_list)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+class SlowCounter:
+    def __init__(self, result=None, error=None, delay=0.3):
+        self.calls = 0
+        self.result, self.error, self.delay = result, error, delay
+
+    def __call__(self, *args, **kwargs):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return self.result if self.result is not None else {"value": args}
+
+
+def main():
+    # 1. The primitive
+    group = singleflight.SingleFlight("test")
+    work = SlowCounter(result={"items": [1, 2]})
+    results = concurrently(lambda: group.do("k", work), [()] * CALLERS)
+    assert work.calls == 1 and all(r == {"items": [1, 2]} for r in results), (work.calls, results)
+    results[1]["items"].append(3)
+    assert results[0] == {"items": [1, 2]} or results[2] == {"items": [1, 2]} # followers got copies
+    group.do("k", work)
+    assert work.calls == 2 # nothing is kept once the call is done
+    failing = SlowCounter(error=ValueError("boom"))
+    results = concurrently(lambda: group.do("f", failing), [()] * CALLERS)
+    assert failing.calls == 1 and all(isinstance(r, ValueError) for r in results)
+    stats = group.get_stats()
+    print(f"SingleFlight: {stats}")
+    assert stats["coalesced"] == 2 * (CALLERS - 1) and stats["in_flight"] == 0
+
+    # 2. fetch_url
+    base = serve()
+    results = concurrently(fetcher.fetch_url, [(f"{base}/jane",)] * CALLERS)
+    assert all(r["fetch_status"] == "ok" for r in results), results
+    results[0]["fetch_status"] = "changed by the caller"
+    assert results[1]["fetch_status"] == "ok"
+    print(f"fetch_url: {CALLERS} concurrent fetches, {HITS['/jane']} download(s)")
+    assert HITS["/jane"] == 1
+
+    # 3. search_professor
+    slow = providers.StaticProvider("web", [{"title": "Jane Doe", "name": "Jane Doe", "link": "https://example.edu/jane",
+                                             "snippet": "", "affiliation": ""}], delay=0.3)
+    calls = Counter()
+    search = slow.search
+    slow.search = lambda *args: calls.update(["web"]) or search(*args)
+    providers.set_providers([slow])
+    queries = ["Jane Doe", "jane  doe", "JANE DOE "] * 3
+    results = concurrently(engine.search_professor, [(q,) for q in queries])
+    assert all(len(r) == 1 for r in results)
+    print(f"search_professor: {len(queries)} concurrent searches, {calls['web']} provider call(s)")
+    assert calls["web"] == 1
+
+    # 4. LLM and vision
+    from services.llm import LLMService
+    from services.vision import VisionService
+    llm = LLMService()
+    llm._chat_ollama = SlowCounter(result='{"results": []}')
+    results = concurrently(llm._call_ollama, [("same prompt", "system")] * CALLERS)
+    assert llm._chat_ollama.calls == 1 and all(r == '{"results": []}' for r in results)
+    llm._call_ollama("other prompt", "system")
+    assert llm._chat_ollama.calls == 2
+
+    vision = VisionService()
+    vision._verify_avatar = SlowCounter(result={"is_valid": True, "confidence": 0.9, "reason": "face"})
+    image = b"\xff\xd8\xff" + os.urandom(1000)
+    concurrently(vision.verify_avatar, [(image,)] * CALLERS)
+    assert vision._verify_avatar.calls == 1
+    print(f"LLM: {llm._chat_ollama.calls} calls for {CALLERS + 1} requests, vision: {vision._verify_avatar.calls} for {CALLERS}")
+
+    print(singleflight.get_stats())
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
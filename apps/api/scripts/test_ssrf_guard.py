@@ -0,0 +1,110 @@
+"""
+Checks the SSRF guard past the first hop, offline.
+
+DNS is faked: "public.test" and "localhost" count as public and resolve to
+the local test server, "internal.test" counts as internal.
+
+  - the image scraper refuses a redirect to an internal host (without
+    requesting it) and follows one to a public host
+  - a keep-alive connection opened before the check is not reused after it:
+    checked requests get their own, pinned pool
+  - a pinned host whose first address is down connects to the next one
+
+Usage:
+    python scripts/test_ssrf_guard.py
+"""
+import sys
+import os
+import tempfile
+import threading
+import http.server
+import socketserver
+from collections import Counter
+
+TMP_DIR = tempfile.mkdtemp()
+os.environ["HTTP_CACHE_PATH"] = os.path.join(TMP_DIR, "http_cache.db")
+os.environ.setdefault("FETCH_MIN_DELAY", "0")
+os.environ.setdefault("ROBOTS_ENABLED", "false")
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import resolver, http_client
+from search import image_scraper
+
+HITS = Counter()
+JPEG = b"\xff\xd8\xff" + b"\x00" * 100
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        HITS[(self.headers["Host"].split(":")[0], self.path)] += 1
+        port = self.server.server_address[1]
+        if self.path.startswith("/to-"):
+            self.send_response(302)
+            self.send_header("Location", f"http://{self.path[4:]}:{port}/photo.jpg")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = JPEG if self.path.endswith(".jpg") else b"<html><body>ok</body></html>"
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg" if self.path.endswith(".jpg") else "text/html")
+        self.send_header("Cache-Control", "no-store")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+FAKE_DNS = {
+    "public.test": ["127.0.0.1"],
+    "localhost": ["127.0.0.1"],
+    "fallback.test": ["127.0.0.9", "127.0.0.1"], # nothing listens on .9
+    "internal.test": ["10.0.0.1"],
+}
+
+
+def main():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+
+    dns = resolver.get_resolver()
+    dns.resolve = lambda host: list(FAKE_DNS[host.lower()])
+    resolver.is_blocked_address = lambda address: address.startswith("10.")
+
+    # 1. Redirects are checked hop by hop
+    assert image_scraper.download_image(f"http://public.test:{port}/to-public.test") == JPEG
+    assert image_scraper.download_image(f"http://public.test:{port}/to-internal.test") is None
+    assert not any(host == "internal.test" for host, _ in HITS)
+    print(f"Redirects: public followed, internal refused before it was requested ({dict(HITS)})")
+
+    # 2. A connection from before the check isn't reused after it
+    session = http_client.get_session()
+    session.get(f"http://localhost:{port}/page").close()
+    http_client.reset_pool_stats()
+    pinned_before = dns.get_stats()["pinned_connections"]
+    dns.check("localhost")
+    session.get(f"http://localhost:{port}/page").close()
+    session.get(f"http://localhost:{port}/page").close()
+    stats = http_client.get_pool_stats()
+    pinned = dns.get_stats()["pinned_connections"] - pinned_before
+    print(f"After the check: {stats}, {pinned} new pinned connection(s)")
+    assert stats["misses"] == 1 and stats["hits"] == 1 # one new pinned connection, then kept alive
+    assert pinned == 1
+
+    # 3. Pinned addresses are tried in order
+    dns.check("fallback.test")
+    response = session.get(f"http://fallback.test:{port}/page")
+    assert response.status_code == 200 and HITS[("fallback.test", "/page")] == 1
+    print("Fallback: first pinned address refused, connected to the second")
+
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
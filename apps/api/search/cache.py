@@ -0,0 +1,310 @@
+"""
+Search Cache — persistent, shared cache for professor searches
+
+search_professor used to keep a per-process TTLCache keyed by the raw
+query, so "Yann LeCun" and "yann  lecun " missed each other, every uvicorn
+worker started cold and a deploy lost everything. Now:
+  - keys are normalized (NFKC, case-folded, whitespace collapsed)
+  - the store is a single SQLite file (WAL mode), shared by all workers on
+    the host and kept across restarts; any object with the SQLiteStore
+    methods can be plugged in with set_cache() (MemoryStore is used when
+    the file can't be opened)
+  - entries are fresh for SEARCH_CACHE_TTL seconds. After that they are
+    still served, immediately, for up to SEARCH_CACHE_STALE_TTL more while
+    a background thread refreshes them (stale-while-revalidate). Only one
+    worker refreshes a given query: it claims the row first.
+  - failed searches are never stored; a failed refresh keeps the stale entry
+  - the least recently used entries are evicted past SEARCH_CACHE_MAX_ENTRIES
+
+An entry remembers how many results were asked for, so it can also answer
+smaller max_results.
+
+Config (env):
+    SEARCH_CACHE_ENABLED      "true"/"false" (default true)
+    SEARCH_CACHE_PATH         SQLite file (default ./search_cache.db)
+    SEARCH_CACHE_TTL          seconds an entry is fresh (default 3600)
+    SEARCH_CACHE_STALE_TTL    seconds a stale entry may still be served (default 604800)
+    SEARCH_CACHE_MAX_ENTRIES  entries before LRU eviction (default 10000)
+"""
+import os
+import json
+import time
+import sqlite3
+import threading
+import unicodedata
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("SEARCH_CACHE_ENABLED", "true").lower() == "true"
+CACHE_PATH = os.getenv("SEARCH_CACHE_PATH", "search_cache.db")
+TTL = int(os.getenv("SEARCH_CACHE_TTL", "3600"))
+STALE_TTL = int(os.getenv("SEARCH_CACHE_STALE_TTL", str(7 * 86400)))
+MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "10000"))
+
+# Don't write last_accessed on every hit; LRU order only needs to be rough
+TOUCH_INTERVAL = 60
+# A refresh claim older than this is assumed dead (worker killed mid-search)
+REFRESH_TIMEOUT = 60
+REFRESH_WORKERS = 2
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", query or "").casefold().split())
+
+
+class SQLiteStore:
+    def __init__(self, path: str = CACHE_PATH, max_entries: int = MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._init_db()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS searches (
+                key TEXT PRIMARY KEY,
+                results TEXT NOT NULL,
+                max_results INTEGER NOT NULL,
+                stored_at REAL NOT NULL,
+                last_accessed REAL NOT NULL,
+                refresh_started REAL NOT NULL DEFAULT 0
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_searches_last_accessed ON searches (last_accessed)")
+
+    def lookup(self, key: str) -> Optional[Dict]:
+        row = self._conn().execute(
+            "SELECT results, max_results, stored_at, last_accessed FROM searches WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        results, max_results, stored_at, last_accessed = row
+        now = time.time()
+        if now - last_accessed > TOUCH_INTERVAL:
+            self._conn().execute("UPDATE searches SET last_accessed = ? WHERE key = ?", (now, key))
+        return {"results": json.loads(results), "max_results": max_results, "stored_at": stored_at}
+
+    def store(self, key: str, results: List[Dict], max_results: int) -> int:
+        """Stores an entry; returns the number of entries evicted to make room."""
+        now = time.time()
+        self._conn().execute(
+            "INSERT OR REPLACE INTO searches (key, results, max_results, stored_at, last_accessed, refresh_started) "
+            "VALUES (?, ?, ?, ?, ?, 0)",
+            (key, json.dumps(results), max_results, now, now)
+        )
+        return self._evict()
+
+    def claim_refresh(self, key: str) -> bool:
+        """True for the one caller (across workers) that should refresh key now."""
+        now = time.time()
+        cursor = self._conn().execute(
+            "UPDATE searches SET refresh_started = ? WHERE key = ? AND refresh_started < ?",
+            (now, key, now - REFRESH_TIMEOUT)
+        )
+        return cursor.rowcount == 1
+
+    def _evict(self) -> int:
+        conn = self._conn()
+        expired = conn.execute("DELETE FROM searches WHERE stored_at < ?", (time.time() - TTL - STALE_TTL,)).rowcount
+        count = conn.execute("SELECT COUNT(*) FROM searches").fetchone()[0]
+        if count <= self.max_entries:
+            return expired
+        # Evict down to 90% so we don't run this on every following store
+        excess = count - int(self.max_entries * 0.9)
+        evicted = conn.execute(
+            "DELETE FROM searches WHERE key IN (SELECT key FROM searches ORDER BY last_accessed LIMIT ?)", (excess,)
+        ).rowcount
+        return expired + evicted
+
+    def clear(self):
+        self._conn().execute("DELETE FROM searches")
+
+    def size(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM searches").fetchone()[0]
+
+
+class MemoryStore:
+    """Per-process store with the SQLiteStore interface (tests, or when the file can't be opened)."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            entry["last_accessed"] = time.time()
+            return {"results": entry["results"], "max_results": entry["max_results"], "stored_at": entry["stored_at"]}
+
+    def store(self, key: str, results: List[Dict], max_results: int) -> int:
+        now = time.time()
+        with self._lock:
+            self._entries[key] = {"results": results, "max_results": max_results, "stored_at": now,
+                                  "last_accessed": now, "refresh_started": 0}
+            if len(self._entries) <= self.max_entries:
+                return 0
+            excess = len(self._entries) - int(self.max_entries * 0.9)
+            for old in sorted(self._entries, key=lambda k: self._entries[k]["last_accessed"])[:excess]:
+                del self._entries[old]
+            return excess
+
+    def claim_refresh(self, key: str) -> bool:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry["refresh_started"] >= now - REFRESH_TIMEOUT:
+                return False
+            entry["refresh_started"] = now
+            return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def size(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class SearchCache:
+    def __init__(self, store, ttl: float = TTL, stale_ttl: float = STALE_TTL):
+        self.store = store
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "stale": 0, "misses": 0, "stores": 0, "refreshes": 0,
+                       "refresh_failures": 0, "evictions": 0, "errors": 0}
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def _store(self, key: str, results: List[Dict], max_results: int):
+        try:
+            evicted = self.store.store(key, results, max_results)
+            self._count("stores")
+            if evicted:
+                self._count("evictions", evicted)
+        except Exception as e:
+            self._count("errors")
+            logger.warning(f"[SearchCache] Store failed for {key!r}: {e}")
+
+    def _refresh(self, key: str, max_results: int, fetch: Callable[[], List[Dict]]):
+        try:
+            results = fetch()
+        except Exception as e:
+            self._count("refresh_failures")
+            logger.warning(f"[SearchCache] Background refresh failed for {key!r}, keeping stale results: {e}")
+            return
+        self._count("refreshes")
+        self._store(key, results, max_results)
+
+    def _refresh_in_background(self, key: str, max_results: int, fetch: Callable[[], List[Dict]]):
+        try:
+            if not self.store.claim_refresh(key):
+                return # another thread or worker is already on it
+        except Exception as e:
+            self._count("errors")
+            logger.warning(f"[SearchCache] Refresh claim failed for {key!r}: {e}")
+            return
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=REFRESH_WORKERS, thread_name_prefix="search-refresh")
+            executor = self._executor
+        executor.submit(self._refresh, key, max_results, fetch)
+
+    def get_or_fetch(self, query: str, max_results: int, fetch: Callable[[], List[Dict]], namespace: str = "") -> List[Dict]:
+        """
+        Cached results for query, or fetch() on a miss. fetch raises on
+        failure, so errors are never cached. Stale entries are returned as
+        they are and refreshed with fetch in the background. namespace
+        keeps the entries of different search providers apart.
+        """
+        key = f"{namespace}:{normalize_query(query)}" if namespace else normalize_query(query)
+        entry = None
+        try:
+            entry = self.store.lookup(key)
+        except Exception as e:
+            self._count("errors")
+            logger.warning(f"[SearchCache] Lookup failed for {key!r}: {e}")
+
+        if entry is not None and entry["max_results"] >= max_results:
+            age = time.time() - entry["stored_at"]
+            if age < self.ttl:
+                self._count("hits")
+                return entry["results"][:max_results]
+            if age < self.ttl + self.stale_ttl:
+                self._count("stale")
+                self._refresh_in_background(key, max(max_results, entry["max_results"]), fetch)
+                return entry["results"][:max_results]
+
+        self._count("misses")
+        results = fetch()
+        self._store(key, results, max_results)
+        return results
+
+    def clear(self):
+        self.store.clear()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["stale"] + stats["misses"]
+        stats["hit_rate"] = round((stats["hits"] + stats["stale"]) / lookups, 3) if lookups else 0.0
+        stats["ttl"] = self.ttl
+        stats["stale_ttl"] = self.stale_ttl
+        try:
+            stats["entries"] = self.store.size()
+        except Exception:
+            pass
+        return stats
+
+
+# Singleton
+_cache: Optional[SearchCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> Optional[SearchCache]:
+    global _cache
+    if _cache is None and ENABLED:
+        with _cache_lock:
+            if _cache is None:
+                try:
+                    _cache = SearchCache(SQLiteStore())
+                    logger.info(f"[SearchCache] Using {os.path.abspath(CACHE_PATH)} (max {MAX_ENTRIES} queries)")
+                except Exception as e:
+                    logger.error(f"[SearchCache] Can't open {CACHE_PATH}, caching in memory: {e}")
+                    _cache = SearchCache(MemoryStore())
+    return _cache
+
+
+def set_cache(cache: Optional[SearchCache]):
+    """Replaces the process-wide cache, e.g. SearchCache(MemoryStore()) or a custom store."""
+    global _cache
+    with _cache_lock:
+        _cache = cache
+
+
+def get_stats() -> Dict:
+    cache = get_cache()
+    return cache.get_stats() if cache is not None else {"enabled": False}
@@ -1,7 +1,7 @@
-import requests
 from bs4 import BeautifulSoup
 import urllib.parse
 import re
+from services import http_client
 
 def extract_affiliation(title: str, snippet: str) -> str:
     """
@@ -64,23 +64,115 @@ def extract_affiliation(title: str, snippet: str) -> str:
             
     return possible_affiliation
 
-from cachetools import TTLCache
+import os
+import time
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
+from search import cache as search_cache
+from search import providers as search_providers
+from services import singleflight
 
-# Cache: 100 queries, TTL 1 hour
-search_cache = TTLCache(maxsize=100, ttl=3600)
 logger = logging.getLogger(__name__)
 
-def search_professor(query: str, max_results: int = 5):
+# Seconds search_professor waits for providers; whatever has arrived by then is returned
+DEADLINE = float(os.getenv("SEARCH_DEADLINE", "4"))
+PROVIDER_WORKERS = int(os.getenv("SEARCH_PROVIDER_WORKERS", "16"))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=PROVIDER_WORKERS, thread_name_prefix="search")
+        return _executor
+
+def _search_provider(provider, query: str, max_results: int, user_id=None):
+    cache = search_cache.get_cache() if provider.cacheable else None
+    if cache is None:
+        return provider.search(query, max_results, user_id)
+    return cache.get_or_fetch(query, max_results, lambda: provider.search(query, max_results, user_id),
+                              namespace=provider.name)
+
+def _run_provider(provider, query: str, max_results: int, user_id=None):
+    """
+    One provider's results (through the search cache if it is cacheable); [] on error.
+    Identical searches already running are joined instead of repeated
+    (cacheable providers give every user the same results, so across users too).
+    """
+    started = time.perf_counter()
+    key = singleflight.make_key(provider.name, search_cache.normalize_query(query), max_results,
+                                None if provider.cacheable else user_id)
+    try:
+        results = singleflight.group("search").do(key, _search_provider, provider, query, max_results, user_id)
+    except Exception as e:
+        search_providers.record(provider.name, "error", time.perf_counter() - started)
+        logger.warning(f"[Search] {provider.name} failed for {query!r}: {e}")
+        return []
+    search_providers.record(provider.name, "ok", time.perf_counter() - started, len(results))
+    return results
+
+def _merge(merged: dict, results, priority: int, source: str):
+    """
+    Adds one provider's results to merged (canonical URL -> [sort key, result]).
+    A link found by several providers is kept once, with the best rank,
+    every source and any fields the first copy was missing.
     """
-    Searches for professors using DuckDuckGo HTML version.
+    for rank, result in enumerate(results):
+        if not result.get("link"):
+            continue
+        key = search_providers.canonical_url(result["link"])
+        entry = merged.get(key)
+        if entry is None:
+            merged[key] = [(rank, priority), {**result, "sources": [source]}]
+            continue
+        entry[0] = min(entry[0], (rank, priority))
+        kept = entry[1]
+        for field, value in result.items():
+            if value and not kept.get(field):
+                kept[field] = value
+        if source not in kept["sources"]:
+            kept["sources"].append(source)
+
+def search_professor(query: str, max_results: int = 5, user_id: int = None, deadline: float = None):
+    """
+    Searches for professors with every active provider at once (DuckDuckGo
+    HTML version, the user's own professors, ...; see search/providers.py).
     Fast rule-based only. AI parsing happens on click via /parse_search_result.
+    Results are merged by canonical URL as providers finish, interleaved by
+    rank (each provider's first result, then the second ones, ...). After
+    the deadline, providers still running are left to finish (and fill the
+    search cache) in the background, and the results so far are returned.
+    Failed providers contribute nothing; [] if all fail.
     """
-    # 1. Check Cache
-    if query in search_cache:
-        logger.info(f"Cache hit for query: {query}")
-        return search_cache[query]
+    query = " ".join(query.split())
+    providers = search_providers.get_providers()
+    if not query or not providers:
+        return []
+
+    executor = _get_executor()
+    futures = {
+        executor.submit(_run_provider, provider, query, max_results, user_id): (priority, provider)
+        for priority, provider in enumerate(providers)
+    }
+    merged = {}
+    try:
+        for future in as_completed(futures, timeout=DEADLINE if deadline is None else deadline):
+            priority, provider = futures[future]
+            _merge(merged, future.result(), priority, provider.name)
+    except FuturesTimeout:
+        late = [provider.name for future, (_, provider) in futures.items() if not future.done()]
+        for name in late:
+            search_providers.record(name, "late")
+        logger.info(f"[Search] Deadline reached for {query!r}, still waiting on: {', '.join(late)}")
+
+    ranked = sorted(merged.values(), key=lambda entry: entry[0])
+    return [result for _, result in ranked[:max_results]]
 
+def _search_duckduckgo(query: str, max_results: int):
+    """One DuckDuckGo search; raises on network/HTTP errors."""
     print(f"Searching for '{query}'...")
     url = "https://html.duckduckgo.com/html/"
     headers = {
@@ -91,65 +183,57 @@ def search_professor(query: str, max_results: int = 5):
     
     raw_results = []
     
-    try:
-        resp = requests.post(url, data=data, headers=headers, timeout=10)
-        resp.raise_for_status()
-        
-        soup = BeautifulSoup(resp.text, "html.parser")
-        
-        for res in soup.find_all("div", class_="result"):
-            if len(raw_results) >= max_results:
-                break
-                
-            title_tag = res.find("a", class_="result__a")
-            if not title_tag:
-                continue
-                
-            link = title_tag["href"]
-            if link.startswith("/l/?"):
-                qs = urllib.parse.parse_qs(urllib.parse.urlparse(link).query)
-                if 'uddg' in qs:
-                    link = qs['uddg'][0]
-
-            title = title_tag.get_text(strip=True)
-            
-            # Pre-filter junk
-            if any(junk in title.lower() for junk in ["login", "sign up", "404", "index of"]):
-                continue
-
-            snippet_tag = res.find("a", class_="result__snippet")
-            snippet = snippet_tag.get_text(strip=True) if snippet_tag else ""
-            
-            # Rule-based extraction (fast)
-            affiliation = extract_affiliation(title, snippet)
-            
-            # Rule-based name extraction
-            name = title
-            GENERIC_TITLES = ["GitHub Pages", "Home", "Home Page", "Welcome", "Profile", "Bio", "About", "Index", "Default"]
-            if name in GENERIC_TITLES or name.lower() in [t.lower() for t in GENERIC_TITLES]:
-                name = query.title()
-            else:
-                separators = [" - ", " | ", " – ", " — ", " : ", " at "]
-                for sep in separators:
-                    if sep in title:
-                        potential = title.split(sep)[0].strip()
-                        if len(potential.split()) <= 4:
-                            name = potential
-                            break
+    resp = http_client.get_session().post(url, data=data, headers=headers, timeout=10)
+    resp.raise_for_status()
+    
+    soup = BeautifulSoup(resp.text, "html.parser")
+    
+    for res in soup.find_all("div", class_="result"):
+        if len(raw_results) >= max_results:
+            break
             
-            raw_results.append({
-                "title": title,
-                "name": name,
-                "link": link,
-                "snippet": snippet,
-                "affiliation": affiliation
-            })
+        title_tag = res.find("a", class_="result__a")
+        if not title_tag:
+            continue
             
-    except Exception as e:
-        print(f"Search error: {e}")
-        return []
+        link = title_tag["href"]
+        if link.startswith("/l/?"):
+            qs = urllib.parse.parse_qs(urllib.parse.urlparse(link).query)
+            if 'uddg' in qs:
+                link = qs['uddg'][0]
 
-    # Cache and Return
-    search_cache[query] = raw_results
-    return raw_results
+        title = title_tag.get_text(strip=True)
+        
+        # Pre-filter junk
+        if any(junk in title.lower() for junk in ["login", "sign up", "404", "index of"]):
+            continue
 
+        snippet_tag = res.find("a", class_="result__snippet")
+        snippet = snippet_tag.get_text(strip=True) if snippet_tag else ""
+        
+        # Rule-based extraction (fast)
+        affiliation = extract_affiliation(title, snippet)
+        
+        # Rule-based name extraction
+        name = title
+        GENERIC_TITLES = ["GitHub Pages", "Home", "Home Page", "Welcome", "Profile", "Bio", "About", "Index", "Default"]
+        if name in GENERIC_TITLES or name.lower() in [t.lower() for t in GENERIC_TITLES]:
+            name = query.title()
+        else:
+            separators = [" - ", " | ", " – ", " — ", " : ", " at "]
+            for sep in separators:
+                if sep in title:
+                    potential = title.split(sep)[0].strip()
+                    if len(potential.split()) <= 4:
+                        name = potential
+                        break
+        
+        raw_results.append({
+            "title": title,
+            "name": name,
+            "link": link,
+            "snippet": snippet,
+            "affiliation": affiliation
+        })
+        
+    return raw_results
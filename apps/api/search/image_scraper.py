@@ -1,23 +1,15 @@
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
-import socket
-import ipaddress
+from urllib.parse import urlparse
 import logging
 from typing import List, Optional
+from services import http_cache
+from services.resolver import BlockedAddressError, get_resolver
+from ingest import fetcher
+from ingest.document import ParsedDocument, parse_document, get_cached_document, get_cached_image_candidates
 
 logger = logging.getLogger(__name__)
 
-# SSRF Protection: Block internal IPs
-BLOCKED_NETWORKS = [
-    ipaddress.ip_network("127.0.0.0/8"),
-    ipaddress.ip_network("10.0.0.0/8"),
-    ipaddress.ip_network("172.16.0.0/12"),
-    ipaddress.ip_network("192.168.0.0/16"),
-    ipaddress.ip_network("169.254.0.0/16"),
-    ipaddress.ip_network("::1/128"),
-    ipaddress.ip_network("fc00::/7"),
-]
+# Servers without a proper image type often send octet-stream
+IMAGE_TYPES = ("image/", "application/octet-stream", "binary/octet-stream")
 
 def is_safe_url(url: str) -> bool:
     try:
@@ -29,98 +21,109 @@ def is_safe_url(url: str) -> bool:
         if not hostname:
             return False
 
-        # Resolve IP
-        ip = socket.gethostbyname(hostname)
-        ip_addr = ipaddress.ip_address(ip)
-
-        for network in BLOCKED_NETWORKS:
-            if ip_addr in network:
-                logger.warning(f"Blocked SSRF attempt: {url} points to {ip}")
-                return False
-        
+        # Resolve (cached) and pin later connections to the checked IP
+        get_resolver().check(hostname)
         return True
+    except BlockedAddressError as e:
+        logger.warning(f"Blocked SSRF attempt: {url} points to {e.address}")
+        return False
     except Exception as e:
         logger.error(f"SSRF check failed for {url}: {e}")
         return False
 
-def get_image_candidates(website_url: str, timeout: int = 10) -> List[str]:
+def check_redirect(url: str):
+    """check_url for http_cache.get: every redirect hop must pass is_safe_url too."""
+    if not is_safe_url(url):
+        raise PermissionError(f"Unsafe redirect to {url}")
+
+def get_image_candidates(website_url: str, timeout: int = 10, doc: Optional[ParsedDocument] = None) -> List[str]:
     """
     Scrapes a website for image candidates suitable for a profile picture.
     Returns a list of absolute URLs, sorted by relevance score.
+    Pass an already parsed document (e.g. from /ingest) to skip the download.
     """
     if not is_safe_url(website_url):
         return []
 
     try:
-        # 1. Fetch HTML
-        resp = requests.get(website_url, timeout=timeout, headers={"User-Agent": "Mozilla/5.0"})
-        resp.raise_for_status()
-        soup = BeautifulSoup(resp.content, "html.parser")
-        
-        candidates = []
-        seen_urls = set()
+        # 1. Fetch HTML (unless we already have it parsed, or scored by the ingest)
+        if doc is None:
+            candidates = get_cached_image_candidates(website_url)
+            if candidates is not None:
+                return candidates
+            doc = get_cached_document(website_url)
+        if doc is None:
+            resp = http_cache.get(website_url, timeout=timeout, max_bytes=fetcher.MAX_BYTES, truncate=True,
+                                  accept_types=fetcher.HTML_TYPES, check_url=check_redirect)
+            resp.raise_for_status()
+            doc = parse_document(resp.text, website_url, cache=True)
+
+        return score_image_candidates(doc)
 
-        # 2. Extract <img> tags
-        for img in soup.find_all("img"):
-            src = img.get("src")
-            if not src:
-                continue
-            
-            full_url = urljoin(website_url, src)
-            if full_url in seen_urls:
+    except Exception as e:
+        logger.error(f"Image scraping failed for {website_url}: {e}")
+        return []
+
+def score_image_candidates(doc: ParsedDocument) -> List[str]:
+    candidates = []
+    seen_urls = set()
+
+    # 2. Extract <img> tags
+    for img in doc.images:
+        src = img["src"]
+        if not src:
+            continue
+
+        full_url = img["url"]
+        if full_url in seen_urls:
+            continue
+
+        # Basic filter (extensions)
+        if not any(full_url.lower().endswith(ext) for ext in [".jpg", ".jpeg", ".png", ".webp"]):
+            # Allow query params but check path
+            path = urlparse(full_url).path.lower()
+            if not any(path.endswith(ext) for ext in [".jpg", ".jpeg", ".png", ".webp"]):
                 continue
-            
-            # Basic filter (extensions)
-            if not any(full_url.lower().endswith(ext) for ext in [".jpg", ".jpeg", ".png", ".webp"]):
-                # Allow query params but check path
-                path = urlparse(full_url).path.lower()
-                if not any(path.endswith(ext) for ext in [".jpg", ".jpeg", ".png", ".webp"]):
-                    continue
-
-            # Calculate Score
-            score = 0
-            alt = (img.get("alt") or "").lower()
-            src_lower = src.lower()
-            classes = " ".join(img.get("class", [])).lower()
-
-            # Keywords boost
-            keywords = ["profile", "avatar", "photo", "me", "headshot", "face", "portrait"]
-            for kw in keywords:
-                if kw in alt: score += 10
-                if kw in src_lower: score += 5
-                if kw in classes: score += 5
-
-            # Negative keywords
-            neg_keywords = ["logo", "icon", "banner", "footer", "header", "sprite", "shim", "blank"]
-            if any(nw in src_lower or nw in alt or nw in classes for nw in neg_keywords):
-                score -= 50
-
-            # Store candidate
+
+        # Calculate Score
+        score = 0
+        alt = img["alt"].lower()
+        src_lower = src.lower()
+        classes = img["class"].lower()
+
+        # Keywords boost
+        keywords = ["profile", "avatar", "photo", "me", "headshot", "face", "portrait"]
+        for kw in keywords:
+            if kw in alt: score += 10
+            if kw in src_lower: score += 5
+            if kw in classes: score += 5
+
+        # Negative keywords
+        neg_keywords = ["logo", "icon", "banner", "footer", "header", "sprite", "shim", "blank"]
+        if any(nw in src_lower or nw in alt or nw in classes for nw in neg_keywords):
+            score -= 50
+
+        # Store candidate
+        candidates.append({
+            "url": full_url,
+            "score": score,
+            "alt": alt
+        })
+        seen_urls.add(full_url)
+
+    # 3. Extract Meta OG Image (High confidence usually)
+    if doc.meta.get("og:image"):
+        og_url = doc.absolute(doc.meta["og:image"])
+        if og_url not in seen_urls:
             candidates.append({
-                "url": full_url,
-                "score": score,
-                "alt": alt
+                "url": og_url,
+                "score": 20, # High baseline score for OG image
+                "alt": "og:image"
             })
-            seen_urls.add(full_url)
-
-        # 3. Extract Meta OG Image (High confidence usually)
-        og_image = soup.find("meta", property="og:image")
-        if og_image and og_image.get("content"):
-            og_url = urljoin(website_url, og_image["content"])
-            if og_url not in seen_urls:
-                candidates.append({
-                    "url": og_url,
-                    "score": 20, # High baseline score for OG image
-                    "alt": "og:image"
-                })
-
-        # 4. Sort and return Top 5
-        candidates.sort(key=lambda x: x["score"], reverse=True)
-        return [c["url"] for c in candidates if c["score"] > -10][:5]
 
-    except Exception as e:
-        logger.error(f"Image scraping failed for {website_url}: {e}")
-        return []
+    # 4. Sort and return Top 5
+    candidates.sort(key=lambda x: x["score"], reverse=True)
+    return [c["url"] for c in candidates if c["score"] > -10][:5]
 
 def download_image(url: str, max_size_mb: int = 5, timeout: int = 10) -> Optional[bytes]:
     """
@@ -131,25 +134,19 @@ def download_image(url: str, max_size_mb: int = 5, timeout: int = 10) -> Optiona
         return None
 
     try:
-        # Stream request to check headers first
-        with requests.get(url, stream=True, timeout=timeout, headers={"User-Agent": "Mozilla/5.0"}) as r:
-            r.raise_for_status()
-            
-            # Check Content-Length if available
-            content_length = r.headers.get("Content-Length")
-            if content_length and int(content_length) > max_size_mb * 1024 * 1024:
-                logger.warning(f"Image too large (header): {url} ({content_length} bytes)")
-                return None
-            
-            # Read chunks and enforce limit
-            content = b""
-            for chunk in r.iter_content(chunk_size=8192):
-                content += chunk
-                if len(content) > max_size_mb * 1024 * 1024:
-                    logger.warning(f"Image too large: {url}")
-                    return None
-            
-            return content
+        # Served from the shared HTTP cache when we downloaded it recently
+        r = http_cache.get(url, timeout=timeout, max_bytes=max_size_mb * 1024 * 1024, accept_types=IMAGE_TYPES,
+                           check_url=check_redirect)
+        r.raise_for_status()
+        return r.content
+    except http_cache.ResponseTooLarge as e:
+        logger.warning(f"Image too large: {e}")
+        return None
+    except http_cache.UnsupportedContentType as e:
+        logger.warning(f"Not an image: {url} ({e.content_type})")
+        return None
+    except PermissionError:
+        return None
     except Exception as e:
         logger.error(f"Download failed {url}: {e}")
         return None
@@ -0,0 +1,278 @@
+"""
+Professor Index — full-text search over the user's own professors
+
+One document per professor, with four fields, weighted in this order:
+    name         Professor.name
+    affiliation  Professor.affiliation
+    interests    research_interests of the latest card
+    body         text of the latest ingested page (first INDEX_MAX_CHARS)
+
+On SQLite the index is an FTS5 table (porter stemming, diacritics
+folded) ranked with bm25; on Postgres it is a weighted tsvector with a
+GIN index, ranked with ts_rank_cd. Either way search() returns higher
+rank = better match and a short snippet around the matched words. Query
+words are ANDed; the last one also matches as a prefix ("diffus" finds
+"diffusion"), so the index can back a search-as-you-type box.
+
+Updates are incremental: index_professors() re-reads the given
+professors' rows and replaces their documents. It is called where those
+rows change (professor create/update, ingest, card generation, crawls) and
+runs in the caller's transaction, inside a savepoint, so a broken index
+never fails the write it follows. remove_professors() runs on delete.
+
+The Alembic migration creates the table; ensure_index() also creates it
+wherever tables are created with create_all() (API startup, the standalone
+job worker, the test scripts) and on the first search, since create_all()
+doesn't know FTS5 tables. If it then has fewer documents than there are professors,
+e.g. right after the migration, it is rebuilt from the current data;
+scripts/rebuild_search_index.py does the same by hand.
+
+Config (env):
+    SEARCH_INDEX_MAX_CHARS   page text indexed per professor (default 100000)
+"""
+import os
+import re
+import json
+import threading
+import logging
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+INDEX_MAX_CHARS = int(os.getenv("SEARCH_INDEX_MAX_CHARS", "100000"))
+
+TABLE = "professor_search"
+# bm25 / setweight weights for name, affiliation, interests, body
+SQLITE_WEIGHTS = (10.0, 4.0, 4.0, 1.0)
+SNIPPET_WORDS = 12
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+SQLITE_DDL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+    "name, affiliation, interests, body, user_id UNINDEXED, "
+    "tokenize='porter unicode61 remove_diacritics 2')",
+)
+POSTGRES_DDL = (
+    f"CREATE TABLE IF NOT EXISTS {TABLE} ("
+    "professor_id INTEGER PRIMARY KEY REFERENCES professors (id) ON DELETE CASCADE, "
+    "user_id INTEGER, name TEXT, affiliation TEXT, interests TEXT, document TSVECTOR NOT NULL)",
+    f"CREATE INDEX IF NOT EXISTS ix_{TABLE}_document ON {TABLE} USING GIN (document)",
+    f"CREATE INDEX IF NOT EXISTS ix_{TABLE}_user_id ON {TABLE} (user_id)",
+)
+
+_lock = threading.Lock()
+_ready = set() # engine urls whose table exists
+_stats_lock = threading.Lock()
+_stats = {"indexed": 0, "removed": 0, "queries": 0, "rebuilds": 0, "errors": 0}
+
+
+def _count(key: str, amount: int = 1):
+    with _stats_lock:
+        _stats[key] += amount
+
+
+def _dialect(db: Session) -> str:
+    return db.get_bind().dialect.name
+
+
+def ensure_index(bind):
+    """
+    Creates the index table once per process, and rebuilds it if documents
+    are missing. Uses its own session: call it outside write transactions.
+    """
+    key = str(bind.url)
+    if key in _ready:
+        return
+    with _lock:
+        if key in _ready:
+            return
+        session = Session(bind=bind)
+        try:
+            for ddl in (POSTGRES_DDL if _dialect(session) == "postgresql" else SQLITE_DDL):
+                session.execute(text(ddl))
+            session.commit()
+            documents = session.execute(text(f"SELECT count(*) FROM {TABLE}")).scalar()
+            professors = session.execute(text("SELECT count(*) FROM professors")).scalar()
+            if documents < professors:
+                logger.info(f"[SearchIndex] {professors - documents} professors not indexed, rebuilding")
+                _rebuild(session)
+            _ready.add(key)
+        finally:
+            session.close()
+
+
+# --- Documents ---
+
+def _interests(card) -> str:
+    if card is None:
+        return ""
+    try:
+        return "; ".join(json.loads(card.card_json).get("research_interests") or [])
+    except (TypeError, ValueError):
+        return ""
+
+
+def _documents(db: Session, professors) -> List[Dict]:
+    import crud
+
+    ids = [p.id for p in professors]
+    pages = crud.get_latest_text_pages(db, ids)
+    cards = crud.get_latest_cards(db, ids)
+    documents = []
+    for p in professors:
+        page = pages.get(p.id)
+        documents.append({
+            "id": p.id,
+            "user_id": p.user_id,
+            "name": p.name or "",
+            "affiliation": p.affiliation or "",
+            "interests": _interests(cards.get(p.id)),
+            "body": (page.raw_text or "")[:INDEX_MAX_CHARS] if page is not None else "",
+        })
+    return documents
+
+
+def _write(db: Session, documents: List[Dict]):
+    if not documents:
+        return
+    if _dialect(db) == "postgresql":
+        db.execute(text(
+            f"INSERT INTO {TABLE} (professor_id, user_id, name, affiliation, interests, document) "
+            "VALUES (:id, :user_id, :name, :affiliation, :interests, "
+            "setweight(to_tsvector('english', :name), 'A') || setweight(to_tsvector('english', :affiliation), 'B') || "
+            "setweight(to_tsvector('english', :interests), 'B') || setweight(to_tsvector('english', :body), 'D')) "
+            "ON CONFLICT (professor_id) DO UPDATE SET user_id = excluded.user_id, name = excluded.name, "
+            "affiliation = excluded.affiliation, interests = excluded.interests, document = excluded.document"
+        ), documents)
+    else:
+        # FTS5 has no upsert: replace the rows
+        _delete(db, [d["id"] for d in documents])
+        db.execute(text(
+            f"INSERT INTO {TABLE} (rowid, name, affiliation, interests, body, user_id) "
+            "VALUES (:id, :name, :affiliation, :interests, :body, :user_id)"
+        ), documents)
+
+
+def _delete(db: Session, professor_ids: List[int]):
+    column = "professor_id" if _dialect(db) == "postgresql" else "rowid"
+    db.execute(text(f"DELETE FROM {TABLE} WHERE {column} = :id"), [{"id": i} for i in professor_ids])
+
+
+def index_professors(db: Session, professor_ids: Iterable[int]):
+    """
+    Replaces the documents of these professors with their current rows
+    (pending changes in db included). Runs in the caller's transaction;
+    the caller commits.
+    """
+    import models
+
+    professor_ids = list(dict.fromkeys(i for i in professor_ids if i is not None))
+    if not professor_ids:
+        return
+    try:
+        db.flush()
+        with db.begin_nested():
+            professors = db.query(models.Professor).filter(models.Professor.id.in_(professor_ids)).all()
+            _write(db, _documents(db, professors))
+        _count("indexed", len(professors))
+    except Exception as e:
+        _count("errors")
+        logger.warning(f"[SearchIndex] Could not index professors {professor_ids[:10]}: {e}")
+
+
+def remove_professors(db: Session, professor_ids: Iterable[int]):
+    """Drops these professors from the index. Runs in the caller's transaction."""
+    professor_ids = list(professor_ids)
+    if not professor_ids:
+        return
+    try:
+        with db.begin_nested():
+            _delete(db, professor_ids)
+        _count("removed", len(professor_ids))
+    except Exception as e:
+        _count("errors")
+        logger.warning(f"[SearchIndex] Could not remove professors {professor_ids[:10]}: {e}")
+
+
+def _rebuild(db: Session, batch: int = 200) -> int:
+    import models
+
+    db.execute(text(f"DELETE FROM {TABLE}"))
+    ids = [i for (i,) in db.query(models.Professor.id).order_by(models.Professor.id)]
+    for start in range(0, len(ids), batch):
+        professors = db.query(models.Professor).filter(models.Professor.id.in_(ids[start:start + batch])).all()
+        _write(db, _documents(db, professors))
+    db.commit()
+    _count("rebuilds")
+    return len(ids)
+
+
+def rebuild(db: Session) -> int:
+    """Re-indexes every professor from scratch. Returns the number of documents."""
+    ensure_index(db.get_bind())
+    count = _rebuild(db)
+    logger.info(f"[SearchIndex] Rebuilt index with {count} professors")
+    return count
+
+
+# --- Queries ---
+
+def _sqlite_query(words: List[str]) -> str:
+    # Each word quoted (no FTS5 operators from user input), the last one as a prefix
+    return " ".join(f'"{w}"' for w in words[:-1]) + f' "{words[-1]}"*'
+
+
+def _postgres_query(words: List[str]) -> str:
+    return " & ".join(words[:-1] + [f"{words[-1]}:*"])
+
+
+def search(db: Session, user_id: int, q: str, skip: int = 0, limit: int = 20) -> Tuple[int, List[Tuple[int, float, str]]]:
+    """
+    The user's professors matching q, best first: (total matches,
+    [(professor_id, rank, snippet)] for this page). Matched words in the
+    snippet are wrapped in [ ].
+    """
+    words = [w.lower() for w in WORD_RE.findall(q or "")]
+    if not words:
+        return 0, []
+    ensure_index(db.get_bind())
+    _count("queries")
+
+    if _dialect(db) == "postgresql":
+        rows = db.execute(text(
+            f"SELECT professor_id, ts_rank_cd(document, query) AS rank, "
+            "ts_headline('english', concat_ws(' · ', name, affiliation, interests), query, "
+            f"'StartSel=[, StopSel=], MaxWords={SNIPPET_WORDS}, MinWords=3') AS snippet, "
+            "count(*) OVER () AS total "
+            f"FROM {TABLE}, to_tsquery('english', :query) AS query "
+            "WHERE user_id = :user_id AND document @@ query "
+            "ORDER BY rank DESC, professor_id LIMIT :limit OFFSET :skip"
+        ), {"query": _postgres_query(words), "user_id": user_id, "limit": limit, "skip": skip}).all()
+        total = rows[0].total if rows else 0
+        if not rows and skip:
+            total = db.execute(text(
+                f"SELECT count(*) FROM {TABLE} WHERE user_id = :user_id AND document @@ to_tsquery('english', :query)"
+            ), {"query": _postgres_query(words), "user_id": user_id}).scalar()
+        return total, [(r.professor_id, float(r.rank), r.snippet) for r in rows]
+
+    params = {"query": _sqlite_query(words), "user_id": user_id, "limit": limit, "skip": skip}
+    weights = ", ".join(str(w) for w in SQLITE_WEIGHTS)
+    rows = db.execute(text(
+        f"SELECT rowid, bm25({TABLE}, {weights}) AS rank, "
+        f"snippet({TABLE}, -1, '[', ']', '…', {SNIPPET_WORDS}) AS snippet "
+        f"FROM {TABLE} WHERE {TABLE} MATCH :query AND user_id = :user_id "
+        "ORDER BY rank, rowid LIMIT :limit OFFSET :skip"
+    ), params).all()
+    total = db.execute(text(
+        f"SELECT count(*) FROM {TABLE} WHERE {TABLE} MATCH :query AND user_id = :user_id"
+    ), params).scalar()
+    # bm25 is lower-is-better
+    return total, [(r.rowid, -r.rank, r.snippet) for r in rows]
+
+
+def get_stats() -> Dict:
+    with _stats_lock:
+        return dict(_stats)
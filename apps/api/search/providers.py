@@ -0,0 +1,221 @@
+"""
+Search Providers — where search_professor gets its results from
+
+A provider has a name and search(query, max_results, user_id) returning
+result dicts (title, name, link, snippet, affiliation); it raises on
+failure. search_professor (engine.py) runs all active providers at once
+and merges their results by canonical URL as they arrive, up to a global
+deadline.
+
+Built-in providers:
+    duckduckgo  DuckDuckGo's HTML endpoint. Cached (search/cache.py).
+    local       the user's own professors whose name matches the query
+    stub        fixed results from SEARCH_STUB_FILE, a JSON list of result
+                dicts (offline development and tests)
+
+Other providers can be added with register_provider(); set_providers()
+replaces the active list (tests, scripts).
+
+Config (env):
+    SEARCH_PROVIDERS   comma-separated provider names, in priority order
+                       (default "local,duckduckgo")
+    SEARCH_STUB_FILE   JSON file for the stub provider
+"""
+import os
+import json
+import time
+import threading
+import logging
+from typing import Dict, List, Optional
+from urllib.parse import parse_qsl, urldefrag, urlencode, urlparse
+
+logger = logging.getLogger(__name__)
+
+PROVIDER_NAMES = [name.strip() for name in os.getenv("SEARCH_PROVIDERS", "local,duckduckgo").split(",") if name.strip()]
+STUB_FILE = os.getenv("SEARCH_STUB_FILE", "")
+
+# Query parameters that never change which page a link points to
+TRACKING_PARAMS = {"fbclid", "gclid", "ref", "ref_src"}
+INDEX_PAGES = ("index.html", "index.htm", "index.php", "default.aspx")
+
+
+def canonical_url(url: str) -> str:
+    """
+    Key for deduplicating results: scheme, "www.", default ports, index
+    pages, trailing slashes, fragments and tracking parameters are ignored.
+    """
+    url, _ = urldefrag((url or "").strip())
+    parsed = urlparse(url)
+    host = (parsed.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if parsed.port and parsed.port not in (80, 443):
+        host = f"{host}:{parsed.port}"
+    path = parsed.path
+    for index in INDEX_PAGES:
+        if path.lower().endswith("/" + index):
+            path = path[:-len(index)]
+    path = path.rstrip("/")
+    query = urlencode(sorted(
+        (k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS
+    ))
+    return f"{host}{path}" + (f"?{query}" if query else "")
+
+
+class SearchProvider:
+    name = "provider"
+    # Results go through the shared search cache (only for results that are the same for every user)
+    cacheable = False
+
+    def search(self, query: str, max_results: int, user_id: Optional[int] = None) -> List[Dict]:
+        raise NotImplementedError
+
+
+class DuckDuckGoProvider(SearchProvider):
+    name = "duckduckgo"
+    cacheable = True
+
+    def search(self, query: str, max_results: int, user_id: Optional[int] = None) -> List[Dict]:
+        from search import engine
+        return engine._search_duckduckgo(query, max_results)
+
+
+class LocalProvider(SearchProvider):
+    """Professors the user already added, so search shows them even when the web search is slow."""
+    name = "local"
+
+    def search(self, query: str, max_results: int, user_id: Optional[int] = None) -> List[Dict]:
+        import models
+        from database import SessionLocal
+
+        words = query.split()
+        if user_id is None or not words:
+            return []
+        db = SessionLocal()
+        try:
+            q = db.query(models.Professor).filter(models.Professor.user_id == user_id)
+            for word in words:
+                q = q.filter(models.Professor.name.ilike(f"%{word}%"))
+            professors = q.order_by(models.Professor.updated_at.desc()).limit(max_results).all()
+        finally:
+            db.close()
+        return [
+            {
+                "title": f"{p.name} - {p.affiliation}" if p.affiliation else p.name,
+                "name": p.name,
+                "link": p.website_url or p.scholar_url,
+                "snippet": "Already in your professor list",
+                "affiliation": p.affiliation or "",
+            }
+            for p in professors if p.website_url or p.scholar_url
+        ]
+
+
+class StaticProvider(SearchProvider):
+    """
+    Fixed results, matched against the query word by word (title, name,
+    affiliation and snippet). delay and error simulate a slow or broken
+    backend.
+    """
+
+    def __init__(self, name: str, results: List[Dict], delay: float = 0.0, error: Exception = None):
+        self.name = name
+        self.results = results
+        self.delay = delay
+        self.error = error
+
+    @classmethod
+    def from_file(cls, path: str, name: str = "stub") -> "StaticProvider":
+        with open(path, encoding="utf-8") as f:
+            return cls(name, json.load(f))
+
+    def search(self, query: str, max_results: int, user_id: Optional[int] = None) -> List[Dict]:
+        if self.delay:
+            time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        words = query.casefold().split()
+        matches = []
+        for result in self.results:
+            haystack = " ".join(str(result.get(k) or "") for k in ("title", "name", "affiliation", "snippet")).casefold()
+            if all(word in haystack for word in words):
+                matches.append(dict(result))
+        return matches[:max_results]
+
+
+# --- Registry ---
+
+_lock = threading.Lock()
+_registered: Dict[str, SearchProvider] = {}
+_active: Optional[List[SearchProvider]] = None
+_stats: Dict[str, Dict] = {}
+
+
+def _builtin(name: str) -> Optional[SearchProvider]:
+    if name == "duckduckgo":
+        return DuckDuckGoProvider()
+    if name == "local":
+        return LocalProvider()
+    if name == "stub":
+        if not STUB_FILE:
+            logger.warning("[Search] stub provider enabled without SEARCH_STUB_FILE")
+            return None
+        return StaticProvider.from_file(STUB_FILE)
+    return None
+
+
+def register_provider(provider: SearchProvider, activate: bool = True):
+    """Makes provider available by name; activate=True also adds it to the active list."""
+    global _active
+    with _lock:
+        _registered[provider.name] = provider
+    if activate:
+        current = [p for p in get_providers() if p.name != provider.name]
+        with _lock:
+            _active = current + [provider]
+
+
+def set_providers(providers: Optional[List[SearchProvider]]):
+    """Replaces the active providers (in priority order); None goes back to SEARCH_PROVIDERS."""
+    global _active
+    with _lock:
+        _active = list(providers) if providers is not None else None
+
+
+def get_providers() -> List[SearchProvider]:
+    global _active
+    with _lock:
+        if _active is None:
+            active = []
+            for name in PROVIDER_NAMES:
+                provider = _registered.get(name) or _builtin(name)
+                if provider is None:
+                    logger.warning(f"[Search] Unknown search provider {name!r}, skipped")
+                    continue
+                active.append(provider)
+            _active = active
+        return list(_active)
+
+
+# --- Stats ---
+
+def record(name: str, outcome: str, elapsed: float = None, results: int = 0):
+    """outcome: ok, error or late (still running at the deadline)."""
+    with _lock:
+        stats = _stats.setdefault(name, {"calls": 0, "ok": 0, "errors": 0, "late": 0, "results": 0, "total_ms": 0.0})
+        if outcome == "late":
+            stats["late"] += 1
+            return
+        stats["calls"] += 1
+        stats["ok" if outcome == "ok" else "errors"] += 1
+        stats["results"] += results
+        stats["total_ms"] += (elapsed or 0.0) * 1000
+
+
+def get_stats() -> Dict:
+    with _lock:
+        stats = {name: dict(s) for name, s in _stats.items()}
+    for s in stats.values():
+        s["avg_ms"] = round(s.pop("total_ms") / s["calls"], 1) if s["calls"] else 0.0
+    return stats
@@ -0,0 +1,97 @@
+"""
+Blob Store — content-addressed, compressed storage for page bodies
+
+SourcePage rows point at ContentBlob rows by sha256 of the text, so
+byte-identical HTML/text from repeated fetches is stored only once.
+Bodies are compressed with zstd when the `zstandard` package is installed,
+zlib otherwise. The codec is stored per blob, so both can be read back.
+
+Blobs are inserted with INSERT ... ON CONFLICT DO NOTHING, so the API, job
+workers and the crawler can store the same text at the same time without
+the loser's transaction failing.
+
+Config (env):
+    BLOB_CODEC   "zstd" or "zlib" (default: zstd if available)
+    BLOB_LEVEL   compression level (default 6)
+"""
+import os
+import hashlib
+import zlib
+from typing import Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+CODEC = os.getenv("BLOB_CODEC", "zstd" if zstandard else "zlib")
+LEVEL = int(os.getenv("BLOB_LEVEL", "6"))
+
+if CODEC == "zstd" and zstandard is None:
+    CODEC = "zlib"
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def compress(text: str, codec: str = None) -> Tuple[str, bytes]:
+    codec = codec or CODEC
+    raw = text.encode("utf-8")
+    if codec == "zstd":
+        return codec, zstandard.ZstdCompressor(level=LEVEL).compress(raw)
+    return "zlib", zlib.compress(raw, LEVEL)
+
+
+def decompress(codec: str, data: bytes) -> str:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Blob is zstd-compressed but 'zstandard' is not installed")
+        return zstandard.ZstdDecompressor().decompress(data).decode("utf-8")
+    if codec == "zlib":
+        return zlib.decompress(data).decode("utf-8")
+    raise ValueError(f"Unknown blob codec: {codec}")
+
+
+def _insert(db: Session):
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+def put_text(db: Session, text: Optional[str]) -> Optional[str]:
+    """
+    Stores text (if not already present) and returns its hash.
+    Identical content added twice in one session is only inserted once.
+    The row is written right away, in the caller's transaction.
+    """
+    if text is None:
+        return None
+
+    import models
+
+    digest = content_hash(text)
+    pending = db.info.setdefault("blob_hashes", set())
+    if digest in pending:
+        return digest
+
+    if db.get(models.ContentBlob, digest) is None:
+        codec, data = compress(text)
+        table = models.ContentBlob.__table__
+        # Another session may insert the same hash between the check and here
+        db.execute(_insert(db)(table).values(
+            hash=digest, codec=codec, size=len(text.encode("utf-8")), data=data
+        ).on_conflict_do_nothing(index_elements=[table.c.hash]))
+    pending.add(digest)
+    return digest
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_pending(session, previous_transaction):
+    # Blobs inserted in the rolled-back transaction (or savepoint) are gone
+    session.info.pop("blob_hashes", None)
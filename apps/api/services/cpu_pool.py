@@ -0,0 +1,291 @@
+"""
+CPU Pool — runs CPU-bound pipeline steps in worker processes
+
+HTML cleaning (readability + lxml) and card extraction hold the GIL for
+hundreds of ms on big faculty pages. Run on FastAPI's threadpool, that
+stalls every other request in the worker. run(fn, *args) sends them to a
+process pool instead:
+  - at most CPU_POOL_MAX_PENDING tasks are queued or running; past that the
+    task runs inline rather than piling up
+  - each task gets CPU_POOL_TIMEOUT seconds of execution, counted from when
+    the worker process reports it started (time spent queued behind other
+    tasks, or waiting for a fresh worker to boot, doesn't count). A task that overruns is abandoned: only its worker process is
+    terminated and replaced, tasks running in the other workers carry on,
+    and the caller gets TaskTimeout.
+  - a worker that dies while running a task (crash, OOM kill) is replaced
+    and the caller gets WorkerDied; the task isn't re-run, here or in the
+    pool, since it may be what killed the worker. A worker that died before
+    taking the task is replaced and the task sent to the new one.
+  - with the pool disabled, or arguments or a result that can't be pickled,
+    the task runs inline in the calling thread
+
+Each worker is a process with its own pipe rather than a
+ProcessPoolExecutor, which marks the whole pool broken (and fails every
+running task) when one of its processes is killed.
+
+Functions passed to run() must be importable module-level functions, and
+scripts that use the pool need an `if __name__ == "__main__":` guard
+(workers are spawned, not forked, since the API process runs threads).
+
+Config (env):
+    CPU_POOL_WORKERS       processes (default: CPU count, max 4; 0 runs everything inline)
+    CPU_POOL_MAX_PENDING   queued + running tasks before inline fallback (default 4 x workers)
+    CPU_POOL_TIMEOUT       seconds of execution per task (default 30)
+    CPU_POOL_START_TIMEOUT seconds for a worker to take a task, boot included (default 60)
+    CPU_POOL_START_METHOD  multiprocessing start method (default spawn)
+"""
+import os
+import time
+import pickle
+import threading
+import logging
+import multiprocessing
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+WORKERS = int(os.getenv("CPU_POOL_WORKERS", str(min(os.cpu_count() or 1, 4))))
+MAX_PENDING = int(os.getenv("CPU_POOL_MAX_PENDING", str(max(WORKERS, 1) * 4)))
+TIMEOUT = float(os.getenv("CPU_POOL_TIMEOUT", "30"))
+START_TIMEOUT = float(os.getenv("CPU_POOL_START_TIMEOUT", "60"))
+START_METHOD = os.getenv("CPU_POOL_START_METHOD", "spawn")
+
+
+class TaskFailed(Exception):
+    """The pool took the task but couldn't finish it."""
+
+
+class TaskTimeout(TaskFailed, TimeoutError):
+    pass
+
+
+class WorkerDied(TaskFailed):
+    pass
+
+
+def _worker_main(conn):
+    """
+    Worker process loop: (fn, args, kwargs) in; ("started", None), then
+    ("ok" | "error" | "unpicklable", value) out.
+    """
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, OSError):
+            return
+        if task is None:
+            return
+        fn, args, kwargs = task
+        conn.send(("started", None))
+        try:
+            reply = ("ok", fn(*args, **kwargs))
+        except Exception as e:
+            reply = ("error", e)
+        try:
+            conn.send(reply)
+        except Exception as e:
+            # Result or exception can't be pickled: tell the caller instead of going silent
+            conn.send(("unpicklable", f"{type(e).__name__}: {e}"))
+
+
+class _Worker:
+    def __init__(self, context):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+
+    def stop(self, kill: bool = False):
+        try:
+            if not kill and self.process.is_alive():
+                self.conn.send(None)
+        except OSError:
+            kill = True
+        if kill and self.process.is_alive():
+            self.process.terminate()
+        self.process.join(1)
+        self.conn.close()
+
+
+# Outcomes of a pool attempt that should be retried inline, or in a new worker
+_INLINE = object()
+_RETRY = object()
+
+
+class CPUPool:
+    def __init__(self, workers: int = WORKERS, max_pending: int = MAX_PENDING, timeout: float = TIMEOUT):
+        self.workers = workers
+        self.timeout = timeout
+        self._pending = threading.BoundedSemaphore(max(max_pending, 1))
+        self._slots = threading.BoundedSemaphore(max(workers, 1))
+        self._idle: List[_Worker] = []
+        self._busy = set()
+        self._started = False
+        self._lock = threading.Lock()
+        self._stats = {"submitted": 0, "completed": 0, "inline": 0, "overflow": 0, "fallback": 0, "timeouts": 0, "crashes": 0, "restarts": 0}
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def start(self):
+        """Starts any missing worker processes now instead of on first use."""
+        with self._lock:
+            missing = self.workers - len(self._idle) - len(self._busy)
+        workers = [_Worker(multiprocessing.get_context(START_METHOD)) for _ in range(max(missing, 0))]
+        with self._lock:
+            self._idle.extend(workers)
+            if workers and not self._started:
+                self._started = True
+                logger.info(f"[CPUPool] Started {len(workers)} worker processes ({START_METHOD})")
+
+    def _checkout(self) -> _Worker:
+        # Caller holds a slot, so there is an idle worker or room for a new one
+        with self._lock:
+            worker = self._idle.pop() if self._idle else None
+        if worker is None:
+            worker = _Worker(multiprocessing.get_context(START_METHOD))
+        with self._lock:
+            self._busy.add(worker)
+        return worker
+
+    def _checkin(self, worker: _Worker, healthy: bool):
+        with self._lock:
+            self._busy.discard(worker)
+            if healthy:
+                self._idle.append(worker)
+            else:
+                self._stats["restarts"] += 1
+        if not healthy:
+            # Only this process goes; the next task that needs it starts a new one
+            worker.stop(kill=True)
+
+    def _execute(self, fn: Callable, args, kwargs, timeout: float):
+        """Runs fn in a worker. Returns _INLINE when its arguments or result can't be pickled."""
+        self._slots.acquire() # queue wait: not part of the task's timeout
+        try:
+            # A worker can die while idle; the task never reached it, so one retry is safe
+            for _ in range(2):
+                result = self._attempt(fn, args, kwargs, timeout)
+                if result is not _RETRY:
+                    return result
+            raise WorkerDied(f"No worker took {fn.__name__}")
+        finally:
+            self._slots.release()
+
+    def _attempt(self, fn: Callable, args, kwargs, timeout: float):
+        try:
+            worker = self._checkout()
+        except OSError as e:
+            raise WorkerDied(f"Could not start a worker for {fn.__name__}: {e}") from e
+        healthy = False
+        try:
+            try:
+                worker.conn.send((fn, args, kwargs))
+            except (pickle.PicklingError, AttributeError, TypeError) as e:
+                healthy = True # nothing was sent
+                logger.warning(f"[CPUPool] Can't send {fn.__name__} to the pool ({e}), running inline")
+                return _INLINE
+            except OSError as e:
+                logger.warning(f"[CPUPool] Worker unavailable ({e}), sending {fn.__name__} to a new one")
+                return _RETRY
+            self._count("submitted")
+
+            # The clock starts when the worker has the task, not when it was sent
+            try:
+                started = worker.conn.poll(START_TIMEOUT) and worker.conn.recv()
+            except (EOFError, OSError):
+                started = None
+            if not started:
+                logger.warning(f"[CPUPool] Worker didn't take {fn.__name__}, sending it to a new one")
+                return _RETRY
+            if not worker.conn.poll(timeout):
+                self._count("timeouts")
+                raise TaskTimeout(f"{fn.__name__} timed out after {timeout:.0f}s")
+            try:
+                status, value = worker.conn.recv()
+            except (EOFError, OSError) as e:
+                self._count("crashes")
+                logger.warning(f"[CPUPool] Worker died running {fn.__name__} ({str(e) or 'EOF'})")
+                raise WorkerDied(f"Worker died running {fn.__name__}") from e
+            healthy = True
+            if status == "unpicklable":
+                logger.warning(f"[CPUPool] {fn.__name__} result can't leave the pool ({value}), running inline")
+                return _INLINE
+            if status == "error":
+                raise value
+            self._count("completed")
+            return value
+        finally:
+            self._checkin(worker, healthy)
+
+    def run(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs):
+        if self.workers <= 0:
+            self._count("inline")
+            return fn(*args, **kwargs)
+
+        if not self._pending.acquire(blocking=False):
+            # Queue is full: doing the work here beats an unbounded backlog
+            self._count("overflow")
+            return fn(*args, **kwargs)
+
+        try:
+            result = self._execute(fn, args, kwargs, timeout or self.timeout)
+        finally:
+            self._pending.release()
+        if result is _INLINE:
+            self._count("fallback")
+            return fn(*args, **kwargs)
+        return result
+
+    def shutdown(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+            busy = list(self._busy)
+        for worker in idle:
+            worker.stop()
+        for worker in busy:
+            # Their callers get WorkerDied
+            worker.stop(kill=True)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["workers"] = self.workers
+        return stats
+
+
+def _noop():
+    return os.getpid()
+
+
+def warm_up(pool: "CPUPool" = None):
+    """Starts the worker processes now instead of on the first request."""
+    pool = pool or get_pool()
+    if pool.workers > 0:
+        started = time.perf_counter()
+        try:
+            pool.start()
+            pool.run(_noop)
+        except Exception as e:
+            logger.warning(f"[CPUPool] Warm-up failed: {e}")
+            return
+        logger.info(f"[CPUPool] Warm in {time.perf_counter() - started:.2f}s")
+
+
+# Singleton
+_pool: Optional[CPUPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> CPUPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = CPUPool()
+    return _pool
+
+
+def run(fn: Callable, *args, **kwargs):
+    return get_pool().run(fn, *args, **kwargs)
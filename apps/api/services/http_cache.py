@@ -0,0 +1,472 @@
+"""
+HTTP Cache — persistent response cache shared by ingest and avatar extraction
+
+/ingest, /extract_avatar and the image downloads often hit the same URLs
+within minutes of each other. get() serves those from an on-disk cache
+instead of the network:
+  - freshness follows Cache-Control (no-store, no-cache, max-age) and
+    Expires, capped at HTTP_CACHE_MAX_TTL. Without either, we use 10% of the
+    Last-Modified age or HTTP_CACHE_DEFAULT_TTL.
+  - stale entries with an ETag/Last-Modified are revalidated with a
+    conditional request; a 304 refreshes the entry without a new body
+  - the store is a single SQLite file (WAL mode), so it survives restarts
+    and is shared by all uvicorn workers on the host
+  - bodies are compressed, and the least recently used entries are evicted
+    once the total size exceeds HTTP_CACHE_MAX_BYTES
+
+Network requests still go through the fetch scheduler (robots.txt + per-host
+pacing); cache hits skip it. Bodies are streamed: callers can cap the size
+(raise, or keep the first max_bytes with truncate=True) and list accepted
+content types, which are checked on the headers before any body is read.
+The charset comes from the Content-Type header, a BOM or a <meta> tag in
+the first KB, instead of a chardet pass over the whole body.
+
+Callers that fetch untrusted URLs (the image scraper) pass check_url: then
+redirects are followed here, hop by hop, and every Location is checked
+before it is requested (at most MAX_REDIRECTS hops).
+
+Config (env):
+    HTTP_CACHE_ENABLED      "true"/"false" (default true)
+    HTTP_CACHE_PATH         SQLite file (default ./http_cache.db)
+    HTTP_CACHE_MAX_TTL      upper bound on freshness in seconds (default 86400)
+    HTTP_CACHE_DEFAULT_TTL  freshness when the server gives none (default 300)
+    HTTP_CACHE_MAX_BYTES    total compressed size before LRU eviction (default 256MB)
+"""
+import os
+import re
+import json
+import time
+import zlib
+import codecs
+import sqlite3
+import threading
+import logging
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Optional
+from urllib.parse import urldefrag, urljoin
+
+import requests
+
+from services import http_client
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("HTTP_CACHE_ENABLED", "true").lower() == "true"
+CACHE_PATH = os.getenv("HTTP_CACHE_PATH", "http_cache.db")
+MAX_TTL = int(os.getenv("HTTP_CACHE_MAX_TTL", "86400"))
+DEFAULT_TTL = int(os.getenv("HTTP_CACHE_DEFAULT_TTL", "300"))
+MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Only these response headers are kept with a cached body
+KEPT_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Cache-Control", "Expires", "Date", "Content-Length")
+
+# Don't write last_accessed on every hit; LRU order only needs to be rough
+TOUCH_INTERVAL = 60
+
+# Redirect hops followed for check_url callers
+MAX_REDIRECTS = 5
+
+
+# How much of the body to look at for a <meta charset>
+SNIFF_BYTES = 1024
+
+_CHARSET_RE = re.compile(r"charset\s*=\s*[\"']?([\w.:-]+)", re.IGNORECASE)
+_META_CHARSET_RE = re.compile(rb"<meta[^>]+charset\s*=\s*[\"']?([\w.:-]+)", re.IGNORECASE)
+_BOMS = ((b"\xef\xbb\xbf", "utf-8"), (b"\xff\xfe", "utf-16-le"), (b"\xfe\xff", "utf-16-be"))
+
+
+class ResponseTooLarge(ValueError):
+    pass
+
+
+class UnsupportedContentType(ValueError):
+    def __init__(self, url: str, content_type: str):
+        super().__init__(f"Unsupported content type: {content_type}")
+        self.url = url
+        self.content_type = content_type
+
+
+def _valid_codec(name: Optional[str]) -> Optional[str]:
+    if not name:
+        return None
+    try:
+        return codecs.lookup(name.strip().lower()).name
+    except LookupError:
+        return None
+
+
+def detect_encoding(headers, head: bytes) -> Optional[str]:
+    """
+    Charset from the Content-Type header, a BOM, or <meta charset> /
+    <meta http-equiv="Content-Type"> in the first SNIFF_BYTES. None if unknown.
+    """
+    match = _CHARSET_RE.search(headers.get("Content-Type") or "")
+    if match and _valid_codec(match.group(1)):
+        return _valid_codec(match.group(1))
+    for bom, name in _BOMS:
+        if head.startswith(bom):
+            return name
+    match = _META_CHARSET_RE.search(head[:SNIFF_BYTES])
+    if match:
+        return _valid_codec(match.group(1).decode("ascii", "ignore"))
+    return None
+
+
+def _check_content_type(url: str, headers, accept_types) -> None:
+    if not accept_types:
+        return
+    content_type = (headers.get("Content-Type") or "").split(";")[0].strip().lower()
+    # No Content-Type: let the caller look at the body
+    if content_type and not any(content_type.startswith(t) for t in accept_types):
+        raise UnsupportedContentType(url, content_type)
+
+
+class CachedResponse:
+    """The parts of a requests.Response callers use, for network and cached bodies alike."""
+
+    def __init__(self, url: str, status_code: int, headers: Dict, content: bytes, encoding: Optional[str],
+                 from_cache: bool = False, truncated: bool = False):
+        self.url = url
+        self.status_code = status_code
+        self.headers = requests.structures.CaseInsensitiveDict(headers)
+        self.content = content
+        self.encoding = encoding
+        self.from_cache = from_cache
+        self.truncated = truncated
+
+    @property
+    def text(self) -> str:
+        if self.encoding:
+            return self.content.decode(self.encoding, errors="replace")
+        # Unknown charset: most pages are UTF-8, the rest are mostly Windows-1252
+        try:
+            return self.content.decode("utf-8")
+        except UnicodeDecodeError:
+            return self.content.decode("cp1252", errors="replace")
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url}")
+
+
+def cache_key(url: str) -> str:
+    url, _ = urldefrag(url.strip())
+    return url
+
+
+def freshness_lifetime(headers, now: float = None) -> Optional[float]:
+    """
+    Seconds the response may be served without revalidation, or None if it
+    must not be stored at all.
+    """
+    now = now or time.time()
+    directives = {}
+    for part in (headers.get("Cache-Control") or "").lower().split(","):
+        name, _, value = part.strip().partition("=")
+        if name:
+            directives[name] = value.strip('"')
+
+    if "no-store" in directives or headers.get("Vary", "").strip() == "*":
+        return None
+    if "no-cache" in directives:
+        return 0
+    if "max-age" in directives:
+        try:
+            return min(max(int(directives["max-age"]), 0), MAX_TTL)
+        except ValueError:
+            return 0
+
+    expires = _parse_date(headers.get("Expires"))
+    if headers.get("Expires") is not None:
+        if expires is None:
+            return 0 # invalid Expires means "already expired"
+        date = _parse_date(headers.get("Date")) or now
+        return min(max(expires - date, 0), MAX_TTL)
+
+    last_modified = _parse_date(headers.get("Last-Modified"))
+    if last_modified is not None:
+        return min(max((now - last_modified) * 0.1, 0), MAX_TTL)
+    return min(DEFAULT_TTL, MAX_TTL)
+
+
+def _parse_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+class HTTPCache:
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "revalidated": 0, "stores": 0, "evictions": 0, "errors": 0}
+        self._init_db()
+
+    # --- Storage ---
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                encoding TEXT,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                stored_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                last_accessed REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_responses_last_accessed ON responses (last_accessed)")
+
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def lookup(self, url: str) -> Optional[Dict]:
+        row = self._conn().execute(
+            "SELECT status, headers, encoding, body, expires_at, last_accessed FROM responses WHERE url = ?",
+            (cache_key(url),)
+        ).fetchone()
+        if row is None:
+            return None
+        status, headers, encoding, body, expires_at, last_accessed = row
+        now = time.time()
+        if now - last_accessed > TOUCH_INTERVAL:
+            self._conn().execute("UPDATE responses SET last_accessed = ? WHERE url = ?", (now, cache_key(url)))
+        return {
+            "status": status,
+            "headers": json.loads(headers),
+            "encoding": encoding,
+            "content": zlib.decompress(body),
+            "fresh": now < expires_at,
+        }
+
+    def store(self, url: str, response: CachedResponse) -> bool:
+        if response.status_code != 200:
+            return False
+        lifetime = freshness_lifetime(response.headers)
+        if lifetime is None:
+            return False
+        has_validators = response.headers.get("ETag") or response.headers.get("Last-Modified")
+        if lifetime <= 0 and not has_validators:
+            return False # could never be served or revalidated
+
+        headers = {k: response.headers[k] for k in KEPT_HEADERS if k in response.headers}
+        body = zlib.compress(response.content, 6)
+        now = time.time()
+        self._conn().execute(
+            "INSERT OR REPLACE INTO responses (url, status, headers, encoding, body, size, stored_at, expires_at, last_accessed) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (cache_key(url), response.status_code, json.dumps(headers), response.encoding, body, len(body), now, now + lifetime, now)
+        )
+        self._count("stores")
+        self._evict()
+        return True
+
+    def refresh(self, url: str, entry: Dict, not_modified: CachedResponse) -> Dict:
+        """Applies a 304's headers to the stored entry and restarts its freshness."""
+        headers = dict(entry["headers"])
+        for k in KEPT_HEADERS:
+            if k in not_modified.headers and k != "Content-Length":
+                headers[k] = not_modified.headers[k]
+        lifetime = freshness_lifetime(headers) or 0
+        self._conn().execute(
+            "UPDATE responses SET headers = ?, expires_at = ?, last_accessed = ? WHERE url = ?",
+            (json.dumps(headers), time.time() + lifetime, time.time(), cache_key(url))
+        )
+        entry["headers"] = headers
+        return entry
+
+    def _evict(self):
+        conn = self._conn()
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Evict down to 90% so we don't run this on every following store
+        target = total - int(self.max_bytes * 0.9)
+        freed = 0
+        evicted = []
+        for url, size in conn.execute("SELECT url, size FROM responses ORDER BY last_accessed"):
+            evicted.append((url,))
+            freed += size
+            if freed >= target:
+                break
+        conn.executemany("DELETE FROM responses WHERE url = ?", evicted)
+        self._count("evictions", len(evicted))
+
+    def clear(self):
+        self._conn().execute("DELETE FROM responses")
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["revalidated"] + stats["misses"]
+        stats["hit_rate"] = round((stats["hits"] + stats["revalidated"]) / lookups, 3) if lookups else 0.0
+        try:
+            entries, size = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+            stats["entries"] = entries
+            stats["bytes"] = size
+        except sqlite3.Error:
+            pass
+        return stats
+
+    # --- Fetch ---
+    def get(self, url: str, timeout: float = None, headers: Dict = None, max_bytes: int = None,
+            truncate: bool = False, accept_types=None, check_url: Callable[[str], None] = None) -> CachedResponse:
+        """
+        GET through the cache. Caller-supplied conditional headers are passed
+        through, and a 304 for them is returned as-is. Truncated bodies are
+        returned but never stored. check_url is called on every redirect hop.
+        """
+        headers = dict(headers or {})
+        conditional = "If-None-Match" in headers or "If-Modified-Since" in headers
+
+        entry = None
+        try:
+            entry = self.lookup(url)
+        except Exception as e:
+            self._count("errors")
+            logger.warning(f"[HTTPCache] Lookup failed for {url}: {e}")
+
+        if entry is not None and entry["fresh"]:
+            self._count("hits")
+            _check_content_type(url, entry["headers"], accept_types)
+            return CachedResponse(url, entry["status"], entry["headers"], entry["content"], entry["encoding"], from_cache=True)
+
+        if entry is not None and not conditional:
+            if entry["headers"].get("ETag"):
+                headers["If-None-Match"] = entry["headers"]["ETag"]
+            if entry["headers"].get("Last-Modified"):
+                headers["If-Modified-Since"] = entry["headers"]["Last-Modified"]
+
+        response = _send(url, timeout=timeout, headers=headers, max_bytes=max_bytes, truncate=truncate,
+                         accept_types=accept_types, check_url=check_url)
+        if response.status_code == 304:
+            if entry is not None:
+                entry = self.refresh(url, entry, response)
+            if conditional or entry is None:
+                return response
+            self._count("revalidated")
+            return CachedResponse(url, entry["status"], entry["headers"], entry["content"], entry["encoding"], from_cache=True)
+
+        self._count("misses")
+        if response.truncated:
+            return response
+        try:
+            self.store(url, response)
+        except Exception as e:
+            self._count("errors")
+            logger.warning(f"[HTTPCache] Store failed for {url}: {e}")
+        return response
+
+
+def _send(url: str, timeout: float = None, headers: Dict = None, max_bytes: int = None,
+          truncate: bool = False, accept_types=None, check_url: Callable[[str], None] = None) -> CachedResponse:
+    """
+    One network GET (robots.txt + per-host pacing). The body is streamed:
+    the content type is checked before reading it, and past max_bytes we
+    either raise ResponseTooLarge or, with truncate=True, stop reading.
+    With check_url, redirects are followed one at a time and check_url(hop)
+    runs before each hop is requested (it raises to refuse one).
+    """
+    from ingest.scheduler import get_scheduler
+
+    scheduler = get_scheduler()
+    session = http_client.get_session()
+    target = url
+    for _ in range(MAX_REDIRECTS + 1):
+        if not scheduler.allowed(target):
+            raise PermissionError("Disallowed by robots.txt")
+        with scheduler.slot(target), session.get(
+            target, timeout=timeout, headers=headers or {}, stream=True, allow_redirects=check_url is None
+        ) as r:
+            if check_url is not None and r.is_redirect:
+                target = urljoin(target, r.headers["Location"])
+                check_url(target)
+                continue
+            return _read(url, r, max_bytes, truncate, accept_types)
+    raise requests.TooManyRedirects(f"More than {MAX_REDIRECTS} redirects: {url}")
+
+
+def _read(url: str, r, max_bytes: int = None, truncate: bool = False, accept_types=None) -> CachedResponse:
+    if 200 <= r.status_code < 300:
+        _check_content_type(url, r.headers, accept_types)
+    content_length = r.headers.get("Content-Length")
+    if max_bytes and not truncate and content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        raise ResponseTooLarge(f"Response too large: {url} ({content_length} bytes)")
+
+    chunks = []
+    size = 0
+    encoding = None
+    sniffed = False
+    truncated = False
+    for chunk in r.iter_content(chunk_size=65536):
+        if max_bytes and size + len(chunk) > max_bytes:
+            if not truncate:
+                raise ResponseTooLarge(f"Response too large: {url}")
+            chunk = chunk[:max_bytes - size]
+            truncated = True
+        chunks.append(chunk)
+        size += len(chunk)
+        if not sniffed and (size >= SNIFF_BYTES or truncated):
+            encoding = detect_encoding(r.headers, b"".join(chunks)[:SNIFF_BYTES])
+            sniffed = True
+        if truncated:
+            break
+    body = b"".join(chunks)
+    if not sniffed:
+        encoding = detect_encoding(r.headers, body[:SNIFF_BYTES])
+    return CachedResponse(url, r.status_code, dict(r.headers), body, encoding, truncated=truncated)
+
+
+# Singleton
+_cache: Optional[HTTPCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> Optional[HTTPCache]:
+    global _cache
+    if _cache is None and ENABLED:
+        with _cache_lock:
+            if _cache is None:
+                try:
+                    _cache = HTTPCache()
+                    logger.info(f"[HTTPCache] Using {os.path.abspath(CACHE_PATH)} (max {MAX_BYTES // (1024 * 1024)}MB)")
+                except Exception as e:
+                    logger.error(f"[HTTPCache] Disabled, can't open {CACHE_PATH}: {e}")
+                    return None
+    return _cache
+
+
+def get(url: str, timeout: float = None, headers: Dict = None, max_bytes: int = None,
+        truncate: bool = False, accept_types=None, check_url: Callable[[str], None] = None) -> CachedResponse:
+    """Module-level entry point; falls back to a plain fetch when the cache is disabled."""
+    cache = get_cache()
+    if cache is None:
+        return _send(url, timeout=timeout, headers=headers, max_bytes=max_bytes, truncate=truncate,
+                     accept_types=accept_types, check_url=check_url)
+    return cache.get(url, timeout=timeout, headers=headers, max_bytes=max_bytes, truncate=truncate,
+                     accept_types=accept_types, check_url=check_url)
+
+
+def get_stats() -> Dict:
+    cache = get_cache()
+    return cache.get_stats() if cache is not None else {"enabled": False}
@@ -0,0 +1,220 @@
+"""
+Shared HTTP Client — one pooled requests.Session per process
+
+Every outbound call (ingest fetcher, image scraper, search engine, Ollama LLM
+and vision) goes through get_session() so TCP/TLS connections are kept alive
+and reused per host instead of being rebuilt on every request.
+
+Requests to a host that passed the SSRF check go to connection pools keyed
+by the addresses the check saw, and new connections in them are pinned to
+those addresses (see services/resolver.py).
+
+The session doesn't keep cookies: it is shared by every user's requests,
+so a cookie one fetch picked up would be sent on behalf of everyone else.
+
+Config (env):
+    HTTP_POOL_CONNECTIONS  number of per-host pools to keep (default 32)
+    HTTP_POOL_MAXSIZE      keep-alive connections per host (default 16)
+    HTTP_TIMEOUT           default timeout in seconds (default 15)
+    HTTP_RETRIES           connect/read retries for idempotent calls (default 3)
+    HTTP_BACKOFF           retry backoff factor (default 0.5)
+"""
+import os
+import threading
+import http.cookiejar
+import functools
+import logging
+from collections import namedtuple
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from urllib3.poolmanager import PoolKey, PoolManager, _default_key_normalizer
+
+from services.resolver import get_resolver
+
+logger = logging.getLogger(__name__)
+
+POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "32"))
+POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "16"))
+DEFAULT_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "15"))
+RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.5"))
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+
+
+# --- Pool Counters ---
+# A "hit" is a request served by an idle keep-alive connection,
+# a "miss" is a request that had to open a new TCP/TLS connection.
+_stats_lock = threading.Lock()
+_stats = {"requests": 0, "new_connections": 0}
+
+
+def _count(key: str):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+class _CountingPoolMixin:
+    def _get_conn(self, timeout=None):
+        _count("requests")
+        return super()._get_conn(timeout=timeout)
+
+    def _new_conn(self):
+        _count("new_connections")
+        if self.conn_kw.get("pinned_addresses"):
+            get_resolver().count_pinned_connection()
+        return super()._new_conn()
+
+
+class _PinnedConnectionMixin:
+    """
+    Opens the socket to one of pinned_addresses (if set), in order, instead
+    of a fresh DNS answer; Host header and SNI keep the hostname.
+    """
+
+    def __init__(self, *args, pinned_addresses=None, **kwargs):
+        self.pinned_addresses = pinned_addresses
+        super().__init__(*args, **kwargs)
+
+    def _new_conn(self):
+        if not self.pinned_addresses:
+            return super()._new_conn()
+        dns_host = self._dns_host
+        try:
+            for i, address in enumerate(self.pinned_addresses):
+                self._dns_host = address
+                try:
+                    return super()._new_conn()
+                except (NewConnectionError, ConnectTimeoutError):
+                    if i == len(self.pinned_addresses) - 1:
+                        raise
+        finally:
+            self._dns_host = dns_host
+
+
+class PinnedHTTPConnection(_PinnedConnectionMixin, HTTPConnection):
+    pass
+
+
+class PinnedHTTPSConnection(_PinnedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class CountingHTTPConnectionPool(_CountingPoolMixin, HTTPConnectionPool):
+    ConnectionCls = PinnedHTTPConnection
+
+
+class CountingHTTPSConnectionPool(_CountingPoolMixin, HTTPSConnectionPool):
+    ConnectionCls = PinnedHTTPSConnection
+
+
+PinnedPoolKey = namedtuple("PinnedPoolKey", PoolKey._fields + ("key_pinned_addresses",))
+
+
+class PinnedPoolManager(PoolManager):
+    """
+    PoolManager whose pools are keyed by the host's pinned addresses too:
+    a request after the SSRF check never reuses a connection opened before
+    it (or to another address), and a re-pinned host gets a fresh pool.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        key_fn = functools.partial(_default_key_normalizer, PinnedPoolKey)
+        self.key_fn_by_scheme = {"http": key_fn, "https": key_fn}
+        self.pool_classes_by_scheme = {"http": CountingHTTPConnectionPool, "https": CountingHTTPSConnectionPool}
+
+    def connection_from_host(self, host, port=None, scheme="http", pool_kwargs=None):
+        pool_kwargs = dict(pool_kwargs or {})
+        # None drops the key: unchecked hosts share the plain pool
+        pool_kwargs["pinned_addresses"] = get_resolver().pinned(host) if host else None
+        return super().connection_from_host(host, port=port, scheme=scheme, pool_kwargs=pool_kwargs)
+
+
+class PooledAdapter(HTTPAdapter):
+    """HTTPAdapter with counting, address-pinned pools and a default timeout."""
+
+    def __init__(self, timeout: float = DEFAULT_TIMEOUT, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+        self.poolmanager = PinnedPoolManager(num_pools=connections, maxsize=maxsize, block=block, **pool_kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+
+def build_session(
+    pool_connections: int = POOL_CONNECTIONS,
+    pool_maxsize: int = POOL_MAXSIZE,
+    timeout: float = DEFAULT_TIMEOUT,
+    retries: int = RETRIES,
+    backoff_factor: float = BACKOFF,
+) -> requests.Session:
+    session = requests.Session()
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(502, 503, 504),
+        raise_on_status=False,
+    )
+    adapter = PooledAdapter(
+        timeout=timeout,
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=retry,
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"User-Agent": USER_AGENT})
+    # Shared across users: never store cookies
+    session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+    return session
+
+
+# Singleton
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = build_session()
+                logger.info(f"[HTTP] Pooled session ready (pools={POOL_CONNECTIONS}, per_host={POOL_MAXSIZE})")
+    return _session
+
+
+def get_pool_stats() -> Dict:
+    with _stats_lock:
+        total = _stats["requests"]
+        misses = _stats["new_connections"]
+    hits = max(total - misses, 0)
+    return {
+        "requests": total,
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / total, 3) if total else 0.0,
+    }
+
+
+def reset_pool_stats():
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0
@@ -6,7 +6,7 @@ Pull a model:   ollama pull qwen3:4b
 """
 import os
 import json
-import requests as http_requests
+from services import http_client, singleflight
 from typing import List, Dict, Optional
 from pydantic import BaseModel, ValidationError
 import logging
@@ -36,7 +36,7 @@ class LLMService:
 
         # Check if Ollama is running
         try:
-            r = http_requests.get(f"{self.ollama_url}/api/tags", timeout=2)
+            r = http_client.get_session().get(f"{self.ollama_url}/api/tags", timeout=2)
             if r.status_code == 200:
                 models = [m["name"] for m in r.json().get("models", [])]
                 if self.ollama_model in models or any(self.ollama_model.split(":")[0] in m for m in models):
@@ -92,12 +92,17 @@ If title is generic like "GitHub Pages", infer name from the query."""
         return self._call_ollama(user_prompt, system_prompt)
 
     def _call_ollama(self, prompt: str, system_prompt: str = None) -> str:
+        # Identical prompts already being answered share that answer
+        key = singleflight.make_key(self.ollama_url, self.ollama_model, system_prompt, prompt)
+        return singleflight.group("llm").do(key, self._chat_ollama, prompt, system_prompt)
+
+    def _chat_ollama(self, prompt: str, system_prompt: str = None) -> str:
         print(f"[LLM] Calling Ollama ({self.ollama_model})...")
         
         default_system = "You extract professor info from search results. Output a JSON object with key 'results' containing an array of professor objects."
         actual_system = system_prompt or default_system
 
-        resp = http_requests.post(
+        resp = http_client.get_session().post(
             f"{self.ollama_url}/api/chat",
             json={
                 "model": self.ollama_model,
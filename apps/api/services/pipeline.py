@@ -0,0 +1,406 @@
+"""
+Pipeline steps shared by the HTTP endpoints and the background job workers.
+
+Each step takes a DB session and already-authorized objects (ownership is
+checked by the caller) and commits its own writes.
+"""
+import json
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+from cachetools import TTLCache
+from sqlalchemy.orm import Session
+
+import crud, models, schemas
+from ingest import fetcher, cleaner, extractor, document, keywords, publications
+from emails import generator
+from services import cpu_pool, singleflight
+from search import index as search_index
+
+logger = logging.getLogger(__name__)
+
+
+class PipelineError(Exception):
+    """A step can't run with the data we have (e.g. no source text yet)."""
+
+    def __init__(self, detail: str, status_code: int = 400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+def ingest_page(db: Session, db_professor: models.Professor, url: str, text_mode: Optional[str] = None) -> models.SourcePage:
+    # Fetch URL (conditional if we already have this page)
+    previous_page = crud.get_latest_source_page(db, professor_id=db_professor.id, source_url=url)
+    fetched_data = fetcher.fetch_url(
+        url,
+        etag=previous_page.etag if previous_page else None,
+        last_modified=previous_page.last_modified if previous_page else None
+    )
+
+    # Unchanged since last fetch: skip cleaning, just touch the existing row
+    if fetched_data["fetch_status"] == "not_modified":
+        crud.touch_source_page(db, previous_page, fetched_data)
+        db.commit()
+        db.refresh(previous_page)
+        return previous_page
+
+    # Clean HTML
+    raw_text = ""
+    avatar_url = None
+    if fetched_data["raw_html"]:
+        # Parse once, in a worker process, within a size and time budget
+        cleaned = cleaner.clean_bounded(fetched_data["raw_html"], fetched_data["source_url"], cache=True, mode=text_mode)
+        raw_text, avatar_url = cleaned["raw_text"], cleaned["avatar_url"]
+        if cleaned["status"] != "ok":
+            fetched_data["fetch_status"] = cleaned["status"]
+            fetched_data["error_msg"] = cleaned["error_msg"]
+
+    # Update Professor avatar if not already set (or always?)
+    # Let's update it if we found one
+    if avatar_url:
+        db_professor.avatar_url = avatar_url
+        db.add(db_professor) # commit later
+
+    # Re-downloaded but the text is identical (markup-only changes): keep the old row
+    if crud.same_source_text(previous_page, fetched_data, raw_text):
+        crud.touch_source_page(db, previous_page, fetched_data)
+        db.commit()
+        db.refresh(previous_page)
+        return previous_page
+
+    # Save to DB
+    db_source_page = crud.build_source_page(db, db_professor.id, fetched_data, raw_text)
+    db.add(db_source_page)
+    if raw_text and fetched_data["fetch_status"] in crud.USABLE_FETCH_STATUSES:
+        # This version replaces the previous one in the keyword corpus
+        keywords.record_pages(db, [raw_text], [previous_page.raw_text] if previous_page else [])
+        search_index.index_professors(db, [db_professor.id])
+    db.commit()
+    db.refresh(db_source_page)
+    return db_source_page
+
+
+def page_fingerprint(page: models.SourcePage) -> Optional[str]:
+    # Rows from before text_fingerprint existed are hashed on demand
+    return page.text_fingerprint or cleaner.text_fingerprint(page.raw_text)
+
+
+def get_latest_card(db: Session, professor_id: int) -> Optional[models.ProfessorCard]:
+    return db.query(models.ProfessorCard).filter(
+        models.ProfessorCard.professor_id == professor_id
+    ).order_by(models.ProfessorCard.version.desc(), models.ProfessorCard.generated_at.desc()).first()
+
+
+def card_changes(old: dict, new: dict) -> dict:
+    """What a new card adds or drops compared to the previous one (list fields), and whether the summary moved."""
+    changes = {}
+    for field in ("hiring_signals", "research_interests", "selected_publications"):
+        before, after = old.get(field) or [], new.get(field) or []
+        added = [item for item in after if item not in before]
+        removed = [item for item in before if item not in after]
+        if added or removed:
+            changes[field] = {"added": added, "removed": removed}
+    if old.get("summary") != new.get("summary"):
+        changes["summary"] = True
+    return changes
+
+
+def update_card(db: Session, professor_id: int):
+    """
+    Card for the professor's latest page text: the current card if it was
+    built from the same text with the same extractor version (or the new
+    extraction gives the same output), else a new version.
+    Returns (card, created).
+    """
+    status, card, error_msg = _update_cards(db, [professor_id])[professor_id]
+    if status == "no_source":
+        raise PipelineError(error_msg)
+    if status == "timeout":
+        raise PipelineError(error_msg, status_code=503)
+    db.commit()
+    if status == "created":
+        db.refresh(card)
+    return card, status == "created"
+
+
+def _update_cards(db: Session, professor_ids: List[int],
+                  progress: Optional[Callable[[int, int], None]] = None) -> Dict[int, Tuple[str, Optional[models.ProfessorCard], Optional[str]]]:
+    """
+    Shared by update_card and generate_cards; flushes but leaves the commit to the caller.
+    Cards are memoized by (SourcePage.raw_text_hash, extractor.EXTRACTOR_VERSION):
+      - the latest card already has the key: returned as is
+      - the latest card's text only differs in case, whitespace or footer
+        lines (same text_fingerprint): re-keyed without extracting
+      - another card (any professor, any version) has the key: its output is reused
+      - otherwise the text is extracted
+    A new version is only added when the output differs from the latest card;
+    if it doesn't, the latest card is re-keyed instead. Bumping
+    EXTRACTOR_VERSION therefore re-extracts every card once, but only cards
+    whose output changed get a new version.
+    Returns professor_id -> (status, card, error_msg), status one of
+    created, unchanged, no_source, timeout.
+    """
+    pages = crud.get_latest_text_pages(db, professor_ids)
+    previous_cards = crud.get_latest_cards(db, professor_ids)
+    extractor_version = extractor.EXTRACTOR_VERSION
+
+    results = {}
+    todo = []
+    for professor_id in dict.fromkeys(professor_ids):
+        page = pages.get(professor_id)
+        previous_card = previous_cards.get(professor_id)
+        if page is None:
+            results[professor_id] = ("no_source", None, "No source text available. Please ingest URL first.")
+        elif previous_card and previous_card.source_text_hash == page.raw_text_hash \
+                and previous_card.extractor_version == extractor_version:
+            results[professor_id] = ("unchanged", previous_card, None)
+        elif previous_card and previous_card.source_fingerprint == page_fingerprint(page) \
+                and previous_card.extractor_version == extractor_version:
+            previous_card.source_text_hash = page.raw_text_hash
+            results[professor_id] = ("unchanged", previous_card, None)
+        else:
+            todo.append((professor_id, page, previous_card))
+
+    # Texts without a memoized card are extracted once each, in parallel chunks
+    outputs = {
+        text_hash: json.loads(card_json)
+        for text_hash, card_json in crud.get_cached_card_json(db, [page.raw_text_hash for _, page, _ in todo], extractor_version).items()
+    }
+    missing = {page.raw_text_hash: page for _, page, _ in todo if page.raw_text_hash not in outputs}
+    logger.info(f"[Card] {len(todo)} of {len(results) + len(todo)} cards stale, {len(todo) - len(missing)} memoized, extracting {len(missing)}")
+    if missing:
+        extracted = extractor.extract_professor_cards([page.raw_text for page in missing.values()], progress=progress)
+        outputs.update(zip(missing, extracted))
+
+    rows = []
+    for professor_id, page, previous_card in todo:
+        card_data = outputs.get(page.raw_text_hash)
+        if card_data is None:
+            results[professor_id] = ("timeout", None, "Card extraction timed out")
+        elif previous_card and json.loads(previous_card.card_json) == card_data:
+            # New text or extractor version, same card
+            previous_card.source_text_hash = page.raw_text_hash
+            previous_card.extractor_version = extractor_version
+            previous_card.source_fingerprint = page_fingerprint(page)
+            results[professor_id] = ("unchanged", previous_card, None)
+        else:
+            row = build_card(professor_id, card_data, page, previous_card)
+            rows.append(row)
+            results[professor_id] = ("created", row, None)
+    db.add_all(rows)
+    db.flush()
+    # New interests are searchable right away
+    search_index.index_professors(db, [row.professor_id for row in rows])
+    return results
+
+
+def card_markdown(card_data: dict) -> str:
+    md = f"## Summary\n{card_data['summary']}\n\n## Interests\n" + "\n".join(f"- {i}" for i in card_data['research_interests'])
+    if card_data.get("publications"):
+        md += "\n\n## Publications\n" + "\n".join(f"- {publications.format_publication(p)}" for p in card_data["publications"])
+    return md
+
+
+def build_card(professor_id: int, card_data: dict, source_page: models.SourcePage,
+               previous_card: Optional[models.ProfessorCard]) -> models.ProfessorCard:
+    """Next card version for card_data extracted from source_page, with its diff against previous_card."""
+    changes = None
+    if previous_card:
+        changes = card_changes(json.loads(previous_card.card_json), card_data)
+        logger.info(f"[Card] Professor {professor_id} v{previous_card.version + 1}: changed {sorted(changes) or 'nothing'}")
+
+    return models.ProfessorCard(
+        professor_id=professor_id,
+        card_json=json.dumps(card_data),
+        card_md=card_markdown(card_data),
+        hiring_signals=json.dumps(card_data["hiring_signals"]),
+        version=previous_card.version + 1 if previous_card else 1,
+        source_text_hash=source_page.raw_text_hash,
+        extractor_version=extractor.EXTRACTOR_VERSION,
+        source_fingerprint=page_fingerprint(source_page),
+        changes=json.dumps(changes) if changes is not None else None
+    )
+
+
+def generate_card(db: Session, professor_id: int) -> models.ProfessorCard:
+    card, _ = update_card(db, professor_id)
+    return card
+
+
+def generate_cards(db: Session, professor_ids: List[int],
+                   progress: Optional[Callable[[int, int], None]] = None) -> List[dict]:
+    """
+    generate_card for many professors: latest pages and cards are loaded in
+    one query each, stale cards are extracted in parallel chunks
+    (extractor.extract_professor_cards), and the new rows are inserted in one
+    transaction. Returns one {"professor_id", "status", "card_id", "version",
+    "error_msg"} per professor, in input order; status is created,
+    unchanged, no_source or timeout.
+    """
+    results = _update_cards(db, professor_ids, progress=progress)
+
+    # Read ids before the commit expires them
+    report = []
+    for professor_id in professor_ids:
+        status, card, error_msg = results[professor_id]
+        report.append({
+            "professor_id": professor_id,
+            "status": status,
+            "card_id": card.id if card else None,
+            "version": card.version if card else None,
+            "error_msg": error_msg,
+        })
+    db.commit()
+    return report
+
+
+def summarize_cards(items: List[dict], elapsed_ms: float) -> dict:
+    """generate_cards items -> GenerateCardsResponse."""
+    created = sum(1 for item in items if item["status"] == "created")
+    unchanged = sum(1 for item in items if item["status"] == "unchanged")
+    return {
+        "items": items,
+        "created": created,
+        "unchanged": unchanged,
+        "failed": len(items) - created - unchanged,
+        "elapsed_ms": round(elapsed_ms, 1),
+    }
+
+
+def refresh_professor(db: Session, db_professor: models.Professor) -> dict:
+    """
+    Re-fetches the professor's website (conditionally) and regenerates the
+    card only if the page text changed. Used by the background refresher.
+    """
+    if not db_professor.website_url:
+        raise PipelineError("Professor has no website_url to refresh")
+
+    before = crud.get_latest_source_page(db, professor_id=db_professor.id, source_url=db_professor.website_url)
+    page = ingest_page(db, db_professor, db_professor.website_url)
+    result = {
+        "professor_id": db_professor.id,
+        "source_page_id": page.id,
+        "fetch_status": page.fetch_status,
+        "text_changed": page.fetch_status in crud.USABLE_FETCH_STATUSES and (before is None or page.id != before.id),
+        "card_id": None,
+        "card_version": None,
+        "card_updated": False,
+        "changes": None,
+    }
+    if page.fetch_status not in crud.USABLE_FETCH_STATUSES:
+        return result
+
+    card, created = update_card(db, db_professor.id)
+    result.update({
+        "card_id": card.id,
+        "card_version": card.version,
+        "card_updated": created,
+        "changes": json.loads(card.changes) if created and card.changes else None,
+    })
+    return result
+
+
+def generate_email(db: Session, db_professor: models.Professor, request: Optional[schemas.EmailGenerationRequest]) -> models.EmailDraft:
+    # Get latest card (for interests)
+    latest_card = db.query(models.ProfessorCard).filter(
+        models.ProfessorCard.professor_id == db_professor.id
+    ).order_by(models.ProfessorCard.generated_at.desc()).first()
+
+    card_data = {}
+    if latest_card:
+        card_data = json.loads(latest_card.card_json)
+
+    # Generate (Pass the whole request object)
+    # If request is None (from old clients), create default
+    if request is None:
+        request = schemas.EmailGenerationRequest()
+
+    email_content = generator.generate_email(db_professor, card_data, request)
+
+    # Save
+    db_draft = models.EmailDraft(
+        professor_id=db_professor.id,
+        type=request.template,
+        tone=request.tone,
+        content_short=email_content["subject"],
+        content_long=email_content["body"]
+    )
+
+    db.add(db_draft)
+    db.commit()
+    db.refresh(db_draft)
+    return db_draft
+
+
+# Cache to prevent abuse/repeated AI calls (24h)
+avatar_cache = TTLCache(maxsize=100, ttl=86400)
+
+def extract_avatar(db: Session, website_url: str, user_id: int) -> Optional[str]:
+    """
+    AI-Powered Avatar Extraction Pipeline:
+    1. Scrape images from website
+    2. Vision Model verifies if it's a professional photo
+    3. Return best match
+    Concurrent extractions for the same page share one run.
+    """
+    from services import http_cache
+
+    if website_url in avatar_cache:
+        logger.info(f"[Avatar] Cache hit for {website_url}")
+        return avatar_cache[website_url]
+
+    key = singleflight.make_key(http_cache.cache_key(website_url))
+    return singleflight.group("avatar").do(key, _extract_avatar, db, website_url, user_id)
+
+
+def _extract_avatar(db: Session, website_url: str, user_id: int) -> Optional[str]:
+    from search import image_scraper
+    from services.vision import get_vision_service
+
+    # 1. Scrape Candidates
+    logger.info(f"[Avatar] Scraping images from: {website_url}")
+    doc = document.get_cached_document(website_url)
+    if doc is None and document.get_cached_image_candidates(website_url) is None:
+        # Reuse the page we already ingested instead of downloading it again
+        source_page = crud.get_latest_user_source_page(db, source_url=website_url, user_id=user_id)
+        if source_page and source_page.raw_html:
+            doc = document.parse_document(source_page.raw_html, website_url, cache=True)
+    candidates = image_scraper.get_image_candidates(website_url, doc=doc)
+    logger.info(f"[Avatar] Found {len(candidates)} candidates.")
+
+    if not candidates:
+        logger.warning("[Avatar] No image candidates found.")
+        avatar_cache[website_url] = None
+        return None
+
+    vision = get_vision_service()
+    best_avatar = None
+
+    # 2. Verify Candidates (max 5)
+    for i, img_url in enumerate(candidates[:5]):
+        logger.info(f"[Avatar] Checking candidate {i+1}/{min(5, len(candidates))}: {img_url}")
+        content = image_scraper.download_image(img_url)
+        if not content:
+            logger.warning(f"[Avatar] Failed to download: {img_url}")
+            continue
+
+        # 3. Vision Check
+        result = vision.verify_avatar(content)
+        logger.info(f"[Avatar] Vision Result: {result}")
+
+        if result["is_valid"]: # Relaxed check handled in vision.py now
+            logger.info(f"[Avatar] ACCEPTED: {img_url} (Confidence: {result.get('confidence')})")
+            best_avatar = img_url
+            break
+        else:
+             logger.info(f"[Avatar] REJECTED: {result.get('reason')}")
+        logger.info(f"[Avatar] Verified {img_url}: {result}")
+
+        if result["is_valid"] and result["confidence"] >= 0.75:
+            best_avatar = img_url
+            break # Found a good one
+
+    # 4. Cache & Return
+    avatar_cache[website_url] = best_avatar
+    return best_avatar
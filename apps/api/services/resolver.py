@@ -0,0 +1,165 @@
+"""
+DNS Resolver — cached lookups and connection pinning for the SSRF guard
+
+is_safe_url() used to resolve a host with gethostbyname (IPv4 only), and
+then requests resolved it again to connect. That costs a second lookup per
+image, and a DNS-rebinding server could answer the check with a public IP
+and the connect with 127.0.0.1.
+
+Now check(host) resolves once with getaddrinfo (IPv4 + IPv6) and caches the
+answer for DNS_CACHE_TTL seconds. It rejects the host if any address is in
+BLOCKED_NETWORKS, and otherwise pins the host to the addresses it checked.
+The shared HTTP session (services/http_client.py) keeps separate connection
+pools per pinned address set, so a keep-alive connection opened before the
+check (or for an unchecked request) is never reused for a checked one, and
+connects new sockets to those addresses, trying them in order. TLS SNI and
+certificate checks still use the hostname.
+
+Redirects are outside the pin: callers that check a URL pass check_url to
+http_cache.get, which checks every Location before following it.
+
+Config (env):
+    DNS_CACHE_TTL       seconds to keep a successful lookup (default 300)
+    DNS_NEGATIVE_TTL    seconds to keep a failed lookup (default 30)
+    DNS_CACHE_SIZE      max cached hosts (default 1024)
+"""
+import os
+import socket
+import ipaddress
+import threading
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from cachetools import TTLCache
+
+logger = logging.getLogger(__name__)
+
+CACHE_TTL = int(os.getenv("DNS_CACHE_TTL", "300"))
+NEGATIVE_TTL = int(os.getenv("DNS_NEGATIVE_TTL", "30"))
+CACHE_SIZE = int(os.getenv("DNS_CACHE_SIZE", "1024"))
+
+# SSRF Protection: Block internal IPs
+BLOCKED_NETWORKS = [
+    ipaddress.ip_network("0.0.0.0/8"),
+    ipaddress.ip_network("127.0.0.0/8"),
+    ipaddress.ip_network("10.0.0.0/8"),
+    ipaddress.ip_network("172.16.0.0/12"),
+    ipaddress.ip_network("192.168.0.0/16"),
+    ipaddress.ip_network("169.254.0.0/16"),
+    ipaddress.ip_network("::/128"),
+    ipaddress.ip_network("::1/128"),
+    ipaddress.ip_network("fc00::/7"),
+    ipaddress.ip_network("fe80::/10"),
+]
+
+
+class BlockedAddressError(ValueError):
+    def __init__(self, host: str, address: str):
+        super().__init__(f"{host} resolves to blocked address {address}")
+        self.host = host
+        self.address = address
+
+
+def is_blocked_address(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split("%")[0])
+    # ::ffff:127.0.0.1 is still 127.0.0.1
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return any(ip in network for network in BLOCKED_NETWORKS if network.version == ip.version)
+
+
+class Resolver:
+    def __init__(self, ttl: int = CACHE_TTL, negative_ttl: int = NEGATIVE_TTL, maxsize: int = CACHE_SIZE):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._failures = TTLCache(maxsize=maxsize, ttl=negative_ttl)
+        self._pins = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "failures": 0, "blocked": 0, "pinned_connections": 0}
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def resolve(self, host: str) -> List[str]:
+        """All addresses for host (cached). Raises socket.gaierror if it doesn't resolve."""
+        host = host.lower().rstrip(".")
+        with self._lock:
+            addresses = self._cache.get(host)
+            error = self._failures.get(host)
+        if addresses is not None or error is not None:
+            self._count("hits")
+            if error is not None:
+                raise error
+            return addresses
+
+        self._count("misses")
+        try:
+            infos = socket.getaddrinfo(host, None, type=socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            self._count("failures")
+            with self._lock:
+                self._failures[host] = e
+            raise
+
+        addresses = []
+        for info in infos:
+            address = info[4][0].split("%")[0]
+            if address not in addresses:
+                addresses.append(address)
+        with self._lock:
+            self._cache[host] = addresses
+        return addresses
+
+    def check(self, host: str) -> Tuple[str, ...]:
+        """
+        Resolves host and returns the addresses connections will be pinned to.
+        Raises BlockedAddressError if any of its addresses is internal.
+        """
+        host = host.lower().rstrip(".")
+        addresses = self.resolve(host)
+        for address in addresses:
+            if is_blocked_address(address):
+                self._count("blocked")
+                raise BlockedAddressError(host, address)
+        pinned = tuple(addresses)
+        with self._lock:
+            self._pins[host] = pinned
+        return pinned
+
+    def pinned(self, host: str) -> Optional[Tuple[str, ...]]:
+        """Addresses a checked host must connect to, or None if it was never checked."""
+        host = (host or "").lower().rstrip(".")
+        with self._lock:
+            return self._pins.get(host)
+
+    def count_pinned_connection(self):
+        self._count("pinned_connections")
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._failures.clear()
+            self._pins.clear()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._cache)
+            stats["pins"] = len(self._pins)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        return stats
+
+
+# Singleton
+_resolver: Optional[Resolver] = None
+_resolver_lock = threading.Lock()
+
+
+def get_resolver() -> Resolver:
+    global _resolver
+    if _resolver is None:
+        with _resolver_lock:
+            if _resolver is None:
+                _resolver = Resolver()
+    return _resolver
@@ -0,0 +1,120 @@
+"""
+Single-flight — concurrent identical calls share one execution
+
+When two tabs (or two users) ask for the same expensive thing at the same
+time, both miss the caches and both do the work: two DuckDuckGo searches,
+two page downloads, two vision-model runs. group(name).do(key, fn) runs fn
+once per key at a time: the first caller executes it, callers arriving
+while it runs wait and get the same result (or the same exception).
+Nothing is kept once the call finishes; that's the caches' job.
+
+Keys are built by the caller from normalized arguments (case-folded
+queries, canonical URLs, hashes of prompts and images) with make_key().
+
+Followers get a deep copy of the result by default, so callers that
+modify what they got (pipeline.ingest_page updates the fetch dict) don't
+see each other's changes.
+
+Groups, and who uses them:
+    search      search providers (search/engine.py)
+    fetch       ingest.fetcher.fetch_url
+    avatar      pipeline.extract_avatar
+    llm         LLMService._call_ollama
+    vision      VisionService.verify_avatar
+
+This only coalesces within one process; each uvicorn worker has its own
+groups. get_stats() counts calls, executions and coalesced calls per group
+(reported in /metrics).
+"""
+import copy
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+def make_key(*parts) -> Hashable:
+    """Hashable key from the parts; bytes, and strings longer than 256 characters, are replaced by their sha256."""
+    key = []
+    for part in parts:
+        if isinstance(part, str) and len(part) > 256:
+            part = hashlib.sha256(part.encode("utf-8")).hexdigest()
+        elif isinstance(part, bytes):
+            part = hashlib.sha256(part).hexdigest()
+        key.append(part)
+    return tuple(key)
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._stats = {"calls": 0, "executions": 0, "coalesced": 0, "errors": 0}
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, copy_result: Callable[[Any], Any] = copy.deepcopy, **kwargs):
+        """
+        fn(*args, **kwargs), unless a call with the same key is already
+        running, in which case waits for it and returns copy_result of its
+        result (or raises its exception).
+        """
+        with self._lock:
+            self._stats["calls"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._stats["executions"] += 1
+            else:
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy_result(call.result) if copy_result else call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self._stats["errors"] += 1
+            raise
+        finally:
+            # Callers arriving from now on start a new execution
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._calls)
+        return stats
+
+
+_groups: Dict[str, SingleFlight] = {}
+_groups_lock = threading.Lock()
+
+
+def group(name: str) -> SingleFlight:
+    with _groups_lock:
+        if name not in _groups:
+            _groups[name] = SingleFlight(name)
+        return _groups[name]
+
+
+def get_stats() -> Dict:
+    with _groups_lock:
+        groups = list(_groups.values())
+    return {g.name: g.get_stats() for g in groups}
@@ -1,9 +1,9 @@
-import requests
 import base64
 import os
 import json
 import logging
 from typing import Optional, Dict
+from services import http_client, singleflight
 
 logger = logging.getLogger(__name__)
 
@@ -16,7 +16,12 @@ class VisionService:
         """
         Verifies if the image is a professional human face.
         Returns: {"is_valid": bool, "confidence": float, "reason": str}
+        The same image already being checked shares that check.
         """
+        key = singleflight.make_key(self.ollama_url, self.vision_model, image_bytes)
+        return singleflight.group("vision").do(key, self._verify_avatar, image_bytes)
+
+    def _verify_avatar(self, image_bytes: bytes) -> Dict:
         try:
             # Encode image to base64
             b64_image = base64.b64encode(image_bytes).decode('utf-8')
@@ -29,7 +34,7 @@ class VisionService:
             """
 
             logger.info(f"[Vision] Sending request to {self.vision_model}...")
-            resp = requests.post(
+            resp = http_client.get_session().post(
                 f"{self.ollama_url}/api/chat",
                 json={
                     "model": self.vision_model,